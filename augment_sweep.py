@@ -0,0 +1,298 @@
+import argparse
+import csv
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+import cv2
+
+from transform_engine import TRANSFORM_TYPES, normalize_params, warp
+from batch_transform import load_spec
+
+# -------------------------------
+# Augmentation sweeps
+# -------------------------------
+# python augment_sweep.py cat.png --spec sweep.json --out aug.npy --count 8 --seed 0
+#
+# Same spec format as the batch CLI, but any step parameter may be a sweep:
+#   {"linspace": [lo, hi, n]}  n evenly spaced values      (grid)
+#   {"values": [a, b, ...]}    exactly these values        (grid)
+#   {"uniform": [lo, hi]}      uniform random              (random)
+#   {"normal": [mean, std]}    gaussian random             (random)
+#   {"randint": [lo, hi]}      random integer, inclusive   (random)
+#
+# Grid parameters are combined as a cartesian product and every grid point
+# gets `count` random draws, so N = prod(grid sizes) * count. All N
+# matrices are built in one vectorized pass, and the warps write straight
+# into a preallocated (N, H, W[, C]) array or .npy memmap. A CSV table
+# with every sample's parameters and matrix is written alongside, and the
+# seed makes the random draws reproducible.
+
+GRID_KINDS = ("linspace", "values")
+RANDOM_KINDS = ("uniform", "normal", "randint")
+
+
+def is_sweep(value):
+    return isinstance(value, dict) and len(value) == 1 and next(iter(value)) in GRID_KINDS + RANDOM_KINDS
+
+
+def expand(steps, count=1, seed=None):
+    """Concrete per-sample parameter arrays: ([{name: array(N)} per step], N)."""
+    grids = []  # (step index, name, values)
+    for i, (_, params) in enumerate(steps):
+        for name, v in params.items():
+            if is_sweep(v):
+                kind, args = next(iter(v.items()))
+                if kind == "linspace":
+                    grids.append((i, name, np.linspace(args[0], args[1], int(args[2]))))
+                elif kind == "values":
+                    grids.append((i, name, np.float64(args)))
+    grid_n = int(np.prod([len(g[2]) for g in grids])) if grids else 1
+    n = grid_n * max(1, count)
+    rng = np.random.default_rng(seed)
+
+    # Grid point of each sample, repeated `count` times in a row
+    mesh = np.meshgrid(*[g[2] for g in grids], indexing="ij") if grids else []
+    out = [dict() for _ in steps]
+    for (i, name, _), m in zip(grids, mesh):
+        out[i][name] = np.repeat(m.ravel(), max(1, count))
+    for i, (_, params) in enumerate(steps):
+        for name, v in params.items():
+            if name in out[i] or name in ("interp", "border", "border_val"):
+                continue
+            if is_sweep(v):
+                kind, args = next(iter(v.items()))
+                if kind == "uniform":
+                    out[i][name] = rng.uniform(args[0], args[1], n)
+                elif kind == "normal":
+                    out[i][name] = rng.normal(args[0], args[1], n)
+                else:
+                    out[i][name] = rng.integers(int(args[0]), int(args[1]), n, endpoint=True).astype(np.float64)
+            else:
+                out[i][name] = np.full(n, float(v))
+    return out, n
+
+
+# -------------------------------
+# Vectorized matrices
+# -------------------------------
+# Batched counterparts of transform_engine's matrix builders: params hold
+# arrays of length N, w/h may be scalars or arrays, and the result is
+# (N, 3, 3). They match the per-sample builders exactly.
+
+def _stack(n, a, b, c, d, e, f, g=0.0, h=0.0, i=1.0):
+    M = np.empty((n, 3, 3))
+    for k, v in enumerate((a, b, c, d, e, f, g, h, i)):
+        M[:, k // 3, k % 3] = v
+    return M
+
+
+def _rotation(n, cx, cy, angle, scale):
+    rad = np.deg2rad(angle)
+    a, b = scale * np.cos(rad), scale * np.sin(rad)
+    return _stack(n, a, b, (1 - a) * cx - b * cy, -b, a, b * cx + (1 - a) * cy)
+
+
+def batch_translation(p, w, h, n):
+    return _stack(n, 1, 0, p["tx"], 0, 1, p["ty"])
+
+
+def batch_rotation(p, w, h, n):
+    cx = p.get("cx", np.floor_divide(w, 2))
+    cy = p.get("cy", np.floor_divide(h, 2))
+    return _rotation(n, cx, cy, p["angle"], 1.0)
+
+
+def batch_scaling_size(p, w, h):
+    return np.floor(w * p["sx"] / 100.0), np.floor(h * p["sy"] / 100.0)
+
+
+def batch_scaling(p, w, h, n):
+    new_w, new_h = batch_scaling_size(p, w, h)
+    fx, fy = new_w / w, new_h / h
+    return _stack(n, fx, 0, 0.5 * fx - 0.5, 0, fy, 0.5 * fy - 0.5)
+
+
+def batch_similarity(p, w, h, n):
+    M = _rotation(n, np.floor_divide(w, 2), np.floor_divide(h, 2), p["angle"], p["scale"] / 100.0)
+    M[:, 0, 2] += p["tx"]
+    M[:, 1, 2] += p["ty"]
+    return M
+
+
+def _sizes(n, w, h):
+    return np.broadcast_to(np.float64(w), (n,)), np.broadcast_to(np.float64(h), (n,))
+
+
+def batch_affine(p, w, h, n):
+    w, h = _sizes(n, w, h)
+    src = np.stack([np.stack([np.full(n, 50.0), w - 50, np.full(n, 50.0)], 1),
+                    np.stack([np.full(n, 50.0), np.full(n, 50.0), h - 50], 1),
+                    np.ones((n, 3))], 1)
+    dst = np.stack([np.stack([50 + p["tx1"], w - 50 + p["tx2"], 50 + p["tx3"]], 1),
+                    np.stack([50 + p["ty1"], 50 + p["ty2"], h - 50 + p["ty3"]], 1)], 1)
+    M = np.zeros((n, 3, 3))
+    M[:, :2] = dst @ np.linalg.inv(src)
+    M[:, 2, 2] = 1
+    return M
+
+
+def batch_perspective(p, w, h, n):
+    w, h = _sizes(n, w, h)
+    zero = np.zeros(n)
+    xs, ys = [zero, w, zero, w], [zero, zero, h, h]
+    us = [p["p1x"], p["p2x"], p["p3x"], p["p4x"]]
+    vs = [p["p1y"], p["p2y"], p["p3y"], p["p4y"]]
+    A = np.zeros((n, 8, 8))
+    b = np.zeros((n, 8))
+    for k in range(4):
+        x, y, u, v = xs[k], ys[k], us[k], vs[k]
+        A[:, 2 * k, 0], A[:, 2 * k, 1], A[:, 2 * k, 2] = x, y, 1
+        A[:, 2 * k, 6], A[:, 2 * k, 7] = -x * u, -y * u
+        A[:, 2 * k + 1, 3], A[:, 2 * k + 1, 4], A[:, 2 * k + 1, 5] = x, y, 1
+        A[:, 2 * k + 1, 6], A[:, 2 * k + 1, 7] = -x * v, -y * v
+        b[:, 2 * k], b[:, 2 * k + 1] = u, v
+    sol = np.linalg.solve(A, b[..., None])[..., 0]
+    return np.concatenate([sol, np.ones((n, 1))], 1).reshape(n, 3, 3)
+
+
+batch_builders = {
+    "translation": batch_translation,
+    "rotation": batch_rotation,
+    "scaling": batch_scaling,
+    "similarity": batch_similarity,
+    "affine": batch_affine,
+    "perspective": batch_perspective
+}
+
+
+def batch_compose(steps, samples, n, w, h):
+    """(N, 3, 3) chain matrices; sizes are carried per sample like compose() does."""
+    M = np.broadcast_to(np.eye(3), (n, 3, 3)).copy()
+    sw, sh = np.full(n, float(w)), np.full(n, float(h))
+    for (typ, _), p in zip(steps, samples):
+        M = batch_builders[typ](p, sw, sh, n) @ M
+        if typ == "scaling":
+            sw, sh = batch_scaling_size(p, sw, sh)
+    return M
+
+
+# -------------------------------
+# Sweeps
+# -------------------------------
+def sweep(img, steps, params=None, count=1, seed=None, size=None, out=None):
+    """Warp img by every sampled chain into out (allocated when None).
+
+    Returns (out, samples, matrices). Every sample is rendered on a canvas
+    of size (w, h), by default the source size.
+    """
+    if img is None or img.size == 0:
+        raise ValueError("Invalid image")
+    steps = list(steps)
+    for typ, _ in steps:
+        if typ not in TRANSFORM_TYPES:
+            raise ValueError(f"Unknown transform type: {typ}")
+    params = normalize_params(params if params is not None else steps[0][1])
+    h, w = img.shape[:2]
+    ow, oh = size or (w, h)
+    samples, n = expand(steps, count, seed)
+    matrices = batch_compose(steps, samples, n, w, h)
+    shape = (n, oh, ow) + img.shape[2:]
+    if out is None:
+        out = np.empty(shape, img.dtype)
+    elif out.shape != shape or out.dtype != img.dtype:
+        raise ValueError(f"out must be {shape} {img.dtype}, got {out.shape} {out.dtype}")
+    for i in range(n):
+        dst = out[i]
+        res = warp(img, matrices[i], (ow, oh), params, dst=dst)
+        if not np.shares_memory(res, dst):
+            dst[...] = res
+    return out, samples, matrices
+
+
+def table_rows(steps, samples, matrices, source=None, offset=0, seed=None):
+    """Per-sample parameter table rows (dicts) for a sweep."""
+    multi = len(steps) > 1
+    names = [(i, typ, name) for i, (typ, _) in enumerate(steps) for name in samples[i]]
+    rows = []
+    for k in range(len(matrices)):
+        row = {"index": offset + k}
+        if source is not None:
+            row["source"] = source
+        if seed is not None:
+            row["seed"] = seed
+        for i, typ, name in names:
+            row[f"{i}.{typ}.{name}" if multi else name] = float(samples[i][name][k])
+        for r, c in itertools.product(range(3), range(3)):
+            row[f"m{r}{c}"] = float(matrices[k, r, c])
+        rows.append(row)
+    return rows
+
+
+def write_table(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else ["index"])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Render a parameter sweep of a transform into one array.")
+    ap.add_argument("inputs", nargs="+", help="source images (all the same size)")
+    ap.add_argument("--spec", required=True, help="JSON/YAML spec; step params may be sweeps")
+    ap.add_argument("--out", required=True, help="output .npy file (memory-mapped while writing)")
+    ap.add_argument("--table", help="per-sample parameter CSV (default: next to --out)")
+    ap.add_argument("--count", type=int, default=1, help="random draws per grid point")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--size", help="output canvas WxH (default: source size)")
+    args = ap.parse_args(argv)
+
+    spec = load_spec(args.spec)
+    size = tuple(int(v) for v in args.size.lower().split("x")) if args.size else None
+    # Every source gets the same draws, so rows line up across sources. Without
+    # --seed one is drawn here and written to the table, so the run can be repeated.
+    seed = args.seed if args.seed is not None else int(np.random.SeedSequence().entropy)
+
+    # Sources are decoded one at a time, as they are swept; the first sets the shape
+    img = cv2.imread(args.inputs[0], cv2.IMREAD_UNCHANGED)
+    if img is None or img.size == 0:
+        print(f"Could not read {args.inputs[0]}", file=sys.stderr)
+        return 1
+    src_shape, dtype = img.shape, img.dtype
+    _, n = expand(spec["steps"], args.count, seed)
+    h, w = src_shape[:2]
+    ow, oh = size or (w, h)
+    shape = (len(args.inputs) * n, oh, ow) + src_shape[2:]
+    out = np.lib.format.open_memmap(args.out, mode="w+", dtype=dtype, shape=shape)
+    rows = []
+    t0 = time.perf_counter()
+    for j, path in enumerate(args.inputs):
+        if j > 0:
+            img = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        error = None
+        if img is None or img.size == 0:
+            error = f"Could not read {path}"
+        elif img.shape != src_shape or img.dtype != dtype:
+            error = f"{path} is {img.shape} {img.dtype}, expected {src_shape} {dtype}"
+        if error is not None:
+            print(error, file=sys.stderr)
+            del out
+            os.remove(args.out)
+            return 1
+        _, samples, matrices = sweep(img, spec["steps"], spec["params"], args.count, seed, size,
+                                     out[j * n:(j + 1) * n])
+        rows += table_rows(spec["steps"], samples, matrices, path, j * n, seed)
+        img = None
+    out.flush()
+    elapsed = time.perf_counter() - t0
+    table = args.table or (args.out[:-4] if args.out.lower().endswith(".npy") else args.out) + ".csv"
+    write_table(table, rows)
+    print(f"{shape[0]} samples {shape[1:]} in {elapsed:.2f} s ({shape[0] / max(elapsed, 1e-9):.1f} samples/s)"
+          f", seed {seed} -> {args.out}, {table}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
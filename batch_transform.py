@@ -0,0 +1,207 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import cv2
+
+from transform_engine import TRANSFORM_TYPES, apply_chain, apply_planned
+from pipeline import Pipeline, Stage
+
+# -------------------------------
+# Batch CLI
+# -------------------------------
+# python batch_transform.py "scans/*.jpg" --spec rotate.json --out out/ --workers 8
+#
+# Spec file (JSON, or YAML when PyYAML is installed):
+#   {"type": "rotation", "params": {"angle": 15, "interp": "cubic", "border": "reflect"}}
+#
+# or a stack of steps fused into one warp, with shared interp/border settings:
+#   {"steps": [{"type": "rotation", "params": {"angle": 15}},
+#              {"type": "perspective", "params": {...}}],
+#    "params": {"interp": "cubic"}}
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+
+
+def load_spec(path):
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if path.lower().endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise SystemExit("PyYAML is required for YAML specs (pip install pyyaml)")
+        spec = yaml.safe_load(text)
+    else:
+        spec = json.loads(text)
+    try:
+        return parse_spec(spec)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+
+def parse_spec(spec):
+    """{"steps": [(type, params)], "params": global or None} from a decoded spec dict."""
+    if not isinstance(spec, dict):
+        raise ValueError("Spec must be a mapping")
+    if "steps" in spec:
+        if not isinstance(spec["steps"], list) or not all(isinstance(s, dict) for s in spec["steps"]):
+            raise ValueError("Spec 'steps' must be a list of mappings")
+        steps = [(s.get("type"), s.get("params", {})) for s in spec["steps"]]
+        params = spec.get("params")
+    else:
+        steps = [(spec.get("type"), spec.get("params", {}))]
+        params = None
+    for typ, _ in steps:
+        if typ not in TRANSFORM_TYPES:
+            raise ValueError(f"Spec 'type' must be one of: {', '.join(TRANSFORM_TYPES)}")
+    return {"steps": steps, "params": params}
+
+
+def collect_inputs(src):
+    if os.path.isdir(src):
+        paths = [os.path.join(src, n) for n in os.listdir(src)]
+    else:
+        paths = glob.glob(src, recursive=True)
+    return sorted(p for p in paths if os.path.isfile(p) and p.lower().endswith(IMAGE_EXTS))
+
+
+def _init_worker(cv_threads):
+    # One OpenCV thread per process by default; the pool already fills the cores.
+    cv2.setNumThreads(cv_threads)
+
+
+def process_file(path, out_path, steps, params, plan=False):
+    t0 = time.perf_counter()
+    img = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if img is None or img.size == 0:
+        raise ValueError("could not read image")
+    result = apply_planned(img, steps, params) if plan else apply_chain(img, steps, params)
+    if not cv2.imwrite(out_path, result):
+        raise ValueError("could not write " + out_path)
+    h, w = img.shape[:2]
+    return time.perf_counter() - t0, w * h
+
+
+def output_path(path, out_dir, suffix, ext):
+    base, orig_ext = os.path.splitext(os.path.basename(path))
+    return os.path.join(out_dir, base + suffix + (ext or orig_ext))
+
+
+def run_batch(paths, spec, out_dir, workers=None, suffix="", ext=None, cv_threads=1, plan=False, log=print):
+    # Imported here: multiprocessing is a noticeable share of CLI start-up,
+    # and the other commands that reuse this module never need it.
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    os.makedirs(out_dir, exist_ok=True)
+    steps, params = spec["steps"], spec["params"]
+    ok, failed, pixels = 0, [], 0
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cv_threads,)) as pool:
+        futures = {
+            pool.submit(process_file, p, output_path(p, out_dir, suffix, ext), steps, params, plan): p
+            for p in paths
+        }
+        for fut in as_completed(futures):
+            path = futures[fut]
+            try:
+                secs, px = fut.result()
+            except Exception as e:
+                failed.append((path, str(e)))
+                log(f"FAIL {path}: {e}")
+                continue
+            ok += 1
+            pixels += px
+            log(f"ok   {path}  {secs * 1000:.1f} ms  {px / 1e6 / max(secs, 1e-9):.1f} MP/s")
+    elapsed = time.perf_counter() - t0
+    log(f"{ok} done, {len(failed)} failed in {elapsed:.2f} s "
+        f"({ok / max(elapsed, 1e-9):.1f} files/s, {pixels / 1e6 / max(elapsed, 1e-9):.1f} MP/s)")
+    return ok, failed
+
+
+def run_pipeline(paths, spec, out_dir, suffix="", ext=None, decode_workers=2, transform_workers=2,
+                 encode_workers=2, queue_size=4, plan=False, log=print):
+    """Same job as run_batch, but as overlapping decode/transform/encode thread stages."""
+    os.makedirs(out_dir, exist_ok=True)
+    steps, params = spec["steps"], spec["params"]
+    transform = apply_planned if plan else apply_chain
+
+    def decode(path):
+        img = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if img is None or img.size == 0:
+            raise ValueError("could not read image")
+        return path, img
+
+    def warp(job):
+        path, img = job
+        return path, transform(img, steps, params), img.shape[0] * img.shape[1]
+
+    def encode(job):
+        path, result, px = job
+        out_path = output_path(path, out_dir, suffix, ext)
+        if not cv2.imwrite(out_path, result):
+            raise ValueError("could not write " + out_path)
+        return px
+
+    pipe = Pipeline([
+        Stage("decode", decode, decode_workers, queue_size),
+        Stage("transform", warp, transform_workers, queue_size),
+        Stage("encode", encode, encode_workers, queue_size)
+    ])
+    ok, failed, pixels = 0, [], 0
+    for path, px, error in pipe.run(paths):
+        if error is not None:
+            failed.append((path, error))
+            log(f"FAIL {path}: {error}")
+            continue
+        ok += 1
+        pixels += px
+        log(f"ok   {path}")
+    elapsed = pipe.wall
+    log(f"{ok} done, {len(failed)} failed in {elapsed:.2f} s "
+        f"({ok / max(elapsed, 1e-9):.1f} files/s, {pixels / 1e6 / max(elapsed, 1e-9):.1f} MP/s)")
+    for st in pipe.stats():
+        log(f"  {st['stage']:9s} x{st['workers']}  util {st['utilization']:6.1%}  busy {st['busy_s']:.2f} s  "
+            f"starved {st['starved_s']:.2f} s  blocked {st['blocked_s']:.2f} s")
+    log(f"  bottleneck: {pipe.bottleneck()}")
+    return ok, failed
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Apply an Image Transform Studio transform to many files.")
+    ap.add_argument("input", help="directory or glob pattern")
+    ap.add_argument("--spec", required=True, help="JSON/YAML file with 'type'+'params' or 'steps'")
+    ap.add_argument("--out", required=True, help="output directory")
+    ap.add_argument("--workers", type=int, default=None, help="process count (default: CPU count)")
+    ap.add_argument("--cv-threads", type=int, default=1, help="OpenCV threads per worker")
+    ap.add_argument("--suffix", default="", help="appended to output file names")
+    ap.add_argument("--plan", action="store_true",
+                    help="precompute the remap tables once per input size and reuse them")
+    ap.add_argument("--ext", default=None, help="output extension, e.g. .png (default: keep input)")
+    ap.add_argument("--pipeline", action="store_true",
+                    help="overlap decode/transform/encode as thread stages instead of a process pool")
+    ap.add_argument("--decode-workers", type=int, default=2)
+    ap.add_argument("--transform-workers", type=int, default=2)
+    ap.add_argument("--encode-workers", type=int, default=2)
+    ap.add_argument("--queue-size", type=int, default=4, help="bounded queue length between stages")
+    args = ap.parse_args(argv)
+
+    spec = load_spec(args.spec)
+    paths = collect_inputs(args.input)
+    if not paths:
+        print("No input images found.", file=sys.stderr)
+        return 1
+    if args.pipeline:
+        cv2.setNumThreads(args.cv_threads)
+        _, failed = run_pipeline(paths, spec, args.out, args.suffix, args.ext, args.decode_workers,
+                                 args.transform_workers, args.encode_workers, args.queue_size, args.plan)
+    else:
+        _, failed = run_batch(paths, spec, args.out, args.workers, args.suffix, args.ext, args.cv_threads,
+                              args.plan)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import cv2
+
+from transform_engine import TRANSFORM_TYPES, interp_map, border_map, apply_transform, get_plan
+
+# -------------------------------
+# Benchmark suite
+# -------------------------------
+# Every transform x interpolation x border on synthetic images, with latency
+# percentiles, megapixels/second and peak allocation, written as JSON.
+#
+# python benchmark.py --sizes small,medium --out bench.json
+# python benchmark.py --sizes small,medium --compare bench.json --threshold 0.1
+
+SIZES = {
+    "small": (640, 480),
+    "medium": (1920, 1080),
+    "large": (4000, 3000),
+    "huge": (8000, 6000)
+}
+
+
+def synthetic_image(w, h, channels, seed=0):
+    """Deterministic test image: gradients plus noise, so no branch is trivially flat."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:h, 0:w]
+    base = (x * 255.0 / max(w - 1, 1) + y * 255.0 / max(h - 1, 1)) / 2
+    planes = [base, base[::-1], base[:, ::-1], np.full_like(base, 255.0)][:channels]
+    img = np.dstack(planes) + rng.normal(0, 8, (h, w, channels))
+    img = np.clip(img, 0, 255).astype(np.uint8)
+    return img[:, :, 0] if channels == 1 else img
+
+
+def bench_params(typ, w, h):
+    """Representative, non-trivial parameters for each transform type."""
+    if typ == "translation":
+        return {"tx": w // 10, "ty": -h // 12}
+    if typ == "rotation":
+        return {"angle": 17}
+    if typ == "scaling":
+        return {"sx": 73, "sy": 73}
+    if typ == "similarity":
+        return {"angle": -23, "scale": 85, "tx": w // 20, "ty": h // 20}
+    if typ == "affine":
+        return {"tx1": 20, "ty1": 10, "tx2": -30, "ty2": 25, "tx3": 15, "ty3": -20}
+    return {"p1x": w // 20, "p1y": h // 15, "p2x": w - w // 25, "p2y": 0,
+            "p3x": 0, "p3y": h, "p4x": w - w // 10, "p4y": h - h // 20}
+
+
+def percentile(values, q):
+    return float(np.percentile(np.asarray(values), q))
+
+
+def bench_case(img, typ, params, repeats, warmup, plan=False):
+    if plan:
+        # Plan built outside the timed loop, as a batch job would amortise it
+        run = get_plan([(typ, params)], params, (img.shape[1], img.shape[0])).apply
+    else:
+        def run(img):
+            return apply_transform(img, typ, params)
+    for _ in range(warmup):
+        run(img)
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        run(img)
+        times.append(time.perf_counter() - t0)
+    # Peak allocation from one extra, untimed run: tracing slows every allocation
+    tracemalloc.start()
+    run(img)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    h, w = img.shape[:2]
+    return {
+        "p50_ms": percentile(times, 50) * 1000,
+        "p90_ms": percentile(times, 90) * 1000,
+        "p99_ms": percentile(times, 99) * 1000,
+        "mean_ms": float(np.mean(times)) * 1000,
+        "mp_per_s": w * h / 1e6 / max(percentile(times, 50), 1e-9),
+        "peak_alloc_mb": peak / 2**20
+    }
+
+
+def bench_display(img, repeats, warmup):
+    """Time the ImageLabel conversion + smooth scale path (needs PyQt6)."""
+    from PyQt6.QtCore import QSize, Qt
+    from image_transform_studio import to_pixmap
+
+    def once():
+        to_pixmap(img).scaled(QSize(800, 600), Qt.AspectRatioMode.KeepAspectRatio,
+                              Qt.TransformationMode.SmoothTransformation)
+    for _ in range(warmup):
+        once()
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        once()
+        times.append(time.perf_counter() - t0)
+    h, w = img.shape[:2]
+    return {
+        "p50_ms": percentile(times, 50) * 1000,
+        "p90_ms": percentile(times, 90) * 1000,
+        "p99_ms": percentile(times, 99) * 1000,
+        "mean_ms": float(np.mean(times)) * 1000,
+        "mp_per_s": w * h / 1e6 / max(percentile(times, 50), 1e-9),
+        "peak_alloc_mb": None
+    }
+
+
+def run_suite(sizes, channels, types, interps, borders, repeats=10, warmup=2, display=False, plan=False,
+              log=print):
+    results = []
+    for size_name in sizes:
+        w, h = SIZES[size_name]
+        for ch in channels:
+            img = synthetic_image(w, h, ch)
+            for typ in types:
+                # resize ignores the border mode, so one border is enough
+                typ_borders = borders[:1] if typ == "scaling" else borders
+                for interp in interps:
+                    for border in typ_borders:
+                        params = dict(bench_params(typ, w, h), interp=interp, border=border, border_val=0)
+                        case = f"{typ}/{interp}/{border}/{w}x{h}x{ch}" + ("/plan" if plan else "")
+                        r = bench_case(img, typ, params, repeats, warmup, plan)
+                        r["case"] = case
+                        results.append(r)
+                        log(f"{case:48s} p50 {r['p50_ms']:8.2f} ms  p99 {r['p99_ms']:8.2f} ms  "
+                            f"{r['mp_per_s']:8.1f} MP/s  peak {r['peak_alloc_mb']:7.1f} MB")
+            if display and ch in (1, 3, 4):
+                r = bench_display(img, repeats, warmup)
+                r["case"] = f"display/{w}x{h}x{ch}"
+                results.append(r)
+                log(f"{r['case']:48s} p50 {r['p50_ms']:8.2f} ms  p99 {r['p99_ms']:8.2f} ms  "
+                    f"{r['mp_per_s']:8.1f} MP/s")
+    return {"meta": dict(environment(), plan=plan), "results": results}
+
+
+def environment():
+    return {
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "cv_threads": cv2.getNumThreads()
+    }
+
+
+# Settings that change what a run measures; runs that differ in them don't compare.
+# Baselines from before plan mode existed were direct warps.
+COMPARABLE_META = ("plan", "cv_threads")
+META_DEFAULTS = {"plan": False}
+
+
+def compare(current, baseline, threshold=0.10):
+    """Cases whose p50 got slower than baseline by more than threshold (a fraction).
+
+    Raises ValueError when the two runs were made with different COMPARABLE_META settings.
+    """
+    cur, old = ({**META_DEFAULTS, **run.get("meta", {})} for run in (current, baseline))
+    differ = [f"{k} {old.get(k)} vs {cur.get(k)}" for k in COMPARABLE_META if old.get(k) != cur.get(k)]
+    if differ:
+        raise ValueError("Runs are not comparable: " + ", ".join(differ))
+    base = {r["case"]: r for r in baseline["results"]}
+    regressions, improvements = [], []
+    for r in current["results"]:
+        b = base.get(r["case"])
+        if b is None or b["p50_ms"] <= 0:
+            continue
+        change = r["p50_ms"] / b["p50_ms"] - 1
+        if change > threshold:
+            regressions.append((r["case"], b["p50_ms"], r["p50_ms"], change))
+        elif change < -threshold:
+            improvements.append((r["case"], b["p50_ms"], r["p50_ms"], change))
+    return regressions, improvements
+
+
+def _names(arg, allowed):
+    names = [n.strip() for n in arg.split(",") if n.strip()]
+    bad = [n for n in names if n not in allowed]
+    if bad:
+        raise SystemExit(f"Unknown value(s) {', '.join(bad)}; choose from {', '.join(allowed)}")
+    return names
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark every transform/interpolation/border combination.")
+    ap.add_argument("--sizes", default="small,medium", help=f"comma list of {', '.join(SIZES)}")
+    ap.add_argument("--channels", default="3", help="comma list of channel counts (1, 3, 4)")
+    ap.add_argument("--types", default=",".join(TRANSFORM_TYPES))
+    ap.add_argument("--interps", default=",".join(interp_map))
+    ap.add_argument("--borders", default=",".join(border_map))
+    ap.add_argument("--repeats", type=int, default=10)
+    ap.add_argument("--warmup", type=int, default=2)
+    ap.add_argument("--threads", type=int, default=None, help="cv2.setNumThreads value (default: OpenCV's)")
+    ap.add_argument("--display", action="store_true", help="also time the ImageLabel display conversion")
+    ap.add_argument("--plan", action="store_true", help="time precomputed geometry plans (cv2.remap)")
+    ap.add_argument("--out", help="write results as JSON")
+    ap.add_argument("--compare", help="baseline JSON to check for regressions")
+    ap.add_argument("--threshold", type=float, default=0.10, help="allowed p50 slowdown, as a fraction")
+    args = ap.parse_args(argv)
+
+    if args.threads is not None:
+        cv2.setNumThreads(args.threads)
+    app = None
+    if args.display:
+        from PyQt6.QtGui import QGuiApplication
+        app = QGuiApplication.instance() or QGuiApplication(sys.argv[:1])
+
+    current = run_suite(
+        _names(args.sizes, list(SIZES)),
+        [int(c) for c in args.channels.split(",")],
+        _names(args.types, TRANSFORM_TYPES),
+        _names(args.interps, list(interp_map)),
+        _names(args.borders, list(border_map)),
+        args.repeats, args.warmup, args.display, args.plan
+    )
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        try:
+            regressions, improvements = compare(current, baseline, args.threshold)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+        for case, old, new, change in improvements:
+            print(f"faster  {case:48s} {old:8.2f} -> {new:8.2f} ms ({change:+.0%})")
+        for case, old, new, change in regressions:
+            print(f"SLOWER  {case:48s} {old:8.2f} -> {new:8.2f} ms ({change:+.0%})")
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+import argparse
+import os
+import secrets
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import cv2
+
+from transform_engine import resize
+
+# -------------------------------
+# Export
+# -------------------------------
+# python image_export.py photo.png out.png:compression=9 out.jpg:quality=85,progressive=1
+# python image_export.py photo.png a.png:compression=1 b.png:compression=9 c.webp:quality=80 --dry-run
+#
+# One image is written to any number of targets at once, e.g. a lossless
+# master plus a smaller JPEG and a WebP thumbnail. Each target is an
+# output path, optionally followed by ":name=value,..." encoder options
+# (see ENCODER_OPTIONS) and size options (scale=0.5 or max_side=1024).
+# Targets are encoded in parallel (OpenCV's encoders release the GIL).
+# Each file is written to a temporary file next to it and renamed into
+# place, so a reader never sees a half-written file. Every target reports
+# its encode time and output size; with --dry-run nothing is written, which
+# is how to compare settings before choosing one for storage.
+
+# option -> cv2 imwrite flag, per canonical extension
+ENCODER_OPTIONS = {
+    ".png": {"compression": cv2.IMWRITE_PNG_COMPRESSION},           # 0-9, default 1
+    ".jpg": {"quality": cv2.IMWRITE_JPEG_QUALITY,                   # 0-100, default 95
+             "progressive": cv2.IMWRITE_JPEG_PROGRESSIVE,           # 0/1
+             "optimize": cv2.IMWRITE_JPEG_OPTIMIZE},                # 0/1
+    ".webp": {"quality": cv2.IMWRITE_WEBP_QUALITY},                 # 1-100, above 100 lossless (default)
+    ".tif": {"compression": cv2.IMWRITE_TIFF_COMPRESSION}           # name or libtiff code, default lzw
+}
+if hasattr(cv2, "IMWRITE_TIFF_PREDICTOR"):
+    ENCODER_OPTIONS[".tif"]["predictor"] = cv2.IMWRITE_TIFF_PREDICTOR
+
+EXT_ALIASES = {".jpeg": ".jpg", ".tiff": ".tif"}
+
+# Named values for options that take a code (libtiff's numbering)
+NAMED_VALUES = {
+    (".tif", "compression"): {"none": 1, "lzw": 5, "deflate": 8, "packbits": 32773},
+    (".tif", "predictor"): {"none": 1, "horizontal": 2, "float": 3}
+}
+
+
+def canonical_ext(ext):
+    ext = ext.lower()
+    return EXT_ALIASES.get(ext, ext)
+
+
+def imwrite_flags(ext, options=None):
+    """Flat [flag, value, ...] list for cv2.imencode/imwrite from option names."""
+    ext = canonical_ext(ext)
+    if ext not in ENCODER_OPTIONS:
+        raise ValueError(f"Unsupported export format {ext}; expected one of: {', '.join(ENCODER_OPTIONS)}")
+    flags = []
+    for name, value in (options or {}).items():
+        flag = ENCODER_OPTIONS[ext].get(name)
+        if flag is None:
+            raise ValueError(f"Unknown {ext} option '{name}'; expected one of: {', '.join(ENCODER_OPTIONS[ext])}")
+        named = NAMED_VALUES.get((ext, name), {})
+        if isinstance(value, str) and value.lower() in named:
+            value = named[value.lower()]
+        elif isinstance(value, str) and value.lower() in ("true", "false"):
+            value = value.lower() == "true"
+        try:
+            flags += [flag, int(value)]
+        except ValueError:
+            raise ValueError(f"{ext} option '{name}' needs a number" +
+                             (f" or one of: {', '.join(named)}" if named else "") + f", got '{value}'")
+    return flags
+
+
+class ExportTarget:
+    __slots__ = ("path", "ext", "options", "scale", "max_side")
+
+    def __init__(self, path, options=None, scale=None, max_side=None):
+        options = dict(options or {})
+        self.path = path
+        self.ext = canonical_ext(os.path.splitext(path)[1] or ".png")
+        scale = options.pop("scale", scale)
+        self.scale = 1.0 if scale is None else float(scale)
+        self.max_side = int(options.pop("max_side", max_side) or 0) or None
+        self.options = options
+        if self.scale <= 0:
+            raise ValueError(f"scale must be positive, got {self.scale}")
+        imwrite_flags(self.ext, self.options)  # fail on bad options before any work starts
+
+    def out_size(self, w, h):
+        f = self.scale
+        if self.max_side:
+            f = min(f, self.max_side / max(w, h))
+        return max(1, round(w * f)), max(1, round(h * f))
+
+    def describe(self):
+        opts = dict(self.options)
+        if self.scale != 1:
+            opts["scale"] = self.scale
+        if self.max_side:
+            opts["max_side"] = self.max_side
+        return ",".join(f"{k}={v}" for k, v in opts.items()) or "defaults"
+
+
+def parse_value(text):
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            return float(text)
+        except ValueError:
+            return text
+
+
+def parse_target(text):
+    """ExportTarget from "path[:name=value,...]"."""
+    path, sep, opts = text.rpartition(":")
+    # Only a trailing "name=value" list counts, so "C:\out.png" stays a path
+    if not sep or "=" not in opts or os.sep in opts or "/" in opts:
+        return ExportTarget(text)
+    options = {}
+    for item in opts.split(","):
+        name, eq, value = item.partition("=")
+        if not eq:
+            raise ValueError(f"Bad option '{item}' in {text}; expected name=value")
+        options[name.strip()] = parse_value(value.strip())
+    return ExportTarget(path, options)
+
+
+# -------------------------------
+# Encoding and writing
+# -------------------------------
+def encode(img, ext, options=None):
+    """(encoded buffer, seconds) for img in format ext."""
+    flags = imwrite_flags(ext, options)
+    t0 = time.perf_counter()
+    ok, buf = cv2.imencode(canonical_ext(ext), img, flags)
+    if not ok:
+        raise ValueError(f"could not encode {img.shape} {img.dtype} as {ext}")
+    return buf, time.perf_counter() - t0
+
+
+def write_atomic(path, data):
+    """Write data to path via a temporary file in the same directory and os.replace."""
+    tmp = os.path.join(os.path.dirname(os.path.abspath(path)),
+                       f".{os.path.basename(path)}.{secrets.token_hex(4)}.tmp")
+    # Created like a plain open() would (umask applies), but never over an existing file
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o666)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def export_one(img, target, write=True, stop=None):
+    """Resize, encode and (optionally) write one target; returns its report.
+
+    If stop() turns true before the file is written, nothing is written and
+    the report's error is "cancelled".
+    """
+    h, w = img.shape[:2]
+    size = target.out_size(w, h)
+    report = {"path": target.path, "ext": target.ext, "settings": target.describe(), "size": size,
+              "bytes": 0, "encode_s": 0.0, "write_s": 0.0, "error": None}
+    try:
+        if stop is not None and stop():
+            raise ValueError("cancelled")
+        out = img
+        if size != (w, h):
+            out = resize(img, size, cv2.INTER_AREA if size[0] < w else cv2.INTER_CUBIC)
+        buf, report["encode_s"] = encode(out, target.ext, target.options)
+        report["bytes"] = buf.size
+        if stop is not None and stop():
+            raise ValueError("cancelled")
+        if write:
+            t0 = time.perf_counter()
+            write_atomic(target.path, buf)
+            report["write_s"] = time.perf_counter() - t0
+    except Exception as e:
+        report["error"] = str(e)
+    return report
+
+
+def export(img, targets, workers=None, write=True, progress=None, stop=None):
+    """Export img to every target in parallel; one report per target, in target order.
+
+    A failing target is reported (report["error"]) rather than raised, so
+    the others are still written. progress(done, total, report) is called
+    from the worker threads as each target finishes. stop() is polled
+    before each target and before each write, to abandon an export early.
+    """
+    if img is None or img.size == 0:
+        raise ValueError("Invalid image")
+    targets = list(targets)
+    if write:
+        paths = [os.path.abspath(t.path) for t in targets]
+        dupes = sorted({p for p in paths if paths.count(p) > 1})
+        if dupes:
+            raise ValueError("Several targets write " + ", ".join(dupes))
+    if not targets:
+        return []
+    workers = workers or min(len(targets), os.cpu_count() or 1)
+    done = 0
+    with ThreadPoolExecutor(workers, thread_name_prefix="export") as pool:
+        futures = [pool.submit(export_one, img, t, write, stop) for t in targets]
+        for fut in as_completed(futures):
+            done += 1
+            if progress is not None:
+                progress(done, len(targets), fut.result())
+    return [f.result() for f in futures]
+
+
+def format_report(reports):
+    """One line per target: path, settings, size, bytes and timings."""
+    lines = []
+    for r in reports:
+        name = os.path.basename(r["path"])
+        if r["error"]:
+            lines.append(f"{name}  {r['settings']}  FAILED: {r['error']}")
+            continue
+        w, h = r["size"]
+        lines.append(f"{name}  {r['settings']}  {w}x{h}  {r['bytes'] / 2**20:.2f} MB  "
+                     f"encode {r['encode_s'] * 1000:.1f} ms  write {r['write_s'] * 1000:.1f} ms")
+    return lines
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Write an image to several formats/sizes and report encode cost.")
+    ap.add_argument("input", help="source image")
+    ap.add_argument("targets", nargs="+", help="output path, optionally followed by :name=value,...")
+    ap.add_argument("--spec", help="JSON/YAML transform spec to apply before exporting")
+    ap.add_argument("--workers", type=int, default=None, help="targets encoded at once (default: CPU count)")
+    ap.add_argument("--dry-run", action="store_true", help="encode and report only; write nothing")
+    args = ap.parse_args(argv)
+
+    try:
+        targets = [parse_target(t) for t in args.targets]
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    img = cv2.imread(args.input, cv2.IMREAD_UNCHANGED)
+    if img is None or img.size == 0:
+        print(f"Could not read {args.input}", file=sys.stderr)
+        return 1
+    if args.spec:
+        from batch_transform import load_spec
+        from transform_engine import apply_chain
+        spec = load_spec(args.spec)
+        img = apply_chain(img, spec["steps"], spec["params"])
+
+    t0 = time.perf_counter()
+    try:
+        reports = export(img, targets, args.workers, write=not args.dry_run)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    elapsed = time.perf_counter() - t0
+    for line in format_report(reports):
+        print(line)
+    failed = sum(1 for r in reports if r["error"])
+    total = sum(r["bytes"] for r in reports if not r["error"])
+    print(f"{len(reports) - failed} {'encoded' if args.dry_run else 'written'}, {failed} failed, "
+          f"{total / 2**20:.2f} MB in {elapsed:.2f} s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import os
+import struct
+
+import numpy as np
+import cv2
+
+# -------------------------------
+# Image loading
+# -------------------------------
+# 16-bit and alpha inputs are read with IMREAD_UNCHANGED so they keep their
+# depth and channels end to end; only the on-screen pixels are ever
+# converted to 8-bit. OpenCV does not apply EXIF orientation to unchanged
+# reads, so everything else (every JPEG, opaque 8-bit PNG/WebP) is read
+# with IMREAD_ANYCOLOR | IMREAD_ANYDEPTH, which does, as a plain imread
+# and the reduced reads below do. The file header tells which is which.
+#
+# For big JPEGs a reduced-resolution decode (libjpeg scales during the
+# DCT, so it is several times faster) is available to show something at
+# once while the full decode runs in the background. It comes out in the
+# same orientation as the full decode.
+
+# Formats whose decoders can actually skip work at reduced resolution
+REDUCED_DECODE_EXTS = (".jpg", ".jpeg")
+
+# (minimum file size, reduced read mode), largest first
+REDUCED_MODES = [
+    (16 * 1024 * 1024, cv2.IMREAD_REDUCED_COLOR_8),
+    (4 * 1024 * 1024, cv2.IMREAD_REDUCED_COLOR_4),
+    (1 * 1024 * 1024, cv2.IMREAD_REDUCED_COLOR_2)
+]
+
+
+HEADER_BYTES = 64 * 1024
+
+
+def _png_keeps_extra(head):
+    # Chunks up to the first IDAT: IHDR has depth and colour type, tRNS adds alpha
+    pos = 8
+    while pos + 8 <= len(head):
+        length, kind = struct.unpack(">I4s", head[pos:pos + 8])
+        if kind == b"IHDR" and pos + 18 <= len(head):
+            depth, colour = head[pos + 16], head[pos + 17]
+            if depth == 16 or colour in (4, 6):
+                return True
+        elif kind == b"tRNS":
+            return True
+        elif kind == b"IDAT":
+            return False
+        pos += 12 + length
+    return True  # header runs past what was read: play safe
+
+
+def _webp_keeps_extra(head):
+    kind = head[12:16]
+    if kind == b"VP8X":
+        return bool(head[20] & 0x10) if len(head) > 20 else True
+    if kind == b"VP8L":
+        # 14-bit width and height, then the alpha_is_used bit
+        return bool(struct.unpack("<I", head[21:25])[0] >> 28 & 1) if len(head) >= 25 else True
+    return kind != b"VP8 "
+
+
+def keeps_extra(head):
+    """True when a file starting with head may hold 16-bit samples or alpha.
+
+    Those have to be read with IMREAD_UNCHANGED. Unknown formats count as
+    True, so they are read unchanged as before.
+    """
+    if head[:3] == b"\xff\xd8\xff":
+        return False
+    if head[:8] == b"\x89PNG\r\n\x1a\n":
+        return _png_keeps_extra(head)
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return _webp_keeps_extra(head)
+    return True
+
+
+def read_flags(path):
+    """imread flags for a full decode of path (see keeps_extra)."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(HEADER_BYTES)
+    except OSError:
+        return cv2.IMREAD_UNCHANGED
+    return cv2.IMREAD_UNCHANGED if keeps_extra(head) else cv2.IMREAD_ANYCOLOR | cv2.IMREAD_ANYDEPTH
+
+
+def read_image(path):
+    """Full-resolution decode, keeping bit depth and alpha; other images are EXIF-oriented."""
+    img = cv2.imread(path, read_flags(path))
+    if img is None or img.size == 0:
+        return None
+    if img.ndim == 3 and img.shape[2] == 1:
+        img = img[:, :, 0]
+    return img
+
+
+def read_reduced(path):
+    """Quick low-resolution 8-bit decode for a first look, or None when it wouldn't help."""
+    if not path.lower().endswith(REDUCED_DECODE_EXTS):
+        return None
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return None
+    for min_size, mode in REDUCED_MODES:
+        if size >= min_size:
+            img = cv2.imread(path, mode)
+            return img if img is not None and img.size > 0 else None
+    return None
+
+
+def to_display_depth(img):
+    """8-bit view of an image for the screen; 8-bit input is returned as is."""
+    if img.dtype == np.uint8:
+        return img
+    if img.dtype == np.uint16:
+        return cv2.convertScaleAbs(img, alpha=1 / 257.0)
+    return cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U)
@@ -1,15 +1,24 @@
 import sys
 import os
-import numpy as np
-import cv2
+import time
+STARTUP_T0 = time.perf_counter()
+import weakref
+from collections import OrderedDict
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QSlider, QComboBox, QGroupBox, QSpinBox,
     QFileDialog, QTabWidget, QFormLayout, QCheckBox, QScrollArea,
-    QFrame, QGridLayout, QMessageBox, QProgressBar
+    QFrame, QGridLayout, QMessageBox, QProgressBar, QListWidget, QSizePolicy, QLineEdit
 )
-from PyQt6.QtGui import QPixmap, QImage, QPalette, QColor, QFont, QIcon
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
+from PyQt6.QtGui import QPixmap, QImage, QPalette, QColor, QFont, QIcon, QKeySequence
+from PyQt6.QtCore import Qt, QObject, QSize, QTimer, pyqtSignal
+
+# numpy, OpenCV and the engine modules are deliberately not imported here:
+# together they take longer than Qt needs to put the window on screen.
+# Code that needs them imports them where it runs, and MainWindow.warm_up()
+# loads them all right after the first paint.
+import tracing
+from tracing import span, operation
 
 # -------------------------------
 # Translations (English & Persian)
@@ -20,6 +29,8 @@ translations = {
         "load": "Load Image",
         "save": "Save Result",
         "reset": "Reset",
+        "undo": "Undo",
+        "redo": "Redo",
         "language": "Language",
         "theme": "Theme",
         "apply": "Apply",
@@ -49,17 +60,32 @@ translations = {
         "reflect": "Reflect",
         "wrap": "Wrap",
         "border_val": "Border Value",
+        "add_step": "Add to Stack",
+        "clear_steps": "Clear Stack",
+        "stack": "Transform Stack",
+        "live": "Live Preview",
+        "trace": "Trace",
+        "export_trace": "Export Trace",
+        "cache_stats": "Cache: {hits} hits, {misses} misses, {evictions} evictions, {mb:.0f}/{budget:.0f} MB"
+                       " · Buffers: {buf_mb:.0f} MB, peak {peak_mb:.0f} MB, {reused} reused",
         "light": "Light Theme",
         "dark": "Dark Theme",
         "no_image": "No image loaded!",
         "save_ok": "Saved successfully!",
-        "save_fail": "Save failed."
+        "save_fail": "Save failed.",
+        "load_fail": "Could not read the image.",
+        "loading": "Loading full resolution…",
+        "export": "Export",
+        "exporting": "Exporting…",
+        "export_stats": "Exported {n} file(s), {mb:.2f} MB, {ms:.0f} ms encoding"
     },
     "fa": {
         "title": "استودیو تبدیل تصویر",
         "load": "بارگذاری تصویر",
         "save": "ذخیره نتیجه",
         "reset": "بازنشانی",
+        "undo": "واگرد",
+        "redo": "ازنو",
         "language": "زبان",
         "theme": "تم",
         "apply": "اعمال",
@@ -89,108 +115,178 @@ translations = {
         "reflect": "بازتاب",
         "wrap": "پیچش",
         "border_val": "مقدار حاشیه",
+        "add_step": "افزودن به پشته",
+        "clear_steps": "پاک کردن پشته",
+        "stack": "پشته تبدیل‌ها",
+        "live": "پیش‌نمایش زنده",
+        "trace": "ردیابی",
+        "export_trace": "خروجی ردیابی",
+        "cache_stats": "حافظه نهان: {hits} برخورد، {misses} عدم برخورد، {evictions} حذف، {mb:.0f}/{budget:.0f} مگابایت"
+                       " · بافرها: {buf_mb:.0f} مگابایت، اوج {peak_mb:.0f} مگابایت، {reused} استفاده مجدد",
         "light": "تم روشن",
         "dark": "تم تاریک",
         "no_image": "تصویری بارگذاری نشده!",
         "save_ok": "با موفقیت ذخیره شد!",
-        "save_fail": "ذخیره ناموفق بود."
+        "save_fail": "ذخیره ناموفق بود.",
+        "load_fail": "خواندن تصویر ممکن نشد.",
+        "loading": "در حال بارگذاری با وضوح کامل…",
+        "export": "خروجی",
+        "exporting": "در حال ذخیره…",
+        "export_stats": "{n} فایل ذخیره شد، {mb:.2f} مگابایت، {ms:.0f} میلی‌ثانیه رمزگذاری"
     }
 }
 
 # Language direction
 lang_dir = {"en": Qt.LayoutDirection.LeftToRight, "fa": Qt.LayoutDirection.RightToLeft}
 
-# Interpolation & Border
-interp_map = {
-    "nearest": cv2.INTER_NEAREST,
-    "linear": cv2.INTER_LINEAR,
-    "cubic": cv2.INTER_CUBIC,
-    "lanczos": cv2.INTER_LANCZOS4
-}
+# Live preview: proxy size (longest side) and debounce delay
+PREVIEW_MAX_SIDE = 1024
+PREVIEW_DELAY_MS = 60
+
+# Full-resolution results kept for repeat applies / A-B toggling
+RESULT_CACHE_MB = 512
+
+# Released preview/view outputs kept for reuse by the next render of the same size
+BUFFER_POOL_MB = 256
+
+# Undo history: keep a full-resolution snapshot every N states, within a cap
+HISTORY_KEYFRAME_INTERVAL = 5
+HISTORY_SNAPSHOT_MB = 256
+
+# Long-lived worker threads shared by previews and full renders; OpenCV's
+# own threads are split between them (None = cores / workers)
+SCHEDULER_WORKERS = 2
+SCHEDULER_CV_THREADS = None
+
+# Formats offered by the export panel (image_export.ENCODER_OPTIONS)
+EXPORT_FORMATS = [(".png", "PNG"), (".jpg", "JPEG"), (".webp", "WebP"), (".tif", "TIFF")]
+
+# Transform tabs, in order (same names as transform_engine.TRANSFORM_TYPES)
+TAB_TYPES = ["translation", "rotation", "scaling", "similarity", "affine", "perspective"]
+
+# -------------------------------
+# Startup timing
+# -------------------------------
+# python image_transform_studio.py --startup-time
+# prints how long each startup stage took, from the first line of this
+# module to the window being usable, and exits.
+startup_marks = []
+
+
+def mark(stage):
+    startup_marks.append((stage, time.perf_counter()))
 
-border_map = {
-    "constant": cv2.BORDER_CONSTANT,
-    "replicate": cv2.BORDER_REPLICATE,
-    "reflect": cv2.BORDER_REFLECT,
-    "wrap": cv2.BORDER_WRAP
-}
+
+def startup_report():
+    lines = [f"{'stage':14s}{'ms':>9s}{'total ms':>11s}"]
+    prev = STARTUP_T0
+    for stage, t in startup_marks:
+        lines.append(f"{stage:14s}{(t - prev) * 1000:9.1f}{(t - STARTUP_T0) * 1000:11.1f}")
+        prev = t
+    return "\n".join(lines)
 
 # -------------------------------
-# Worker Thread
+# Background Jobs
 # -------------------------------
-class TransformWorker(QThread):
-    finished = pyqtSignal(np.ndarray)
-    error = pyqtSignal(str)
+def render(img, steps, params, full_size=None, box=None, dst=None):
+    """Job body: full-resolution result, or a proxy render when full_size is set."""
+    from transform_engine import apply_chain, apply_chain_at
+    from scheduler import check_cancelled
+    check_cancelled()  # the warp itself is one OpenCV call and runs to its end
+    with span("warp", preview=full_size is not None):
+        if full_size is not None:
+            return apply_chain_at(img, steps, params, full_size, box, dst)
+        return apply_chain(img, steps, params, dst)
+
+
+def decode(path, max_side):
+    """Job body: full-resolution decode plus its fingerprint and display proxy."""
+    from transform_engine import fingerprint, make_proxy
+    from image_io import read_image
+    from scheduler import check_cancelled
+    with span("imread"):
+        img = read_image(path)
+    if img is None:
+        raise ValueError(path)
+    # Shared by the views, the history and every render, never copied
+    img.flags.writeable = False
+    check_cancelled()
+    with span("fingerprint"):
+        key = fingerprint(img)
+    check_cancelled()
+    with span("make_proxy"):
+        proxy = make_proxy(img, max_side)
+    return img, key, proxy
+
+
+def export_files(img, targets, progress):
+    """Job body: encode and write every export target, in parallel."""
+    from image_export import export
+    from scheduler import current_job, check_cancelled
+    # Polled from export's own threads, which have no current job
+    job = current_job()
+    with span("export", files=len(targets)):
+        reports = export(img, targets, progress=lambda done, total, report: progress(None, done),
+                         stop=lambda: job is not None and job.cancelled)
+    check_cancelled()
+    return reports
+
+
+class JobBridge(QObject):
+    """Hands scheduler callbacks from worker threads over to the GUI thread."""
+    delivered = pyqtSignal(object, object, object)  # callback, job, value
 
-    def __init__(self, img, typ, params):
+    def __init__(self):
         super().__init__()
-        self.img = img
-        self.typ = typ
-        self.params = params
+        self.delivered.connect(self.deliver)
 
-    def run(self):
-        try:
-            if self.img is None or self.img.size == 0:
-                raise ValueError("Invalid image")
-            h, w = self.img.shape[:2]
-            result = self.img.copy()
-            interp = self.params["interp"]
-            border = self.params["border"]
-            val = self.params["border_val"]
-
-            if self.typ == "translation":
-                M = np.float32([[1, 0, self.params["tx"]], [0, 1, self.params["ty"]]])
-                result = cv2.warpAffine(self.img, M, (w, h), flags=interp, borderMode=border, borderValue=val)
-
-            elif self.typ == "rotation":
-                cx = self.params.get("cx", w // 2)
-                cy = self.params.get("cy", h // 2)
-                M = cv2.getRotationMatrix2D((cx, cy), self.params["angle"], 1.0)
-                result = cv2.warpAffine(self.img, M, (w, h), flags=interp, borderMode=border, borderValue=val)
-
-            elif self.typ == "scaling":
-                sx = self.params["sx"] / 100.0
-                sy = self.params["sy"] / 100.0
-                new_w, new_h = int(w * sx), int(h * sy)
-                result = cv2.resize(self.img, (new_w, new_h), interpolation=interp)
-
-            elif self.typ == "similarity":
-                cx, cy = w // 2, h // 2
-                scale = self.params["scale"] / 100.0
-                M = cv2.getRotationMatrix2D((cx, cy), self.params["angle"], scale)
-                M[0, 2] += self.params["tx"]
-                M[1, 2] += self.params["ty"]
-                result = cv2.warpAffine(self.img, M, (w, h), flags=interp, borderMode=border, borderValue=val)
-
-            elif self.typ == "affine":
-                pts1 = np.float32([[50,50], [w-50,50], [50,h-50]])
-                pts2 = np.float32([
-                    [50 + self.params["tx1"], 50 + self.params["ty1"]],
-                    [w-50 + self.params["tx2"], 50 + self.params["ty2"]],
-                    [50 + self.params["tx3"], h-50 + self.params["ty3"]]
-                ])
-                M = cv2.getAffineTransform(pts1, pts2)
-                result = cv2.warpAffine(self.img, M, (w, h), flags=interp, borderMode=border, borderValue=val)
-
-            elif self.typ == "perspective":
-                pts1 = np.float32([[0,0], [w,0], [0,h], [w,h]])
-                pts2 = np.float32([
-                    [self.params["p1x"], self.params["p1y"]],
-                    [self.params["p2x"], self.params["p2y"]],
-                    [self.params["p3x"], self.params["p3y"]],
-                    [self.params["p4x"], self.params["p4y"]]
-                ])
-                M = cv2.getPerspectiveTransform(pts1, pts2)
-                result = cv2.warpPerspective(self.img, M, (w, h), flags=interp, borderMode=border, borderValue=val)
-
-            self.finished.emit(result)
-        except Exception as e:
-            self.error.emit(str(e))
+    def deliver(self, callback, job, value):
+        callback(job, value)
+
+    def __call__(self, callback):
+        return lambda job, value: self.delivered.emit(callback, job, value)
 
 # -------------------------------
 # Image Label
 # -------------------------------
+def to_pixmap(img):
+    """QPixmap from a BGR, BGRA or grayscale array, with no colour conversion.
+
+    The array is wrapped as a QImage in its native byte order and handed
+    straight to QPixmap.fromImage, which makes the only copy. 16-bit and
+    float images are brought to 8-bit here, for the screen only.
+    """
+    import numpy as np
+    import cv2
+    from image_io import to_display_depth
+    img = np.ascontiguousarray(to_display_depth(img))
+    if img.ndim == 3 and img.shape[2] == 1:
+        img = img[:, :, 0]
+    h, w = img.shape[:2]
+    if img.ndim == 2:
+        fmt = QImage.Format.Format_Grayscale8
+    elif img.shape[2] == 3:
+        fmt = QImage.Format.Format_BGR888
+    elif sys.byteorder == "little":
+        # BGRA bytes are exactly ARGB32 words on little-endian machines
+        fmt = QImage.Format.Format_ARGB32
+    else:
+        img = cv2.cvtColor(img, cv2.COLOR_BGRA2RGBA)
+        fmt = QImage.Format.Format_RGBA8888
+    return QPixmap.fromImage(QImage(img.data, w, h, img.strides[0], fmt))
+
+
 class ImageLabel(QLabel):
+    # Rendered views shared by all labels, so the same image shown twice
+    # (e.g. both labels right after load) is only rendered once.
+    view_cache = OrderedDict()
+    VIEW_CACHE_SIZE = 8
+    # While the window is being dragged larger/smaller we draw a cheap
+    # version and redo it smoothly once the size has settled.
+    RESIZE_SETTLE_MS = 150
+    # Output arrays for view renders; set by MainWindow.warm_up()
+    buffers = None
+
     def __init__(self):
         super().__init__()
         self.setAlignment(Qt.AlignmentFlag.AlignCenter)
@@ -202,31 +298,146 @@ class ImageLabel(QLabel):
             font: 12pt 'Segoe UI';
             color: #2c3e50;
         """)
+        # The pixmap always matches our size; don't let it push the layout around
+        self.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Ignored)
+        self.view = None
+        self.pix = None
+        self.shown = None  # (box, smooth) currently on screen
+        self.settle = QTimer(self)
+        self.settle.setSingleShot(True)
+        self.settle.setInterval(self.RESIZE_SETTLE_MS)
+        self.settle.timeout.connect(lambda: self.refresh(True))
+
+    def view_box(self):
+        r = self.contentsRect()
+        return max(1, r.width()), max(1, r.height())
+
+    def set_view(self, original, steps=(), params=None, proxy=None):
+        """Show original transformed by steps, warped straight to the label size.
+
+        Only the on-screen pixels are computed; it is re-rendered on resize.
+        """
+        self.view = (original, list(steps), params, proxy)
+        self.pix = None
+        self.shown = None
+        self.refresh(True)
 
     def set_image(self, img):
         if img is None: return
-        rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb.shape
-        qimg = QImage(rgb.data, w, h, ch * w, QImage.Format.Format_RGB888)
-        pix = QPixmap.fromImage(qimg)
-        scaled = pix.scaled(self.size(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-        self.setPixmap(scaled)
+        self.view = None
+        with span("to_pixmap"):
+            self.pix = to_pixmap(img)
+        self.shown = None
+        self.refresh(True)
+
+    def refresh(self, smooth):
+        if self.view is None and self.pix is None:
+            return
+        box = self.view_box()
+        if self.shown == (box, smooth) or (not smooth and self.shown and self.shown[0] == box):
+            return
+        if self.view is not None:
+            pix = self.render_view(box, smooth)
+        else:
+            mode = Qt.TransformationMode.SmoothTransformation if smooth else Qt.TransformationMode.FastTransformation
+            with span("scale_pixmap", smooth=smooth):
+                pix = self.pix.scaled(QSize(*box), Qt.AspectRatioMode.KeepAspectRatio, mode)
+        self.setPixmap(pix)
+        self.shown = (box, smooth)
+
+    def render_view(self, box, smooth):
+        from transform_engine import display_source, apply_chain_at
+        original, steps, params, proxy = self.view
+        if not smooth:
+            params = dict(params or {}, interp="nearest")
+        key = (id(original), repr(steps), repr(sorted((params or {}).items())), box)
+        hit = self.view_cache.get(key)
+        if hit is not None and hit[0]() is original:
+            self.view_cache.move_to_end(key)
+            return hit[1]
+        src = display_source(original, proxy, steps, box)
+        h, w = original.shape[:2]
+        with span("view_warp", smooth=smooth):
+            img = apply_chain_at(src, steps, params, (w, h), box, self.buffers)
+        with span("to_pixmap"):
+            pix = to_pixmap(img)
+        if self.buffers is not None:
+            self.buffers.release(img)  # the pixmap is a copy
+        self.view_cache[key] = (weakref.ref(original), pix)
+        while len(self.view_cache) > self.VIEW_CACHE_SIZE:
+            self.view_cache.popitem(last=False)
+        return pix
+
+    def resizeEvent(self, e):
+        super().resizeEvent(e)
+        if self.view is not None or self.pix is not None:
+            self.refresh(False)
+            self.settle.start()
+
+    def clear_view(self):
+        self.view = None
+        self.pix = None
+        self.shown = None
+        self.clear()
 
 # -------------------------------
 # Main Window
 # -------------------------------
 class MainWindow(QMainWindow):
+    ready = pyqtSignal()  # warm_up() is done: engine loaded, workers running
+
     def __init__(self):
         super().__init__()
         self.lang = "en"
         self.theme = "light"
         self.original = None
         self.result = None
-        self.worker = None
+        self.result_steps = []
+        self.result_params = None
+        self.original_key = None
+        # Created by warm_up(), once the window is on screen
+        self.result_cache = None
+        self.buffers = None
+        self.history = None
+        self.scheduler = None
+        self.painted = False
+        self.bridge = JobBridge()
+        self.steps = []
+        self.proxy = None
+        self.rendering = False
+        self.loading = False
+        self.exporting = False
         self.init_ui()
         self.apply_theme()
         self.apply_lang()
 
+    def paintEvent(self, e):
+        super().paintEvent(e)
+        if not self.painted:
+            self.painted = True
+            mark("first paint")
+            QTimer.singleShot(0, self.warm_up)
+
+    def warm_up(self):
+        """Load numpy/OpenCV/the engine and start the workers; safe to call again."""
+        if self.scheduler is not None:
+            return
+        import image_io  # the first load needs it straight away
+        from transform_engine import ResultCache, BufferPool
+        from transform_history import TransformHistory
+        from scheduler import JobScheduler
+        self.result_cache = ResultCache(RESULT_CACHE_MB * 1024 * 1024)
+        # Previews and views draw their outputs from here and hand them back
+        # once turned into a pixmap, so re-rendering reuses memory instead of
+        # mapping more. Full renders live on in the cache and the history,
+        # so they get their own arrays.
+        self.buffers = BufferPool(BUFFER_POOL_MB * 1024 * 1024)
+        ImageLabel.buffers = self.buffers
+        self.history = TransformHistory(HISTORY_KEYFRAME_INTERVAL, HISTORY_SNAPSHOT_MB * 1024 * 1024)
+        self.scheduler = JobScheduler(SCHEDULER_WORKERS, SCHEDULER_CV_THREADS)
+        mark("warm-up")
+        self.ready.emit()
+
     def init_ui(self):
         self.setWindowTitle("Image Transform Studio")
         self.setMinimumSize(1500, 900)
@@ -259,6 +470,13 @@ class MainWindow(QMainWindow):
         top_l.addWidget(self.lang_cb)
         top_l.addWidget(QLabel("Theme:"))
         top_l.addWidget(self.theme_cb)
+        self.trace_cb = QCheckBox()
+        self.trace_cb.toggled.connect(self.toggle_trace)
+        self.export_trace_btn = QPushButton()
+        self.export_trace_btn.clicked.connect(self.export_trace)
+        self.export_trace_btn.setEnabled(False)
+        top_l.addWidget(self.trace_cb)
+        top_l.addWidget(self.export_trace_btn)
         layout.addWidget(top)
 
         # File Buttons
@@ -273,6 +491,15 @@ class MainWindow(QMainWindow):
         file_l.addWidget(self.load_btn)
         file_l.addWidget(self.save_btn)
         file_l.addWidget(self.reset_btn)
+        self.undo_btn = QPushButton()
+        self.undo_btn.clicked.connect(self.undo)
+        self.undo_btn.setShortcut(QKeySequence.StandardKey.Undo)
+        self.redo_btn = QPushButton()
+        self.redo_btn.clicked.connect(self.redo)
+        self.redo_btn.setShortcut(QKeySequence.StandardKey.Redo)
+        self.undo_btn.setEnabled(False); self.redo_btn.setEnabled(False)
+        file_l.addWidget(self.undo_btn)
+        file_l.addWidget(self.redo_btn)
         layout.addWidget(file_box)
 
         # Tabs
@@ -294,6 +521,61 @@ class MainWindow(QMainWindow):
         g_l.addRow(QLabel("Value:"), self.border_val)
         layout.addWidget(global_box)
 
+        # Export
+        self.export_box = QGroupBox()
+        e_l = QFormLayout(self.export_box)
+        self.png_level = QSpinBox(); self.png_level.setRange(0, 9); self.png_level.setValue(1)
+        self.jpg_quality = QSpinBox(); self.jpg_quality.setRange(0, 100); self.jpg_quality.setValue(95)
+        self.jpg_progressive = QCheckBox("Progressive")
+        jpg_row = QHBoxLayout(); jpg_row.addWidget(self.jpg_quality); jpg_row.addWidget(self.jpg_progressive)
+        self.webp_quality = QSpinBox(); self.webp_quality.setRange(1, 101); self.webp_quality.setValue(101)
+        self.webp_quality.setToolTip("101 = lossless")
+        self.tif_comp = QComboBox(); self.tif_comp.addItems(["LZW", "Deflate", "PackBits", "None"])
+        also_row = QHBoxLayout()
+        self.also_cbs = {}
+        for ext, name in EXPORT_FORMATS:
+            self.also_cbs[ext] = QCheckBox(name)
+            also_row.addWidget(self.also_cbs[ext])
+        self.export_sizes = QLineEdit("100")
+        self.export_sizes.setToolTip("Comma-separated percentages, e.g. 100, 50, 25")
+        e_l.addRow(QLabel("PNG Level:"), self.png_level)
+        e_l.addRow(QLabel("JPEG Quality:"), jpg_row)
+        e_l.addRow(QLabel("WebP Quality:"), self.webp_quality)
+        e_l.addRow(QLabel("TIFF:"), self.tif_comp)
+        e_l.addRow(QLabel("Also Save:"), also_row)
+        e_l.addRow(QLabel("Sizes (%):"), self.export_sizes)
+        layout.addWidget(self.export_box)
+
+        # Transform Stack
+        self.stack_box = QGroupBox()
+        s_l = QVBoxLayout(self.stack_box)
+        self.stack_list = QListWidget()
+        self.stack_list.setMaximumHeight(120)
+        stack_btns = QHBoxLayout()
+        self.add_step_btn = QPushButton()
+        self.add_step_btn.clicked.connect(self.add_step)
+        self.clear_steps_btn = QPushButton()
+        self.clear_steps_btn.clicked.connect(self.clear_steps)
+        stack_btns.addWidget(self.add_step_btn)
+        stack_btns.addWidget(self.clear_steps_btn)
+        s_l.addWidget(self.stack_list)
+        s_l.addLayout(stack_btns)
+        layout.addWidget(self.stack_box)
+
+        # Live preview
+        self.live_cb = QCheckBox()
+        self.live_cb.toggled.connect(self.schedule_preview)
+        layout.addWidget(self.live_cb)
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(PREVIEW_DELAY_MS)
+        self.preview_timer.timeout.connect(self.run_preview)
+        self.border_val.valueChanged.connect(self.schedule_preview)
+        self.border_val.editingFinished.connect(self.commit_preview)
+        for w in [self.interp_cb, self.border_cb]:
+            w.currentIndexChanged.connect(self.schedule_preview)
+        self.tabs.currentChanged.connect(self.schedule_preview)
+
         # Apply
         self.apply_btn = QPushButton()
         self.apply_btn.clicked.connect(self.apply)
@@ -319,9 +601,51 @@ class MainWindow(QMainWindow):
         r_l.addWidget(self.res_lbl, 1, 1)
         main_layout.addWidget(right, 3)
 
+        self.trace_lbl = QLabel()
+        self.statusBar().addPermanentWidget(self.trace_lbl)
+
     def create_tabs(self):
-        # Translation
-        t1 = QWidget(); l1 = QFormLayout(t1)
+        # Empty pages for now; each tab's widgets are built the first time
+        # it is selected (the first one straight away).
+        self.tab_builders = [self.build_translation_tab, self.build_rotation_tab, self.build_scaling_tab,
+                             self.build_similarity_tab, self.build_affine_tab, self.build_perspective_tab]
+        self.tabs_built = set()
+        for typ in TAB_TYPES:
+            self.tabs.addTab(QWidget(), translations["en"][typ])
+        self.tabs.currentChanged.connect(self.ensure_tab)
+        self.ensure_tab(0)
+
+    def ensure_tab(self, i):
+        if i < 0 or i in self.tabs_built:
+            return
+        self.tabs_built.add(i)
+        page = self.tabs.widget(i)
+        self.tab_builders[i](page)
+        # Live preview follows every control on the tab
+        for w in page.findChildren(QSlider):
+            w.valueChanged.connect(self.schedule_preview)
+            w.sliderReleased.connect(self.commit_preview)
+        for w in page.findChildren(QSpinBox):
+            w.valueChanged.connect(self.schedule_preview)
+            w.editingFinished.connect(self.commit_preview)
+        for w in page.findChildren(QCheckBox):
+            w.toggled.connect(self.schedule_preview)
+        self.fit_tab(i)
+
+    def fit_tab(self, i):
+        """Image-size dependent ranges and defaults, for a tab that has been built."""
+        if self.original is None or i not in self.tabs_built:
+            return
+        h, w = self.original.shape[:2]
+        if TAB_TYPES[i] == "rotation":
+            self.cx_n.setRange(0, w); self.cy_n.setRange(0, h)
+            if self.auto_c.isChecked():
+                self.cx_n.setValue(w//2); self.cy_n.setValue(h//2)
+        elif TAB_TYPES[i] == "perspective":
+            self.p2x.setValue(w); self.p3y.setValue(h); self.p4x.setValue(w); self.p4y.setValue(h)
+
+    def build_translation_tab(self, page):
+        l1 = QFormLayout(page)
         self.tx_s = QSlider(Qt.Orientation.Horizontal); self.tx_s.setRange(-1000, 1000)
         self.tx_n = QSpinBox(); self.tx_n.setRange(-1000, 1000)
         self.tx_s.valueChanged.connect(self.tx_n.setValue); self.tx_n.valueChanged.connect(self.tx_s.setValue)
@@ -330,10 +654,9 @@ class MainWindow(QMainWindow):
         self.ty_s.valueChanged.connect(self.ty_n.setValue); self.ty_n.valueChanged.connect(self.ty_s.setValue)
         l1.addRow(QLabel("X:"), self.tx_s); l1.addRow("", self.tx_n)
         l1.addRow(QLabel("Y:"), self.ty_s); l1.addRow("", self.ty_n)
-        self.tabs.addTab(t1, "Translation")
 
-        # Rotation
-        t2 = QWidget(); l2 = QFormLayout(t2)
+    def build_rotation_tab(self, page):
+        l2 = QFormLayout(page)
         self.ang_s = QSlider(Qt.Orientation.Horizontal); self.ang_s.setRange(-180, 180)
         self.ang_n = QSpinBox(); self.ang_n.setRange(-180, 180)
         self.ang_s.valueChanged.connect(self.ang_n.setValue); self.ang_n.valueChanged.connect(self.ang_s.setValue)
@@ -343,10 +666,9 @@ class MainWindow(QMainWindow):
         l2.addRow(QLabel("Angle:"), self.ang_s); l2.addRow("", self.ang_n)
         l2.addRow(QLabel("Center X:"), self.cx_n); l2.addRow(QLabel("Center Y:"), self.cy_n)
         l2.addRow(QLabel("Auto:"), self.auto_c)
-        self.tabs.addTab(t2, "Rotation")
 
-        # Scaling
-        t3 = QWidget(); l3 = QFormLayout(t3)
+    def build_scaling_tab(self, page):
+        l3 = QFormLayout(page)
         self.sx_s = QSlider(Qt.Orientation.Horizontal); self.sx_s.setRange(10, 500); self.sx_s.setValue(100)
         self.sx_n = QSpinBox(); self.sx_n.setRange(10, 500); self.sx_n.setValue(100)
         self.sx_s.valueChanged.connect(self.sx_n.setValue); self.sx_n.valueChanged.connect(self.sx_s.setValue)
@@ -358,10 +680,9 @@ class MainWindow(QMainWindow):
         l3.addRow(QLabel("X (%):"), self.sx_s); l3.addRow("", self.sx_n)
         l3.addRow(QLabel("Y (%):"), self.sy_s); l3.addRow("", self.sy_n)
         l3.addRow(QLabel("Keep Aspect:"), self.keep_a)
-        self.tabs.addTab(t3, "Scaling")
 
-        # Similarity
-        t4 = QWidget(); l4 = QFormLayout(t4)
+    def build_similarity_tab(self, page):
+        l4 = QFormLayout(page)
         self.sim_a_s = QSlider(Qt.Orientation.Horizontal); self.sim_a_s.setRange(-180, 180)
         self.sim_a_n = QSpinBox(); self.sim_a_n.setRange(-180, 180)
         self.sim_a_s.valueChanged.connect(self.sim_a_n.setValue); self.sim_a_n.valueChanged.connect(self.sim_a_s.setValue)
@@ -373,10 +694,9 @@ class MainWindow(QMainWindow):
         l4.addRow(QLabel("Angle:"), self.sim_a_s); l4.addRow("", self.sim_a_n)
         l4.addRow(QLabel("Scale:"), self.sim_sc_s); l4.addRow("", self.sim_sc_n)
         l4.addRow(QLabel("X:"), self.sim_tx); l4.addRow(QLabel("Y:"), self.sim_ty)
-        self.tabs.addTab(t4, "Similarity")
 
-        # Affine
-        t5 = QWidget(); l5 = QFormLayout(t5)
+    def build_affine_tab(self, page):
+        l5 = QFormLayout(page)
         self.a_tx1 = QSpinBox(); self.a_tx1.setRange(-300, 300)
         self.a_ty1 = QSpinBox(); self.a_ty1.setRange(-300, 300)
         self.a_tx2 = QSpinBox(); self.a_tx2.setRange(-300, 300)
@@ -386,10 +706,9 @@ class MainWindow(QMainWindow):
         l5.addRow(QLabel("Top-L ΔX:"), self.a_tx1); l5.addRow(QLabel("ΔY:"), self.a_ty1)
         l5.addRow(QLabel("Top-R ΔX:"), self.a_tx2); l5.addRow(QLabel("ΔY:"), self.a_ty2)
         l5.addRow(QLabel("Bot-L ΔX:"), self.a_tx3); l5.addRow(QLabel("ΔY:"), self.a_ty3)
-        self.tabs.addTab(t5, "Affine")
 
-        # Perspective
-        t6 = QWidget(); g6 = QGridLayout(t6)
+    def build_perspective_tab(self, page):
+        g6 = QGridLayout(page)
         self.p1x = QSpinBox(); self.p1x.setRange(0, 2000)
         self.p1y = QSpinBox(); self.p1y.setRange(0, 2000)
         self.p2x = QSpinBox(); self.p2x.setRange(0, 2000); self.p2x.setValue(500)
@@ -406,58 +725,204 @@ class MainWindow(QMainWindow):
         g6.addWidget(QLabel("P3 Y:"), 2, 2); g6.addWidget(self.p3y, 2, 3)
         g6.addWidget(QLabel("P4 X:"), 3, 0); g6.addWidget(self.p4x, 3, 1)
         g6.addWidget(QLabel("P4 Y:"), 3, 2); g6.addWidget(self.p4y, 3, 3)
-        self.tabs.addTab(t6, "Perspective")
 
     def load(self):
-        path, _ = QFileDialog.getOpenFileName(self, "Open", "", "Images (*.png *.jpg *.jpeg *.bmp)")
+        path, _ = QFileDialog.getOpenFileName(self, "Open", "", "Images (*.png *.jpg *.jpeg *.bmp *.tif *.tiff *.webp)")
         if path:
-            img = cv2.imread(path)
-            if img is not None and img.size > 0:
-                self.original = img
-                self.result = img.copy()
-                self.orig_lbl.set_image(img)
-                self.res_lbl.set_image(img)
-                h, w = img.shape[:2]
-                self.cx_n.setRange(0, w); self.cy_n.setRange(0, h)
-                if self.auto_c.isChecked():
-                    self.cx_n.setValue(w//2); self.cy_n.setValue(h//2)
-                self.p2x.setValue(w); self.p3y.setValue(h); self.p4x.setValue(w); self.p4y.setValue(h)
+            self.warm_up()
+            from image_io import read_reduced
+            from scheduler import RENDER
+            with operation("load"):
+                # Nothing queued for the old image is wanted any more
+                self.scheduler.cancel("preview"); self.scheduler.cancel("result")
+                self.preview_timer.stop()
+                self.rendering = False
+                self.loading = True
+                self.progress.setVisible(True); self.progress.setRange(0, 0)
+                for b in (self.apply_btn, self.save_btn, self.reset_btn, self.undo_btn, self.redo_btn):
+                    b.setEnabled(False)
+                # A reduced decode is on screen almost at once; the full one
+                # replaces it when the worker is done.
+                with span("imread_reduced"):
+                    quick = read_reduced(path)
+                if quick is not None:
+                    self.orig_lbl.set_view(quick)
+                    self.res_lbl.set_view(quick)
+                self.statusBar().showMessage(translations[self.lang]["loading"])
+                self.scheduler.submit(
+                    decode, path, PREVIEW_MAX_SIDE, priority=RENDER, target="load",
+                    on_done=self.bridge(self.on_loaded), on_error=self.bridge(self.on_load_error))
+            self.show_trace()
+
+    def on_loaded(self, job, result):
+        if not self.scheduler.is_current(job):
+            return
+        img, key, proxy = result
+        with span("on_loaded"):
+            self.original = img
+            self.original_key = key
+            self.proxy = proxy
+            self.history.reset(img)
+            self.finish_load()
+            self.orig_lbl.set_view(img, proxy=self.proxy)
+            self.show_state(self.history.current)
+            for i in self.tabs_built:
+                self.fit_tab(i)
+        self.statusBar().clearMessage()
+        self.show_trace()
+
+    def on_load_error(self, job, e):
+        if not self.scheduler.is_current(job):
+            return
+        self.finish_load()
+        self.statusBar().clearMessage()
+        # Put back whatever was showing before the quick preview
+        if self.original is not None:
+            self.orig_lbl.set_view(self.original, proxy=self.proxy)
+            self.show_state(self.history.current)
+        else:
+            self.orig_lbl.clear_view()
+            self.res_lbl.clear_view()
+        QMessageBox.warning(self, "Warning", translations[self.lang]["load_fail"])
+
+    def finish_load(self):
+        self.loading = False
+        self.progress.setVisible(False)
+        self.apply_btn.setEnabled(True); self.save_btn.setEnabled(True); self.reset_btn.setEnabled(True)
 
     def save(self):
-        if self.result is None or self.result.size == 0:
+        if self.original is None or self.original.size == 0:
             QMessageBox.warning(self, "Warning", translations[self.lang]["no_image"])
             return
-        path, _ = QFileDialog.getSaveFileName(self, "Save", "", "PNG (*.png);;JPEG (*.jpg)")
+        if self.exporting:
+            return
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Save", "", "PNG (*.png);;JPEG (*.jpg *.jpeg);;WebP (*.webp);;TIFF (*.tif *.tiff)")
         if path:
-            success = cv2.imwrite(path, self.result)
-            QMessageBox.information(self, "Info", translations[self.lang]["save_ok"] if success else translations[self.lang]["save_fail"])
+            with operation("save"):
+                self.render_full(lambda img: self.export_result(path, img))
+
+    # -------------------------------
+    # Export
+    # -------------------------------
+    def encoder_options(self, ext):
+        return {
+            ".png": {"compression": self.png_level.value()},
+            ".jpg": {"quality": self.jpg_quality.value(), "progressive": int(self.jpg_progressive.isChecked())},
+            ".webp": {"quality": self.webp_quality.value()},
+            ".tif": {"compression": self.tif_comp.currentText().lower()}
+        }.get(ext, {})
+
+    def export_targets(self, path):
+        """The chosen file plus every ticked extra format, at every size listed."""
+        from image_export import ExportTarget, canonical_ext
+        base, ext = os.path.splitext(path)
+        if not ext:
+            ext = ".png"
+            path += ext
+        main = canonical_ext(ext)
+        sizes = []
+        for part in self.export_sizes.text().split(","):
+            part = part.strip().rstrip("%").strip()
+            if not part:
+                continue
+            if not part.isdigit() or int(part) == 0:
+                raise ValueError(f"Bad size '{part}': use whole percentages, e.g. 100, 50")
+            sizes.append(int(part))
+        targets = []
+        for pct in sizes or [100]:
+            suffix = "" if pct == 100 else f"_{pct}"
+            targets.append(ExportTarget(base + suffix + ext, self.encoder_options(main), pct / 100))
+            for e, cb in self.also_cbs.items():
+                if cb.isChecked() and e != main:
+                    targets.append(ExportTarget(base + suffix + e, self.encoder_options(e), pct / 100))
+        return targets
+
+    def export_result(self, path, img):
+        from scheduler import EXPORT
+        try:
+            targets = self.export_targets(path)
+        except ValueError as e:
+            QMessageBox.warning(self, "Warning", str(e))
+            return
+        self.exporting = True
+        self.save_btn.setEnabled(False)
+        self.progress.setVisible(True); self.progress.setRange(0, len(targets)); self.progress.setValue(0)
+        self.statusBar().showMessage(translations[self.lang]["exporting"])
+        self.scheduler.submit(
+            export_files, img, targets, self.bridge(self.on_export_progress),
+            priority=EXPORT, target="export",
+            on_done=self.bridge(self.on_exported), on_error=self.bridge(self.on_export_error))
+
+    def on_export_progress(self, job, done):
+        self.progress.setValue(done)
+
+    def on_exported(self, job, reports):
+        from image_export import format_report
+        self.finish_export()
+        t = translations[self.lang]
+        ok = [r for r in reports if not r["error"]]
+        self.statusBar().showMessage(t["export_stats"].format(
+            n=len(ok), mb=sum(r["bytes"] for r in ok) / 2**20, ms=sum(r["encode_s"] for r in ok) * 1000))
+        self.show_trace()
+        details = "\n\n" + "\n".join(format_report(reports))
+        if len(ok) == len(reports):
+            QMessageBox.information(self, "Info", t["save_ok"] + details)
+        else:
+            QMessageBox.warning(self, "Warning", t["save_fail"] + details)
+
+    def on_export_error(self, job, e):
+        self.finish_export()
+        self.statusBar().clearMessage()
+        QMessageBox.critical(self, "Error", e)
+
+    def finish_export(self):
+        self.exporting = False
+        self.progress.setVisible(False)
+        self.save_btn.setEnabled(True)
 
     def reset(self):
         if self.original is not None and self.original.size > 0:
-            self.result = self.original.copy()
-            self.res_lbl.set_image(self.result)
+            self.show_state(self.history.push([], None))
 
-    def apply(self):
-        if self.original is None or self.original.size == 0:
-            QMessageBox.warning(self, "Warning", translations[self.lang]["no_image"])
-            return
+    def undo(self):
+        entry = self.history.undo()
+        if entry is not None:
+            self.show_state(entry)
 
+    def redo(self):
+        entry = self.history.redo()
+        if entry is not None:
+            self.show_state(entry)
+
+    def show_state(self, entry):
+        """Display a history state; its full-resolution image is only rebuilt on save."""
+        self.scheduler.cancel("preview")
+        self.preview_timer.stop()
+        self.result_steps = entry.steps
+        self.result_params = entry.params
+        self.result = self.history.snapshot()
+        if self.result is None:
+            self.result = self.result_cache.get(self.result_key())
+            self.show_cache_stats()
+        self.res_lbl.set_view(self.original, self.result_steps, self.result_params, self.proxy)
+        self.undo_btn.setEnabled(self.history.can_undo())
+        self.redo_btn.setEnabled(self.history.can_redo())
+
+    def current_step(self):
         idx = self.tabs.currentIndex()
-        types = ["translation", "rotation", "scaling", "similarity", "affine", "perspective"]
-        typ = types[idx]
-        params = {
-            "interp": interp_map[self.interp_cb.currentText().lower()],
-            "border": border_map[self.border_cb.currentText().lower()],
-            "border_val": self.border_val.value()
-        }
+        self.ensure_tab(idx)
+        typ = TAB_TYPES[idx]
+        params = {}
 
         if typ == "translation":
             params["tx"] = self.tx_n.value()
             params["ty"] = self.ty_n.value()
         elif typ == "rotation":
             params["angle"] = self.ang_n.value()
-            params["cx"] = self.cx_n.value() if not self.auto_c.isChecked() else self.original.shape[1] // 2
-            params["cy"] = self.cy_n.value() if not self.auto_c.isChecked() else self.original.shape[0] // 2
+            if not self.auto_c.isChecked():
+                params["cx"] = self.cx_n.value()
+                params["cy"] = self.cy_n.value()
         elif typ == "scaling":
             params["sx"] = self.sx_n.value()
             params["sy"] = self.sy_n.value() if not self.keep_a.isChecked() else self.sx_n.value()
@@ -479,18 +944,146 @@ class MainWindow(QMainWindow):
                 "p3x": self.p3x.value(), "p3y": self.p3y.value(),
                 "p4x": self.p4x.value(), "p4y": self.p4y.value()
             })
+        return typ, params
+
+    def global_params(self):
+        return {
+            # By name: normalize_params maps them to OpenCV flags
+            "interp": self.interp_cb.currentText().lower(),
+            "border": self.border_cb.currentText().lower(),
+            "border_val": self.border_val.value()
+        }
+
+    def add_step(self):
+        typ, params = self.current_step()
+        self.steps.append((typ, params))
+        desc = ", ".join(f"{k}={v}" for k, v in params.items())
+        self.stack_list.addItem(f"{len(self.steps)}. {translations[self.lang][typ]} ({desc})")
+
+    def clear_steps(self):
+        self.steps = []
+        self.stack_list.clear()
+
+    def pending_steps(self):
+        # A queued stack is fused into one warp; otherwise apply the current tab.
+        return list(self.steps) if self.steps else [self.current_step()]
+
+    def apply(self):
+        if self.original is None or self.original.size == 0:
+            QMessageBox.warning(self, "Warning", translations[self.lang]["no_image"])
+            return
+
+        # Only the on-screen pixels are warped here; the full-resolution
+        # result is rendered on demand by save().
+        with operation("apply"):
+            self.show_state(self.history.push(self.pending_steps(), self.global_params()))
+        self.show_trace()
+
+    def result_key(self):
+        from transform_engine import transform_key
+        return self.original_key, transform_key(self.result_steps, self.result_params)
 
-        self.progress.setVisible(True); self.progress.setRange(0, 0); self.apply_btn.setEnabled(False)
-        self.worker = TransformWorker(self.original, typ, params)
-        self.worker.finished.connect(self.on_done)
-        self.worker.error.connect(lambda e: QMessageBox.critical(self, "Error", e))
-        self.worker.start()
+    def show_cache_stats(self):
+        st = self.result_cache.stats()
+        bst = self.buffers.stats()
+        self.statusBar().showMessage(translations[self.lang]["cache_stats"].format(
+            hits=st["hits"], misses=st["misses"], evictions=st["evictions"],
+            mb=st["bytes"] / 2**20, budget=st["budget"] / 2**20,
+            buf_mb=bst["bytes"] / 2**20, peak_mb=bst["high_water"] / 2**20, reused=bst["reused"]))
+
+    def render_full(self, then):
+        if self.result is not None:
+            then(self.result)
+            return
+        if self.rendering:
+            return
 
-    def on_done(self, img):
-        self.result = img
-        self.res_lbl.set_image(img)
+        from scheduler import RENDER
+        self.rendering = True
+        self.progress.setVisible(True); self.progress.setRange(0, 0)
+        self.apply_btn.setEnabled(False); self.save_btn.setEnabled(False)
+        # The state is captured as its entry: by the time the render lands,
+        # undo plus a new edit may have put another state at this index
+        key, index, entry = self.result_key(), self.history.pos, self.history.current
+        self.scheduler.submit(
+            render, self.original, entry.steps, entry.params, None, None, None,
+            priority=RENDER, target="result",
+            on_done=self.bridge(lambda job, img: self.on_done(img, key, index, entry, then)),
+            on_error=self.bridge(lambda job, e: self.on_error(e)))
+
+    def on_done(self, img, key, index, entry, then):
+        with span("on_done"):
+            if key == self.result_key():
+                self.result = img
+            self.history.store(index, entry, img)
+            if key[1][0]:
+                self.result_cache.put(key, img)
+                self.show_cache_stats()
+            self.finish_render()
+        self.show_trace()
+        then(img)
+
+    def on_error(self, e):
+        self.finish_render()
+        QMessageBox.critical(self, "Error", e)
+
+    def finish_render(self):
+        self.rendering = False
         self.progress.setVisible(False)
-        self.apply_btn.setEnabled(True)
+        self.apply_btn.setEnabled(True); self.save_btn.setEnabled(True)
+
+    # -------------------------------
+    # Tracing
+    # -------------------------------
+    def toggle_trace(self, on):
+        tracing.enable(on)
+        self.export_trace_btn.setEnabled(on)
+        if not on:
+            self.trace_lbl.clear()
+
+    def show_trace(self):
+        if tracing.is_enabled():
+            self.trace_lbl.setText(tracing.format_summary())
+
+    def export_trace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Trace", "trace.json", "Trace (*.json)")
+        if path:
+            tracing.export_chrome_trace(path)
+
+    # -------------------------------
+    # Live preview
+    # -------------------------------
+    def schedule_preview(self, *_):
+        if self.live_cb.isChecked() and self.proxy is not None and not self.loading:
+            self.preview_timer.start()  # restarts: only the last change in a burst renders
+
+    def run_preview(self):
+        if self.proxy is None or self.loading:
+            return
+        # Replaces any queued preview; one already running is left to finish
+        # but its result is dropped as stale.
+        from scheduler import PREVIEW
+        h, w = self.original.shape[:2]
+        with operation("preview"):
+            self.scheduler.submit(
+                render, self.proxy, self.pending_steps(), self.global_params(), (w, h), self.res_lbl.view_box(),
+                self.buffers, priority=PREVIEW, target="preview", on_done=self.bridge(self.on_preview_done))
+
+    def on_preview_done(self, job, img):
+        if self.scheduler.is_current(job):
+            self.res_lbl.set_image(img)
+            self.show_trace()
+        self.buffers.release(img)  # set_image keeps only a pixmap copy
+
+    def commit_preview(self):
+        # Settle on the exact view once the user lets go of a control
+        if self.live_cb.isChecked() and self.original is not None and not self.loading:
+            self.apply()
+
+    def closeEvent(self, e):
+        if self.scheduler is not None:
+            self.scheduler.shutdown(wait=False)
+        super().closeEvent(e)
 
     def change_lang(self, i):
         self.lang = "en" if i == 0 else "fa"
@@ -506,13 +1099,18 @@ class MainWindow(QMainWindow):
         self.load_btn.setText(t["load"])
         self.save_btn.setText(t["save"])
         self.reset_btn.setText(t["reset"])
+        self.undo_btn.setText(t["undo"])
+        self.redo_btn.setText(t["redo"])
         self.apply_btn.setText(t["apply"])
-        self.tabs.setTabText(0, t["translation"])
-        self.tabs.setTabText(1, t["rotation"])
-        self.tabs.setTabText(2, t["scaling"])
-        self.tabs.setTabText(3, t["similarity"])
-        self.tabs.setTabText(4, t["affine"])
-        self.tabs.setTabText(5, t["perspective"])
+        self.stack_box.setTitle(t["stack"])
+        self.export_box.setTitle(t["export"])
+        self.add_step_btn.setText(t["add_step"])
+        self.clear_steps_btn.setText(t["clear_steps"])
+        self.live_cb.setText(t["live"])
+        self.trace_cb.setText(t["trace"])
+        self.export_trace_btn.setText(t["export_trace"])
+        for i, typ in enumerate(TAB_TYPES):
+            self.tabs.setTabText(i, t[typ])
         self.lang_cb.setCurrentIndex(0 if self.lang == "en" else 1)
         self.setLayoutDirection(lang_dir[self.lang])
 
@@ -550,8 +1148,16 @@ class MainWindow(QMainWindow):
 # Run
 # -------------------------------
 if __name__ == "__main__":
+    mark("imports")
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
+    mark("QApplication")
     win = MainWindow()
+    mark("MainWindow")
+    if "--startup-time" in sys.argv:
+        def report():
+            print(startup_report())
+            app.quit()
+        win.ready.connect(report)
     win.show()
     sys.exit(app.exec())
\ No newline at end of file
@@ -0,0 +1,121 @@
+import queue
+import threading
+import time
+
+# -------------------------------
+# Staged streaming pipeline
+# -------------------------------
+# decode -> transform -> encode, each stage with its own worker threads and
+# a bounded queue in front of it. OpenCV drops the GIL inside imread,
+# warps and imwrite, so disk I/O and codec time overlap with warping, and
+# a full queue makes faster stages wait instead of piling up frames.
+#
+# A failing item is passed along as an error and skipped by later stages,
+# so one bad file doesn't stop the run.
+
+_DONE = object()
+
+
+class Stage:
+    def __init__(self, name, fn, workers=1, queue_size=4):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.items = 0
+        self.errors = 0
+        self.busy = 0.0     # time spent inside fn
+        self.starved = 0.0  # time waiting for input
+        self.blocked = 0.0  # time waiting for room downstream
+        self.lock = threading.Lock()
+
+    def add(self, **times):
+        with self.lock:
+            for k, v in times.items():
+                setattr(self, k, getattr(self, k) + v)
+
+    def stats(self, wall):
+        capacity = max(wall, 1e-9) * self.workers
+        return {
+            "stage": self.name, "workers": self.workers, "items": self.items, "errors": self.errors,
+            "busy_s": self.busy, "starved_s": self.starved, "blocked_s": self.blocked,
+            "utilization": self.busy / capacity
+        }
+
+
+class Pipeline:
+    def __init__(self, stages):
+        self.stages = stages
+        self.wall = 0.0
+
+    def run(self, items):
+        """Feed items through every stage; yields (item, result, error) as they finish.
+
+        Results come out in completion order, not input order.
+        """
+        queues = [queue.Queue(s.queue_size) for s in self.stages] + [queue.Queue()]
+        threads = []
+        remaining = [s.workers for s in self.stages]
+        lock = threading.Lock()
+
+        def worker(i, stage):
+            q_in, q_out = queues[i], queues[i + 1]
+            while True:
+                t0 = time.perf_counter()
+                msg = q_in.get()
+                t1 = time.perf_counter()
+                stage.add(starved=t1 - t0)
+                if msg is _DONE:
+                    with lock:
+                        remaining[i] -= 1
+                        last = remaining[i] == 0
+                    if last:
+                        # Everyone in this stage is done: release the next one
+                        nxt = self.stages[i + 1].workers if i + 1 < len(self.stages) else 1
+                        for _ in range(nxt):
+                            q_out.put(_DONE)
+                    return
+                item, value, error = msg
+                if error is None:
+                    try:
+                        value = stage.fn(value)
+                        stage.add(items=1)
+                    except Exception as e:
+                        error = f"{stage.name}: {e}"
+                        stage.add(errors=1)
+                t2 = time.perf_counter()
+                q_out.put((item, value, error))
+                stage.add(busy=t2 - t1, blocked=time.perf_counter() - t2)
+
+        for i, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                t = threading.Thread(target=worker, args=(i, stage), name=f"{stage.name}-{n}", daemon=True)
+                t.start()
+                threads.append(t)
+
+        def feed():
+            for item in items:
+                queues[0].put((item, item, None))
+            for _ in range(self.stages[0].workers):
+                queues[0].put(_DONE)
+
+        start = time.perf_counter()
+        feeder = threading.Thread(target=feed, name="pipeline-feed", daemon=True)
+        feeder.start()
+        out = queues[-1]
+        while True:
+            msg = out.get()
+            if msg is _DONE:
+                break
+            yield msg
+        for t in threads:
+            t.join()
+        self.wall = time.perf_counter() - start
+
+    def stats(self):
+        return [s.stats(self.wall) for s in self.stages]
+
+    def bottleneck(self):
+        """Name of the stage with the highest utilization."""
+        st = self.stats()
+        return max(st, key=lambda s: s["utilization"])["stage"] if st else None
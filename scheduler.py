@@ -0,0 +1,145 @@
+import heapq
+import itertools
+import os
+import threading
+
+import cv2
+
+# -------------------------------
+# Persistent job scheduler
+# -------------------------------
+# A fixed pool of worker threads fed from one priority queue. Jobs that
+# target the same output (e.g. "preview") coalesce: submitting a new one
+# cancels the older queued/running job and bumps that target's generation,
+# so a late result from the old job can be recognised and dropped.
+# Cancelling a running job is cooperative: long job bodies call
+# check_cancelled() between stages (or tiles, or export targets) and give
+# the worker back early; a single OpenCV call always runs to its end.
+
+PREVIEW, RENDER, EXPORT = 0, 1, 2  # lower runs first
+
+_local = threading.local()
+
+
+class Cancelled(Exception):
+    """Raised by check_cancelled(); the scheduler drops the job quietly."""
+
+
+def current_job():
+    """The Job running on this worker thread, or None outside a job."""
+    return getattr(_local, "job", None)
+
+
+def check_cancelled():
+    """Raise Cancelled if the job running on this thread has been cancelled."""
+    job = current_job()
+    if job is not None and job.cancelled:
+        raise Cancelled()
+
+
+class Job:
+    __slots__ = ("fn", "args", "priority", "target", "gen", "seq", "on_done", "on_error", "cancelled")
+
+    def __init__(self, fn, args, priority, target, gen, seq, on_done, on_error):
+        self.fn = fn
+        self.args = args
+        self.priority = priority
+        self.target = target
+        self.gen = gen
+        self.seq = seq
+        self.on_done = on_done
+        self.on_error = on_error
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class JobScheduler:
+    def __init__(self, workers=2, cv_threads=None):
+        self.workers = max(1, workers)
+        # OpenCV's own thread pool is process-wide; split the cores between
+        # our workers instead of letting every warp grab all of them.
+        self.cv_threads = cv_threads if cv_threads is not None else max(1, (os.cpu_count() or 1) // self.workers)
+        cv2.setNumThreads(self.cv_threads)
+        self.queue = []
+        self.active = {}  # target -> newest Job (queued or running)
+        self.gens = {}
+        self.running = 0
+        self.seq = itertools.count()
+        self.cond = threading.Condition()
+        self.stopped = False
+        self.threads = [threading.Thread(target=self._loop, name=f"transform-worker-{i}", daemon=True)
+                        for i in range(self.workers)]
+        for t in self.threads:
+            t.start()
+
+    def submit(self, fn, *args, priority=RENDER, target=None, on_done=None, on_error=None):
+        """Queue fn(*args). on_done(job, result) / on_error(job, message) run on the worker thread."""
+        with self.cond:
+            gen = 0
+            if target is not None:
+                gen = self.gens.get(target, 0) + 1
+                self.gens[target] = gen
+                old = self.active.get(target)
+                if old is not None:
+                    old.cancel()
+            job = Job(fn, args, priority, target, gen, next(self.seq), on_done, on_error)
+            if target is not None:
+                self.active[target] = job
+            heapq.heappush(self.queue, job)
+            self.cond.notify()
+        return job
+
+    def cancel(self, target):
+        """Cancel whatever is queued or running for target; its results become stale."""
+        with self.cond:
+            self.gens[target] = self.gens.get(target, 0) + 1
+            old = self.active.pop(target, None)
+            if old is not None:
+                old.cancel()
+
+    def is_current(self, job):
+        return not job.cancelled and (job.target is None or self.gens.get(job.target) == job.gen)
+
+    def shutdown(self, wait=True):
+        with self.cond:
+            self.stopped = True
+            for job in self.queue + list(self.active.values()):
+                job.cancel()
+            self.cond.notify_all()
+        if wait:
+            for t in self.threads:
+                t.join()
+
+    def _loop(self):
+        while True:
+            with self.cond:
+                while not self.stopped and not self.queue:
+                    self.cond.wait()
+                if self.stopped:
+                    return
+                job = heapq.heappop(self.queue)
+                if job.cancelled:
+                    continue
+                self.running += 1
+            _local.job = job
+            try:
+                result = job.fn(*job.args)
+            except Cancelled:
+                pass
+            except Exception as e:
+                if job.on_error is not None and not job.cancelled:
+                    job.on_error(job, str(e))
+            else:
+                if job.on_done is not None and self.is_current(job):
+                    job.on_done(job, result)
+            finally:
+                _local.job = None
+                with self.cond:
+                    self.running -= 1
+                    if job.target is not None and self.active.get(job.target) is job:
+                        del self.active[job.target]
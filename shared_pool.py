@@ -0,0 +1,287 @@
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+import cv2
+
+from transform_engine import apply_chain, compose
+
+# -------------------------------
+# Shared-memory process pool
+# -------------------------------
+# Worker processes sidestep the GIL for everything around the warp, but
+# pickling a multi-hundred-MB frame to them (and the result back) costs more
+# than the warp. Here images live in multiprocessing.shared_memory segments:
+# a job only sends segment names, shapes and the transform steps, and the
+# worker warps straight from the input segment into the output segment.
+#
+# with SharedPool(workers=4) as pool:
+#     src = pool.array(img.shape, img.dtype); src[...] = img
+#     out = pool.submit(src, steps, params).result()
+#     ...use out...
+#     pool.release(out); pool.release(src)
+#
+# The parent process creates and unlinks every segment; workers only attach.
+# Released segments go back to a free list and are reused by later jobs of
+# the same or smaller size. If a worker dies, the whole executor breaks:
+# every job queued or running on it fails with BrokenProcessPool, not just
+# the one that crashed, so callers that want them done resubmit them. The
+# pool starts fresh workers for later jobs, and the segments are still
+# owned (and eventually unlinked) by the parent.
+
+SEGMENT_ALIGN = 1 << 20          # round segment sizes up so near-equal frames share them
+IDLE_BYTES = 1024 * 1024 * 1024  # free segments kept for reuse before unlinking
+WORKER_ATTACH_CACHE = 16         # segments a worker keeps mapped between jobs
+
+
+def _attach(name):
+    """Attach to an existing segment without taking over its cleanup."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no track=; workers share the parent's resource
+        # tracker, which only records the name once, so a plain attach is safe.
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedArray(np.ndarray):
+    """ndarray view over a pool segment; remembers the segment for release()."""
+
+    def __array_finalize__(self, obj):
+        self.segment = getattr(obj, "segment", None)
+
+    @property
+    def spec(self):
+        """(segment name, shape, dtype) - everything a worker needs to map it."""
+        return self.segment.name, self.shape, self.dtype.str
+
+
+# -------------------------------
+# Worker side
+# -------------------------------
+_attached = OrderedDict()
+
+
+def _init_worker(cv_threads):
+    cv2.setNumThreads(cv_threads)
+
+
+def _view(spec):
+    name, shape, dtype = spec
+    shm = _attached.get(name)
+    if shm is None:
+        shm = _attach(name)
+        _attached[name] = shm
+        while len(_attached) > WORKER_ATTACH_CACHE:
+            _attached.popitem(last=False)[1].close()
+    else:
+        _attached.move_to_end(name)
+    return np.ndarray(shape, np.dtype(dtype), buffer=shm.buf)
+
+
+def _run(src_spec, dst_spec, steps, params):
+    src, dst = _view(src_spec), _view(dst_spec)
+    result = apply_chain(src, steps, params, dst=dst)
+    if result is not dst:
+        # OpenCV reallocated (shape/type mismatch); keep the contract anyway
+        dst[...] = result
+    return os.getpid()
+
+
+# -------------------------------
+# Parent side
+# -------------------------------
+class SegmentPool:
+    """Shared-memory segments owned by this process, recycled by size."""
+
+    def __init__(self, idle_bytes=IDLE_BYTES):
+        self.idle_bytes = idle_bytes
+        self.free = []    # idle segments, oldest first
+        self.busy = {}    # name -> segment handed out
+        self.lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.high_water = 0
+
+    def acquire(self, nbytes):
+        nbytes = max(1, nbytes)
+        with self.lock:
+            fits = [s for s in self.free if nbytes <= s.size <= 2 * nbytes + SEGMENT_ALIGN]
+            if fits:
+                seg = min(fits, key=lambda s: s.size)
+                self.free.remove(seg)
+                self.reused += 1
+            else:
+                size = -(-nbytes // SEGMENT_ALIGN) * SEGMENT_ALIGN
+                seg = shared_memory.SharedMemory(create=True, size=size)
+                self.created += 1
+            self.busy[seg.name] = seg
+            self.high_water = max(self.high_water, self._total())
+            return seg
+
+    def release(self, seg):
+        with self.lock:
+            if self.busy.pop(seg.name, None) is None:
+                return
+            self.free.append(seg)
+            while self.free and sum(s.size for s in self.free) > self.idle_bytes:
+                self._destroy(self.free.pop(0))
+
+    def close(self):
+        with self.lock:
+            for seg in self.free + list(self.busy.values()):
+                self._destroy(seg)
+            self.free = []
+            self.busy = {}
+
+    def stats(self):
+        with self.lock:
+            return {
+                "segments": len(self.free) + len(self.busy), "busy": len(self.busy),
+                "bytes": self._total(), "high_water": self.high_water,
+                "created": self.created, "reused": self.reused
+            }
+
+    def _total(self):
+        return sum(s.size for s in self.free) + sum(s.size for s in self.busy.values())
+
+    @staticmethod
+    def _destroy(seg):
+        try:
+            seg.close()
+        except BufferError:
+            pass  # a view is still alive; unlink anyway, the mapping goes with it
+        try:
+            seg.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedPool:
+    def __init__(self, workers=None, cv_threads=1, idle_bytes=IDLE_BYTES):
+        self.workers = workers or os.cpu_count() or 1
+        self.cv_threads = cv_threads
+        self.segments = SegmentPool(idle_bytes)
+        self.executor = None
+        self.restarts = 0
+        self.lock = threading.Lock()
+        # Unlink everything even if close() is never called (finalize also runs at exit)
+        self._finalizer = weakref.finalize(self, SegmentPool.close, self.segments)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def array(self, shape, dtype=np.uint8):
+        """Uninitialised SharedArray backed by a pool segment."""
+        dtype = np.dtype(dtype)
+        seg = self.segments.acquire(int(np.prod(shape)) * dtype.itemsize)
+        arr = np.ndarray(shape, dtype, buffer=seg.buf).view(SharedArray)
+        arr.segment = seg
+        return arr
+
+    def share(self, img):
+        """img itself if it is already pool-backed, otherwise a SharedArray copy of it."""
+        if isinstance(img, SharedArray) and img.segment is not None and img.segment.name in self.segments.busy:
+            return img
+        arr = self.array(img.shape, img.dtype)
+        arr[...] = img
+        return arr
+
+    def release(self, arr):
+        """Hand an array's segment back for reuse; arr must not be used afterwards."""
+        if isinstance(arr, SharedArray) and arr.segment is not None:
+            self.segments.release(arr.segment)
+
+    def submit(self, src, steps, params=None, dst=None):
+        """Transform a SharedArray in a worker; the Future resolves to the output SharedArray.
+
+        dst may be a SharedArray of the right shape to reuse; otherwise one is
+        taken from the pool. On failure the pool-allocated dst is released.
+        """
+        if not isinstance(src, SharedArray) or src.segment is None:
+            raise TypeError("src must come from SharedPool.array() or share()")
+        steps = list(steps)
+        h, w = src.shape[:2]
+        _, (ow, oh) = compose(steps, w, h)
+        out_shape = (oh, ow) + src.shape[2:]
+        own = dst is None
+        if own:
+            dst = self.array(out_shape, src.dtype)
+        elif dst.shape != out_shape or dst.dtype != src.dtype:
+            raise ValueError(f"dst must be {out_shape} {src.dtype}, got {dst.shape} {dst.dtype}")
+
+        result = Future()
+        executor = self._executor()
+        try:
+            inner = executor.submit(_run, src.spec, dst.spec, steps, params)
+        except BrokenProcessPool:
+            # A worker died since the last job finished; retry once on fresh workers
+            self._reset(executor)
+            executor = self._executor()
+            inner = executor.submit(_run, src.spec, dst.spec, steps, params)
+
+        def done(f):
+            try:
+                f.result()
+            except BrokenProcessPool as e:
+                self._reset(executor)
+                if own:
+                    self.release(dst)
+                result.set_exception(e)
+            except Exception as e:
+                if own:
+                    self.release(dst)
+                result.set_exception(e)
+            else:
+                result.set_result(dst)
+        inner.add_done_callback(done)
+        return result
+
+    def transform(self, img, steps, params=None):
+        """Blocking convenience: a plain ndarray result (one copy in, one out)."""
+        src = self.share(img)
+        try:
+            out = self.submit(src, steps, params).result()
+        finally:
+            if src is not img:
+                self.release(src)
+        try:
+            return np.array(out)
+        finally:
+            self.release(out)
+
+    def stats(self):
+        return dict(self.segments.stats(), restarts=self.restarts)
+
+    def close(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True, cancel_futures=True)
+                self.executor = None
+        self._finalizer()
+
+    def _executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                                    initargs=(self.cv_threads,))
+            return self.executor
+
+    def _reset(self, broken):
+        # A crashed worker breaks the whole executor; start a fresh one for later
+        # jobs. Only if broken is still current: a late callback from an old
+        # executor must not shut down its healthy replacement.
+        with self.lock:
+            if self.executor is broken:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
+                self.restarts += 1
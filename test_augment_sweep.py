@@ -0,0 +1,101 @@
+import csv
+
+import numpy as np
+import cv2
+import pytest
+
+from augment_sweep import expand, batch_compose, sweep, main
+from transform_engine import TRANSFORM_TYPES, compose, apply_chain
+
+W, H = 160, 120
+
+STEP_PARAMS = {
+    "translation": {"tx": 12.5, "ty": -7},
+    "rotation": {"angle": 33},
+    "scaling": {"sx": 75, "sy": 130},
+    "similarity": {"angle": -20, "scale": 85, "tx": 6, "ty": 4},
+    "affine": {"tx1": 5, "ty1": -3, "tx2": -8, "ty2": 6, "tx3": 4, "ty3": 9},
+    "perspective": {"p1x": 5, "p1y": 3, "p2x": 150, "p2y": 10, "p3x": 0, "p3y": 115, "p4x": 160, "p4y": 100}
+}
+
+
+def concrete(steps, samples, k):
+    return [(typ, {name: float(v[k]) for name, v in p.items()}) for (typ, _), p in zip(steps, samples)]
+
+
+def test_expand_grid_and_draws():
+    steps = [("rotation", {"angle": {"linspace": [-10, 10, 3]}, "cx": {"values": [0, 5]}}),
+             ("translation", {"tx": {"uniform": [0, 1]}, "ty": 2})]
+    samples, n = expand(steps, count=4, seed=1)
+    assert n == 3 * 2 * 4
+    # Each grid point is repeated count times in a row
+    assert samples[0]["angle"][:8].tolist() == [-10] * 8
+    assert samples[1]["ty"].tolist() == [2] * n
+    again, _ = expand(steps, count=4, seed=1)
+    np.testing.assert_array_equal(again[1]["tx"], samples[1]["tx"])
+    other, _ = expand(steps, count=4, seed=2)
+    assert not np.array_equal(other[1]["tx"], samples[1]["tx"])
+
+
+def test_batch_compose_matches_compose():
+    # One swept parameter per step (2**6 grid points), the rest drawn at random
+    steps = []
+    for typ in TRANSFORM_TYPES:
+        (first, v), *rest = STEP_PARAMS[typ].items()
+        params = {first: {"values": [v, v * 0.5 - 1]}}
+        params.update({name: {"uniform": [v - 2, v + 2]} for name, v in rest})
+        steps.append((typ, params))
+    samples, n = expand(steps, count=2, seed=0)
+    matrices = batch_compose(steps, samples, n, W, H)
+    assert matrices.shape == (n, 3, 3)
+    for k in range(n):
+        M, _ = compose(concrete(steps, samples, k), W, H)
+        # compose() solves affine/perspective from float32 points via OpenCV
+        np.testing.assert_allclose(matrices[k], M, rtol=1e-5, atol=1e-4)
+
+
+def test_sweep_renders_each_sample():
+    img = np.random.default_rng(0).integers(0, 256, (H, W, 3), dtype=np.uint8)
+    steps = [("rotation", {"angle": {"values": [-15, 0, 15]}})]
+    out, samples, _ = sweep(img, steps, None, seed=0)
+    assert out.shape == (3, H, W, 3)
+    for k in range(3):
+        np.testing.assert_array_equal(out[k], apply_chain(img, concrete(steps, samples, k), {}))
+    with pytest.raises(ValueError):
+        sweep(img, steps, None, out=np.empty((2, H, W, 3), np.uint8))
+
+
+def read_table(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def test_cli_same_draws_for_every_source_and_seed_recorded(tmp_path):
+    rng = np.random.default_rng(0)
+    for name in ("a.png", "b.png"):
+        cv2.imwrite(str(tmp_path / name), rng.integers(0, 256, (H, W, 3), dtype=np.uint8))
+    spec = tmp_path / "spec.json"
+    spec.write_text('{"type": "rotation", "params": {"angle": {"uniform": [-30, 30]}}}')
+    inputs = [str(tmp_path / "a.png"), str(tmp_path / "b.png")]
+
+    assert main(inputs + ["--spec", str(spec), "--out", str(tmp_path / "aug.npy"), "--count", "3"]) == 0
+    rows = read_table(tmp_path / "aug.csv")
+    assert [r["angle"] for r in rows[:3]] == [r["angle"] for r in rows[3:]]
+    seeds = {r["seed"] for r in rows}
+    assert len(seeds) == 1
+
+    # The recorded seed repeats the run
+    assert main(inputs + ["--spec", str(spec), "--out", str(tmp_path / "again.npy"), "--count", "3",
+                          "--seed", seeds.pop()]) == 0
+    assert [r["angle"] for r in read_table(tmp_path / "again.csv")] == [r["angle"] for r in rows]
+    np.testing.assert_array_equal(np.load(tmp_path / "again.npy"), np.load(tmp_path / "aug.npy"))
+
+
+def test_cli_mismatched_source(tmp_path):
+    cv2.imwrite(str(tmp_path / "a.png"), np.zeros((H, W, 3), np.uint8))
+    cv2.imwrite(str(tmp_path / "b.png"), np.zeros((H, W + 1, 3), np.uint8))
+    spec = tmp_path / "spec.json"
+    spec.write_text('{"type": "rotation", "params": {"angle": 5}}')
+    out = tmp_path / "aug.npy"
+    assert main([str(tmp_path / "a.png"), str(tmp_path / "b.png"), "--spec", str(spec), "--out", str(out)]) == 1
+    assert not out.exists()
\ No newline at end of file
@@ -0,0 +1,55 @@
+import json
+import os
+
+import numpy as np
+import cv2
+import pytest
+
+from batch_transform import load_spec, parse_spec, collect_inputs, output_path, run_batch
+from transform_engine import apply_chain
+
+
+def test_parse_single_and_steps():
+    single = parse_spec({"type": "rotation", "params": {"angle": 15}})
+    assert single == {"steps": [("rotation", {"angle": 15})], "params": None}
+    stack = parse_spec({"steps": [{"type": "rotation", "params": {"angle": 15}},
+                                  {"type": "translation", "params": {"tx": 1, "ty": 2}}],
+                        "params": {"interp": "cubic"}})
+    assert [typ for typ, _ in stack["steps"]] == ["rotation", "translation"]
+    assert stack["params"] == {"interp": "cubic"}
+
+
+@pytest.mark.parametrize("spec", [[1, 2], "rotation", None, {"type": "shear"}, {"steps": [1]},
+                                  {"steps": {"type": "rotation"}}])
+def test_parse_rejects_bad_specs(spec):
+    with pytest.raises(ValueError):
+        parse_spec(spec)
+
+
+def test_load_spec_exits_cleanly(tmp_path):
+    path = tmp_path / "spec.json"
+    path.write_text(json.dumps([1, 2]))
+    with pytest.raises(SystemExit, match="mapping"):
+        load_spec(str(path))
+
+
+def test_run_batch(tmp_path):
+    src = tmp_path / "in"
+    src.mkdir()
+    rng = np.random.default_rng(0)
+    for name in ("a.png", "b.png"):
+        cv2.imwrite(str(src / name), rng.integers(0, 256, (40, 60, 3), dtype=np.uint8))
+    (src / "broken.png").write_bytes(b"not a png")
+    (src / "notes.txt").write_text("skipped")
+
+    paths = collect_inputs(str(src))
+    assert [os.path.basename(p) for p in paths] == ["a.png", "b.png", "broken.png"]
+    spec = parse_spec({"type": "rotation", "params": {"angle": 30}})
+    out = tmp_path / "out"
+    ok, failed = run_batch(paths, spec, str(out), workers=2, suffix="_r", log=lambda line: None)
+    assert ok == 2
+    assert [os.path.basename(p) for p, _ in failed] == ["broken.png"]
+
+    img = cv2.imread(str(src / "a.png"))
+    expected = apply_chain(img, spec["steps"], spec["params"])
+    np.testing.assert_array_equal(cv2.imread(output_path(paths[0], str(out), "_r", None)), expected)
\ No newline at end of file
@@ -0,0 +1,51 @@
+import pytest
+
+import benchmark
+from benchmark import run_suite, compare
+
+
+def small_run(plan=False):
+    return run_suite(["small"], [3], ["rotation"], ["linear"], ["constant"], repeats=2, warmup=0, plan=plan,
+                     log=lambda line: None)
+
+
+def test_suite_reports_every_case():
+    run = run_suite(["small"], [1, 3], ["rotation", "scaling"], ["linear", "cubic"], ["constant", "wrap"],
+                    repeats=1, warmup=0, log=lambda line: None)
+    # scaling ignores the border, so it runs once per interpolation
+    assert len(run["results"]) == 2 * (2 * 2 + 2)
+    r = run["results"][0]
+    assert r["case"] == "rotation/linear/constant/640x480x1"
+    assert r["p50_ms"] > 0 and r["mp_per_s"] > 0 and r["peak_alloc_mb"] >= 0
+
+
+def test_compare_flags_slowdowns():
+    base = small_run()
+    slower = {"meta": base["meta"], "results": [dict(r, p50_ms=r["p50_ms"] * 2) for r in base["results"]]}
+    regressions, improvements = compare(slower, base, 0.1)
+    assert [case for case, *_ in regressions] == ["rotation/linear/constant/640x480x3"]
+    assert not improvements
+    regressions, improvements = compare(base, slower, 0.1)
+    assert not regressions and len(improvements) == 1
+
+
+def test_plan_runs_are_their_own_cases():
+    plan = small_run(plan=True)
+    assert plan["results"][0]["case"].endswith("/plan")
+    with pytest.raises(ValueError, match="plan"):
+        compare(plan, small_run())
+    # A baseline written before plan mode existed counts as a direct run
+    old = small_run()
+    del old["meta"]["plan"]
+    compare(small_run(), old)
+    with pytest.raises(ValueError):
+        compare(plan, old)
+
+
+def test_main_refuses_mismatched_baseline(tmp_path, capsys):
+    base = tmp_path / "base.json"
+    args = ["--sizes", "small", "--types", "rotation", "--interps", "linear", "--borders", "constant",
+            "--repeats", "1", "--warmup", "0"]
+    assert benchmark.main(args + ["--out", str(base)]) == 0
+    assert benchmark.main(args + ["--plan", "--compare", str(base)]) == 2
+    assert "not comparable" in capsys.readouterr().err
\ No newline at end of file
@@ -0,0 +1,102 @@
+import os
+
+import numpy as np
+import cv2
+import pytest
+
+from image_export import imwrite_flags, parse_target, ExportTarget, export, export_one, format_report, main
+
+W, H = 160, 120
+
+
+@pytest.fixture(scope="module")
+def img():
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 256, (H, W, 3), dtype=np.uint8)
+    return cv2.normalize(cv2.GaussianBlur(noise, (0, 0), 3), None, 0, 255, cv2.NORM_MINMAX)
+
+
+def test_imwrite_flags():
+    assert imwrite_flags(".JPEG", {"quality": 85, "progressive": "true"}) == [
+        cv2.IMWRITE_JPEG_QUALITY, 85, cv2.IMWRITE_JPEG_PROGRESSIVE, 1]
+    assert imwrite_flags(".tiff", {"compression": "Deflate"}) == [cv2.IMWRITE_TIFF_COMPRESSION, 8]
+    assert imwrite_flags(".png") == []
+    with pytest.raises(ValueError, match="Unsupported"):
+        imwrite_flags(".gif")
+    with pytest.raises(ValueError, match="Unknown"):
+        imwrite_flags(".png", {"quality": 80})
+    with pytest.raises(ValueError, match="lzw"):
+        imwrite_flags(".tif", {"compression": "zip"})
+
+
+def test_parse_target():
+    t = parse_target("out/a.jpg:quality=80,max_side=64")
+    assert (t.path, t.ext, t.options, t.max_side) == ("out/a.jpg", ".jpg", {"quality": 80}, 64)
+    assert t.describe() == "quality=80,max_side=64"
+    assert parse_target("b.png").describe() == "defaults"
+    # A drive letter is not an option list
+    assert parse_target("C:\\out.png").path == "C:\\out.png"
+    assert parse_target("C:\\out.png:compression=9").path == "C:\\out.png"
+    with pytest.raises(ValueError, match="name=value"):
+        parse_target("a.png:compression=9,fast")
+    with pytest.raises(ValueError):
+        parse_target("a.png:scale=0")
+
+
+def test_target_sizes():
+    assert ExportTarget("a.png").out_size(W, H) == (W, H)
+    assert ExportTarget("a.png", scale=0.5).out_size(W, H) == (80, 60)
+    assert ExportTarget("a.png", {"max_side": 40}).out_size(W, H) == (40, 30)
+    # The smaller of the two wins
+    assert ExportTarget("a.png", scale=0.1, max_side=40).out_size(W, H) == (16, 12)
+    assert ExportTarget("a.png", scale=0.001).out_size(W, H) == (1, 1)
+
+
+def test_export_writes_every_target(img, tmp_path):
+    targets = [parse_target(str(tmp_path / "a.png")), parse_target(str(tmp_path / "b.jpg:quality=90,scale=0.5")),
+               parse_target(str(tmp_path / "missing" / "c.png"))]
+    seen = []
+    reports = export(img, targets, workers=2, progress=lambda done, total, r: seen.append((done, total)))
+    assert sorted(seen) == [(1, 3), (2, 3), (3, 3)]
+    assert [os.path.basename(r["path"]) for r in reports] == ["a.png", "b.jpg", "c.png"]
+    # A target that fails is reported, and the others are still written
+    assert reports[0]["error"] is None and reports[1]["error"] is None and reports[2]["error"]
+    np.testing.assert_array_equal(cv2.imread(str(tmp_path / "a.png")), img)
+    assert cv2.imread(str(tmp_path / "b.jpg")).shape == (60, 80, 3)
+    assert reports[0]["bytes"] == os.path.getsize(tmp_path / "a.png")
+    # No temporary files are left behind
+    assert sorted(os.listdir(tmp_path)) == ["a.png", "b.jpg"]
+    lines = format_report(reports)
+    assert lines[1].startswith("b.jpg  quality=90,scale=0.5  80x60")
+
+
+def test_export_rejects_duplicate_paths(img, tmp_path):
+    path = str(tmp_path / "a.png")
+    with pytest.raises(ValueError, match="a.png"):
+        export(img, [parse_target(path), parse_target(path + ":compression=9")])
+    # A dry run writes nothing, so the same path twice is a comparison
+    reports = export(img, [parse_target(path), parse_target(path + ":compression=9")], write=False)
+    assert all(r["bytes"] > 0 and r["error"] is None for r in reports)
+    assert not os.listdir(tmp_path)
+
+
+def test_stop_cancels(img, tmp_path):
+    target = parse_target(str(tmp_path / "a.png"))
+    report = export_one(img, target, stop=lambda: True)
+    assert report["error"] == "cancelled"
+    # Asked to stop between encode and write
+    calls = []
+    report = export_one(img, target, stop=lambda: calls.append(1) or len(calls) > 1)
+    assert report["error"] == "cancelled" and report["bytes"] > 0
+    assert not os.listdir(tmp_path)
+    assert format_report([report]) == ["a.png  defaults  FAILED: cancelled"]
+
+
+def test_cli(img, tmp_path, capsys):
+    src = str(tmp_path / "in.png")
+    cv2.imwrite(src, img)
+    assert main([src, str(tmp_path / "out.png:quality=5")]) == 2
+    assert "Unknown .png option" in capsys.readouterr().err
+    assert main([src, str(tmp_path / "out.webp:quality=80"), "--dry-run"]) == 0
+    assert "1 encoded, 0 failed" in capsys.readouterr().out
+    assert not os.path.exists(tmp_path / "out.webp")
\ No newline at end of file
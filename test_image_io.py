@@ -0,0 +1,85 @@
+import struct
+
+import numpy as np
+import cv2
+import pytest
+
+import image_io
+from image_io import read_image, read_reduced, keeps_extra, to_display_depth
+
+
+def exif_jpeg(path, img, orientation):
+    """Write img as a JPEG whose EXIF says it has to be turned (6 = 90 degrees clockwise)."""
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 95])
+    tiff = (b"II*\x00" + struct.pack("<IH", 8, 1) + struct.pack("<HHIHH", 0x0112, 3, 1, orientation, 0)
+            + struct.pack("<I", 0))
+    app1 = b"\xff\xe1" + struct.pack(">H", 8 + len(tiff)) + b"Exif\x00\x00" + tiff
+    data = buf.tobytes()
+    path.write_bytes(data[:2] + app1 + data[2:])
+
+
+def test_quick_and_full_decode_agree_on_orientation(tmp_path, monkeypatch):
+    path = tmp_path / "photo.jpg"
+    exif_jpeg(path, np.full((120, 160, 3), 128, np.uint8), 6)
+    monkeypatch.setattr(image_io, "REDUCED_MODES", [(0, cv2.IMREAD_REDUCED_COLOR_2)])
+    full = read_image(str(path))
+    quick = read_reduced(str(path))
+    # Upright, as a plain imread shows it
+    assert full.shape == cv2.imread(str(path)).shape == (160, 120, 3)
+    assert quick.shape == (80, 60, 3)
+
+
+@pytest.mark.parametrize("ext", [".png", ".webp"])
+def test_opaque_8bit_is_oriented_read(tmp_path, ext):
+    path = str(tmp_path / ("opaque" + ext))
+    cv2.imwrite(path, np.zeros((5, 7, 3), np.uint8))
+    assert not keeps_extra(open(path, "rb").read(1024))
+
+
+@pytest.mark.parametrize("name,img", [
+    ("alpha.png", np.full((5, 7, 4), 100, np.uint8)),
+    ("deep.png", np.full((5, 7, 3), 40000, np.uint16)),
+    ("deepgray.png", np.full((5, 7), 40000, np.uint16)),
+    ("alpha.webp", np.full((5, 7, 4), 100, np.uint8)),
+    ("deep.tif", np.full((5, 7, 3), 40000, np.uint16))
+])
+def test_depth_and_alpha_survive(tmp_path, name, img):
+    path = str(tmp_path / name)
+    cv2.imwrite(path, img)
+    assert keeps_extra(open(path, "rb").read(1024))
+    out = read_image(path)
+    assert out.dtype == img.dtype and out.shape == img.shape
+
+
+def test_png_transparency_chunk_counts_as_alpha():
+    ihdr = struct.pack(">IIBBBBB", 7, 5, 8, 3, 0, 0, 0)
+    head = b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + ihdr + b"crc!"
+    trns = struct.pack(">I", 1) + b"tRNS" + b"\x00" + b"crc!"
+    idat = struct.pack(">I", 0) + b"IDAT" + b"crc!"
+    assert keeps_extra(head + trns + idat)
+    assert not keeps_extra(head + idat)
+
+
+def test_unreadable(tmp_path):
+    path = tmp_path / "broken.png"
+    path.write_bytes(b"not an image")
+    assert read_image(str(path)) is None
+    assert read_image(str(tmp_path / "missing.png")) is None
+    assert read_reduced(str(path)) is None
+
+
+def test_small_or_lossless_files_have_no_quick_decode(tmp_path):
+    path = tmp_path / "small.jpg"
+    cv2.imwrite(str(path), np.zeros((20, 20, 3), np.uint8))
+    assert read_reduced(str(path)) is None
+    cv2.imwrite(str(tmp_path / "big.png"), np.zeros((20, 20, 3), np.uint8))
+    assert read_reduced(str(tmp_path / "big.png")) is None
+
+
+def test_display_depth():
+    img = np.zeros((2, 2), np.uint8)
+    assert to_display_depth(img) is img
+    deep = np.full((2, 2), 65535, np.uint16)
+    assert to_display_depth(deep).dtype == np.uint8 and (to_display_depth(deep) == 255).all()
+    flt = np.float32([[0, 0.5], [1, 1]])
+    assert to_display_depth(flt).tolist() == [[0, 128], [255, 255]]
\ No newline at end of file
@@ -0,0 +1,80 @@
+import os
+import threading
+import time
+
+import numpy as np
+import cv2
+
+from pipeline import Pipeline, Stage
+from batch_transform import parse_spec, run_pipeline
+
+
+def test_every_item_comes_through():
+    pipe = Pipeline([Stage("double", lambda x: x * 2, workers=3), Stage("inc", lambda x: x + 1, workers=2)])
+    out = list(pipe.run(range(50)))
+    assert sorted((item, value) for item, value, _ in out) == [(i, 2 * i + 1) for i in range(50)]
+    assert all(error is None for *_, error in out)
+    assert [s["items"] for s in pipe.stats()] == [50, 50]
+
+
+def test_errors_skip_later_stages():
+    seen = []
+
+    def check(x):
+        if x % 3 == 0:
+            raise ValueError("multiple of three")
+        return x
+
+    def record(x):
+        seen.append(x)
+        return x
+    pipe = Pipeline([Stage("check", check), Stage("record", record)])
+    errors = {item: error for item, _, error in pipe.run(range(9)) if error is not None}
+    assert errors == {i: "check: multiple of three" for i in (0, 3, 6)}
+    assert sorted(seen) == [1, 2, 4, 5, 7, 8]
+    assert [s["errors"] for s in pipe.stats()] == [3, 0]
+
+
+def test_queues_bound_work_in_flight():
+    lock = threading.Lock()
+    started = [0]
+    finished = [0]
+    peak = [0]
+
+    def first(x):
+        with lock:
+            started[0] += 1
+            peak[0] = max(peak[0], started[0] - finished[0])
+        return x
+
+    def slow(x):
+        time.sleep(0.002)
+        with lock:
+            finished[0] += 1
+        return x
+    pipe = Pipeline([Stage("first", first, 1, queue_size=2), Stage("slow", slow, 1, queue_size=2)])
+    for _ in pipe.run(range(60)):
+        pass
+    # One item in each worker, plus what the queues between them hold
+    assert peak[0] <= 6
+    assert pipe.bottleneck() == "slow"
+
+
+def test_run_pipeline_writes_files(tmp_path):
+    src = tmp_path / "in"
+    src.mkdir()
+    rng = np.random.default_rng(0)
+    paths = []
+    for name in ("a.png", "b.png", "c.png"):
+        cv2.imwrite(str(src / name), rng.integers(0, 256, (30, 40, 3), dtype=np.uint8))
+        paths.append(str(src / name))
+    (src / "broken.png").write_bytes(b"not a png")
+    paths.append(str(src / "broken.png"))
+
+    spec = parse_spec({"type": "translation", "params": {"tx": 3, "ty": 2}})
+    lines = []
+    ok, failed = run_pipeline(paths, spec, str(tmp_path / "out"), ext=".png", log=lines.append)
+    assert ok == 3
+    assert [(os.path.basename(p), e.split(":")[0]) for p, e in failed] == [("broken.png", "decode")]
+    assert sorted(os.listdir(tmp_path / "out")) == ["a.png", "b.png", "c.png"]
+    assert any(line.startswith("  bottleneck:") for line in lines)
\ No newline at end of file
@@ -0,0 +1,104 @@
+import threading
+import time
+
+import cv2
+import pytest
+
+from scheduler import JobScheduler, PREVIEW, RENDER, EXPORT, check_cancelled, current_job
+
+
+@pytest.fixture
+def sched():
+    # Keep OpenCV's process-wide thread count as the other tests found it
+    s = JobScheduler(workers=1, cv_threads=cv2.getNumThreads())
+    yield s
+    s.shutdown()
+
+
+def block(sched):
+    """Occupy the single worker until the returned event is set."""
+    started, release = threading.Event(), threading.Event()
+
+    def body():
+        started.set()
+        release.wait(5)
+    sched.submit(body)
+    assert started.wait(5)
+    return release
+
+
+def wait_for(cond, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_priorities_run_in_order(sched):
+    release = block(sched)
+    order = []
+    for name, priority in [("export", EXPORT), ("render", RENDER), ("preview", PREVIEW), ("render2", RENDER)]:
+        sched.submit(order.append, name, priority=priority)
+    release.set()
+    wait_for(lambda: len(order) == 4)
+    assert order == ["preview", "render", "render2", "export"]
+
+
+def test_same_target_coalesces(sched):
+    release = block(sched)
+    done = []
+    first = sched.submit(lambda: 1, target="preview", on_done=lambda job, r: done.append(r))
+    second = sched.submit(lambda: 2, target="preview", on_done=lambda job, r: done.append(r))
+    assert first.cancelled and not second.cancelled
+    release.set()
+    wait_for(lambda: done)
+    time.sleep(0.05)
+    assert done == [2]
+    assert not sched.is_current(first)
+
+
+def test_running_job_sees_cancellation(sched):
+    started, finished = threading.Event(), []
+
+    def body():
+        started.set()
+        while True:
+            check_cancelled()
+            time.sleep(0.005)
+    done, errors = [], []
+    job = sched.submit(body, target="render", on_done=lambda j, r: done.append(r),
+                       on_error=lambda j, e: errors.append(e))
+    assert started.wait(5)
+    sched.cancel("render")
+    # The worker comes back and takes the next job
+    sched.submit(finished.append, 1)
+    wait_for(lambda: finished)
+    assert job.cancelled and not done and not errors
+
+
+def test_errors_and_current_job(sched):
+    seen, errors = [], []
+
+    def body():
+        seen.append(current_job())
+        raise ValueError("bad input")
+    job = sched.submit(body, on_error=lambda j, e: errors.append((j, e)))
+    wait_for(lambda: errors)
+    assert seen == [job] and errors == [(job, "bad input")]
+    assert current_job() is None
+
+
+def test_shutdown_cancels_queued_and_running():
+    sched = JobScheduler(workers=1, cv_threads=cv2.getNumThreads())
+    started = threading.Event()
+
+    def body():
+        started.set()
+        while True:
+            check_cancelled()
+            time.sleep(0.005)
+    running = sched.submit(body, target="render")
+    assert started.wait(5)
+    queued = sched.submit(lambda: None)
+    sched.shutdown(wait=True)
+    assert running.cancelled and queued.cancelled
\ No newline at end of file
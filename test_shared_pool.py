@@ -0,0 +1,97 @@
+import os
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from shared_pool import SharedPool, SegmentPool, SEGMENT_ALIGN
+from transform_engine import apply_chain
+
+STEPS = [("rotation", {"angle": 25}), ("scaling", {"sx": 50, "sy": 50})]
+
+
+@pytest.fixture(scope="module")
+def img():
+    return np.random.default_rng(0).integers(0, 256, (240, 320, 3), dtype=np.uint8)
+
+
+@pytest.fixture
+def pool():
+    with SharedPool(workers=2) as p:
+        yield p
+
+
+def test_matches_in_process_warp(pool, img):
+    np.testing.assert_array_equal(pool.transform(img, STEPS), apply_chain(img, STEPS))
+
+
+def test_segments_are_reused(pool, img):
+    for _ in range(3):
+        pool.transform(img, STEPS)
+    st = pool.stats()
+    # one input and one output segment, created once
+    assert st["created"] == 2 and st["reused"] == 4 and st["busy"] == 0
+
+
+def test_dst_and_src_checks(pool, img):
+    src = pool.share(img)
+    assert pool.share(src) is src
+    dst = pool.array((120, 160, 3), np.uint8)
+    assert pool.submit(src, STEPS, dst=dst).result() is dst
+    np.testing.assert_array_equal(dst, apply_chain(img, STEPS))
+    with pytest.raises(ValueError):
+        pool.submit(src, STEPS, dst=pool.array((10, 10, 3), np.uint8))
+    with pytest.raises(TypeError):
+        pool.submit(img, STEPS)
+
+
+def test_failed_job_releases_its_output(pool, img):
+    src = pool.share(img)
+    busy = pool.stats()["busy"]
+    with pytest.raises(Exception):
+        pool.submit(src, [("rotation", {})]).result()  # no angle
+    assert pool.stats()["busy"] == busy
+
+
+def test_crash_fails_the_broken_executor_only(pool, img):
+    src = pool.share(img)
+    pool.transform(img, STEPS)
+    broken = pool.executor
+    crash = broken.submit(os._exit, 1)
+    queued = [pool.submit(src, STEPS) for _ in range(4)]
+    with pytest.raises(BrokenProcessPool):
+        crash.result()
+    for f in queued:
+        # Lost with the executor; the docs say so
+        if f.exception(timeout=30) is not None:
+            assert isinstance(f.exception(), BrokenProcessPool)
+    # Later jobs run on fresh workers
+    np.testing.assert_array_equal(pool.transform(img, STEPS), apply_chain(img, STEPS))
+    fresh = pool.executor
+    assert fresh is not broken and pool.stats()["restarts"] == 1
+    # A late callback from the old executor leaves the new one alone
+    pool._reset(broken)
+    assert pool.executor is fresh
+    np.testing.assert_array_equal(pool.transform(img, STEPS), apply_chain(img, STEPS))
+
+
+def test_close_unlinks_segments(img):
+    pool = SharedPool(workers=1)
+    out = pool.submit(pool.share(img), STEPS).result()
+    name = out.segment.name
+    del out
+    pool.close()
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+
+
+def test_segment_pool_trims_idle():
+    segs = SegmentPool(idle_bytes=2 * SEGMENT_ALIGN)
+    a, b, c = (segs.acquire(SEGMENT_ALIGN) for _ in range(3))
+    for s in (a, b, c):
+        segs.release(s)
+    st = segs.stats()
+    assert st["segments"] == 2 and st["bytes"] == 2 * SEGMENT_ALIGN
+    assert segs.acquire(SEGMENT_ALIGN // 2).name in (b.name, c.name)
+    segs.close()
\ No newline at end of file
@@ -0,0 +1,76 @@
+import json
+
+import numpy as np
+import cv2
+import pytest
+
+from transform_engine import apply_chain
+from tiled_transform import warp_tiled, iter_tiles, main
+
+W, H = 160, 120
+
+STEP_PARAMS = {
+    "rotation": {"angle": 33},
+    "similarity": {"angle": -20, "scale": 85, "tx": 6, "ty": 4},
+    "perspective": {"p1x": 5, "p1y": 3, "p2x": 150, "p2y": 10, "p3x": 0, "p3y": 115, "p4x": 160, "p4y": 100}
+}
+
+
+@pytest.fixture(scope="module")
+def img():
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 256, (H, W, 3), dtype=np.uint8)
+    return cv2.normalize(cv2.GaussianBlur(noise, (0, 0), 3), None, 0, 255, cv2.NORM_MINMAX)
+
+
+@pytest.mark.parametrize("border", ["constant", "replicate", "reflect", "wrap"])
+@pytest.mark.parametrize("typ", ["rotation", "similarity", "perspective"])
+def test_tiled_matches_full_frame(img, typ, border):
+    params = dict(STEP_PARAMS[typ], interp="linear", border=border)
+    steps = [(typ, params)]
+    full = apply_chain(img, steps, params)
+    # Small tiles and a tight budget, so tiles are split and meet at seams
+    tiled = warp_tiled(img, steps, params, tile=48, budget=256 * 1024)
+    assert tiled.shape == full.shape
+    assert np.abs(tiled.astype(int) - full).max() <= 1
+
+
+def test_tiles_cover_output_once(img):
+    Minv = np.linalg.inv(np.vstack([cv2.getRotationMatrix2D((W / 2, H / 2), 33, 1.0), [0, 0, 1]]))
+    hits = np.zeros((H, W), np.int32)
+    for x0, y0, x1, y1 in iter_tiles(img, Minv, W, H, 64, 64 * 1024, 2):
+        hits[y0:y1, x0:x1] += 1
+    assert (hits == 1).all()
+
+
+def test_tiled_stops_when_check_raises(img):
+    calls = []
+
+    def check():
+        calls.append(1)
+        if len(calls) > 2:
+            raise RuntimeError("stop")
+
+    with pytest.raises(RuntimeError):
+        warp_tiled(img, [("rotation", STEP_PARAMS["rotation"])], None, tile=32, check=check)
+    assert len(calls) == 3
+
+
+def test_cli_budget_needs_npy(img, tmp_path, capsys):
+    spec = tmp_path / "spec.json"
+    spec.write_text(json.dumps({"type": "rotation", "params": {"angle": 30}}))
+    np.save(tmp_path / "in.npy", img)
+    cv2.imwrite(str(tmp_path / "in.png"), img)
+
+    assert main([str(tmp_path / "in.png"), "--spec", str(spec), "--out", str(tmp_path / "out.npy"),
+                 "--budget-mb", "8"]) == 2
+    assert "in.png" in capsys.readouterr().err
+    assert not (tmp_path / "out.npy").exists()
+
+    assert main([str(tmp_path / "in.npy"), "--spec", str(spec), "--out", str(tmp_path / "out.npy"),
+                 "--budget-mb", "8"]) == 0
+    expected = apply_chain(img, [("rotation", {"angle": 30})])
+    assert np.abs(np.load(tmp_path / "out.npy").astype(int) - expected).max() <= 1
+    # Without a budget an image file is still accepted
+    assert main([str(tmp_path / "in.png"), "--spec", str(spec), "--out", str(tmp_path / "out.png")]) == 0
+    assert cv2.imread(str(tmp_path / "out.png")).shape == img.shape
\ No newline at end of file
@@ -0,0 +1,294 @@
+import numpy as np
+import cv2
+import pytest
+
+import transform_engine
+from transform_engine import (TRANSFORM_TYPES, apply_transform, apply_chain, compose, transform_key,
+                              fingerprint, ResultCache, apply_planned, GeometryPlan, get_plan,
+                              BufferPool)
+
+# -------------------------------
+# Engine checks
+# -------------------------------
+# python -m pytest -q
+#
+# The source is smoothed noise: detailed enough that a wrong matrix shows,
+# smooth enough that resampling twice stays close to resampling once.
+
+W, H = 160, 120
+
+STEP_PARAMS = {
+    "translation": {"tx": 12.5, "ty": -7},
+    "rotation": {"angle": 33},
+    "scaling": {"sx": 75, "sy": 130},
+    "similarity": {"angle": -20, "scale": 85, "tx": 6, "ty": 4},
+    "affine": {"tx1": 5, "ty1": -3, "tx2": -8, "ty2": 6, "tx3": 4, "ty3": 9},
+    "perspective": {"p1x": 5, "p1y": 3, "p2x": 150, "p2y": 10, "p3x": 0, "p3y": 115, "p4x": 160, "p4y": 100}
+}
+
+
+@pytest.fixture(scope="module")
+def img():
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 256, (H, W, 3), dtype=np.uint8)
+    return cv2.normalize(cv2.GaussianBlur(noise, (0, 0), 3), None, 0, 255, cv2.NORM_MINMAX)
+
+
+def diff(a, b):
+    return np.abs(a.astype(np.int32) - b.astype(np.int32))
+
+
+@pytest.mark.parametrize("typ", TRANSFORM_TYPES)
+def test_named_transforms(img, typ):
+    params = dict(STEP_PARAMS[typ], interp="cubic", border="reflect")
+    out = getattr(transform_engine, typ)(img, params)
+    np.testing.assert_array_equal(out, apply_transform(img, typ, params))
+    assert out.dtype == img.dtype and out.shape[2:] == img.shape[2:]
+
+
+def test_scaling_size(img):
+    assert apply_transform(img, "scaling", STEP_PARAMS["scaling"]).shape[:2] == (156, 120)
+
+
+def test_translation_moves_pixels(img):
+    out = apply_transform(img, "translation", {"tx": 10, "ty": 5, "interp": "nearest"})
+    np.testing.assert_array_equal(out[5:, 10:], img[:-5, :-10])
+    assert not out[:5].any() and not out[:, :10].any()
+
+
+def test_params_take_names_or_constants(img):
+    by_name = apply_transform(img, "rotation", dict(STEP_PARAMS["rotation"], interp="cubic", border="wrap"))
+    by_value = apply_transform(img, "rotation", dict(STEP_PARAMS["rotation"], interp=cv2.INTER_CUBIC,
+                                                     border=cv2.BORDER_WRAP))
+    np.testing.assert_array_equal(by_name, by_value)
+
+
+def test_bad_input(img):
+    with pytest.raises(ValueError):
+        apply_transform(np.zeros((0, 0, 3), np.uint8), "rotation", STEP_PARAMS["rotation"])
+    with pytest.raises(ValueError):
+        apply_transform(img, "shear", {})
+
+
+# -------------------------------
+# Fused chains
+# -------------------------------
+@pytest.mark.parametrize("typ", TRANSFORM_TYPES)
+@pytest.mark.parametrize("interp", ["nearest", "linear", "cubic"])
+def test_chain_of_one_is_the_transform(img, typ, interp):
+    params = dict(STEP_PARAMS[typ], interp=interp)
+    # Explicit params take the chain path rather than the single-step shortcut
+    np.testing.assert_array_equal(apply_chain(img, [(typ, params)], params), apply_transform(img, typ, params))
+
+
+def test_chain_matches_sequential_in_interior(img):
+    steps = [("rotation", {"angle": 15}),
+             ("translation", {"tx": 7.5, "ty": -5.25}),
+             ("similarity", {"angle": -10, "scale": 90, "tx": 3, "ty": 2})]
+    chained = apply_chain(img, steps, {"interp": "linear"})
+    seq = img
+    for typ, params in steps:
+        seq = apply_transform(seq, typ, params)
+    assert chained.shape == seq.shape
+    # Edges differ where a sequential step cropped what a later one brings back
+    d = diff(chained, seq)[30:-30, 40:-40]
+    assert d.mean() < 1.5
+    assert d.max() <= 8
+
+
+def test_compose_carries_sizes():
+    steps = [("scaling", {"sx": 50, "sy": 200}), ("rotation", {"angle": 90})]
+    M, size = compose(steps, W, H)
+    assert size == (80, 240)
+    # Each step is built for the size the previous one produced
+    S, _ = transform_engine.transform_matrix(*steps[0], W, H)
+    R, _ = transform_engine.transform_matrix(*steps[1], 80, 240)
+    np.testing.assert_allclose(M, R @ S)
+
+
+def test_empty_chain_is_the_image(img):
+    assert apply_chain(img, []) is img
+    dst = np.empty_like(img)
+    assert apply_chain(img, [], dst=dst) is dst
+    np.testing.assert_array_equal(dst, img)
+
+
+
+# -------------------------------
+# Result cache
+# -------------------------------
+def test_transform_key_normalizes():
+    steps = [("rotation", {"angle": 15, "cx": 3, "cy": 4, "interp": "cubic"})]
+    key = transform_key(steps)
+    assert key == transform_key([("rotation", {"cy": 4, "cx": 3, "angle": 15})], {"interp": cv2.INTER_CUBIC})
+    assert key != transform_key(steps, {"interp": "linear"})
+    assert key != transform_key([("rotation", {"angle": 16, "cx": 3, "cy": 4, "interp": "cubic"})])
+
+
+def test_transform_key_takes_list_border_val():
+    steps = [("rotation", {"angle": 15})]
+    key = transform_key(steps, {"border_val": [0, 0, 255]})
+    hash(key)
+    assert key == transform_key(steps, {"border_val": (0.0, 0.0, 255.0)})
+    assert key != transform_key(steps, {"border_val": [255, 0, 0]})
+    assert transform_key(steps, {"border_val": 7}) == transform_key(steps, {"border_val": [7]})
+
+
+def test_planned_chain_takes_list_border_val(img):
+    params = dict(STEP_PARAMS["rotation"], border_val=[0, 0, 255])
+    out = apply_planned(img, [("rotation", params)], params)
+    assert tuple(out[0, 0]) == (0, 0, 255)
+
+
+def test_fingerprint(img):
+    assert fingerprint(img) == fingerprint(img.copy())
+    changed = img.copy()
+    changed[0, 0, 0] ^= 1
+    assert fingerprint(changed) != fingerprint(img)
+    assert fingerprint(img[:, :, 0]) != fingerprint(img[:, :, 0].reshape(W, H))
+
+
+def test_result_cache_evicts_by_bytes():
+    cache = ResultCache(3000)
+    arrays = [np.zeros(1000, np.uint8) for _ in range(4)]
+    for i, a in enumerate(arrays[:3]):
+        cache.put(i, a)
+    assert cache.get(0) is arrays[0]
+    cache.put(3, arrays[3])
+    # 1 was the least recently used
+    assert cache.get(1) is None
+    assert cache.get(0) is arrays[0] and cache.get(3) is arrays[3]
+    assert not arrays[0].flags.writeable
+    cache.put(4, np.zeros(4000, np.uint8))
+    assert cache.get(4) is None
+    stats = cache.stats()
+    assert stats["bytes"] == 3000 and stats["evictions"] == 1 and stats["entries"] == 3
+
+
+# -------------------------------
+# Buffer pool
+# -------------------------------
+def test_pool_reuses_released_buffers():
+    pool = BufferPool(1 << 20)
+    a = pool.get((4, 5, 3), np.uint8)
+    b = pool.get((4, 5, 3), np.uint8)
+    assert b is not a
+    pool.release(a)
+    assert pool.get((4, 5, 3), "u1") is a
+    # Another shape or dtype is a new array
+    c = pool.get((4, 5, 3), np.uint16)
+    assert c.dtype == np.uint16
+    stats = pool.stats()
+    assert stats["allocated"] == 3 and stats["reused"] == 1
+    assert stats["busy_bytes"] == 2 * 60 + 120 and stats["bytes"] == stats["busy_bytes"]
+
+
+def test_pool_ignores_foreign_and_repeated_releases():
+    pool = BufferPool(1 << 20)
+    buf = pool.get((10,), np.uint8)
+    pool.release(np.empty(10, np.uint8))
+    pool.release(buf[:5])
+    pool.release(None)
+    assert pool.stats()["bytes"] == 10 and pool.idle == 0
+    pool.release(buf)
+    pool.release(buf)
+    assert pool.idle == 10
+    # Released once, so handed out once
+    assert pool.get((10,), np.uint8) is buf
+    assert pool.get((10,), np.uint8) is not buf
+
+
+def test_pool_makes_frozen_buffers_writeable():
+    pool = BufferPool(1 << 20)
+    buf = pool.get((10,), np.uint8)
+    buf.flags.writeable = False
+    pool.release(buf)
+    assert pool.get((10,), np.uint8).flags.writeable
+
+
+def test_pool_trims_least_recent_sizes():
+    pool = BufferPool(250)
+    small, large, other = pool.get((100,), np.uint8), pool.get((200,), np.uint8), pool.get((100,), np.uint8)
+    pool.release(small)
+    # Over budget: the size released longest ago goes first
+    pool.release(large)
+    assert pool.idle == 200 and list(pool.free) == [((200,), "|u1")]
+    pool.release(other)
+    assert pool.idle == 100 and list(pool.free) == [((100,), "|u1")]
+    pool.clear()
+    assert pool.idle == 0 and pool.get((200,), np.uint8) is not large
+
+
+def test_pool_high_water_and_dropped_leases():
+    pool = BufferPool(1 << 20)
+    bufs = [pool.get((100,), np.uint8) for _ in range(3)]
+    for buf in bufs:
+        pool.release(buf)
+    assert pool.stats()["high_water"] == 300
+    lost = pool.get((100,), np.uint8)
+    del lost, buf, bufs
+    # A lease never released is freed, not counted as busy
+    stats = pool.stats()
+    assert stats["busy_bytes"] == 0 and stats["bytes"] == 200 and stats["buffers"] == 2
+    assert stats["high_water"] == 300
+
+
+def test_warps_take_output_from_pool(img):
+    pool = BufferPool(1 << 20)
+    steps = [("rotation", STEP_PARAMS["rotation"])]
+    out = apply_chain(img, steps, {}, pool)
+    np.testing.assert_array_equal(out, apply_chain(img, steps, {}))
+    pool.release(out)
+    assert apply_chain(img, steps, {}, pool) is out
+
+
+# -------------------------------
+# Geometry plans
+# -------------------------------
+@pytest.mark.parametrize("typ", TRANSFORM_TYPES)
+@pytest.mark.parametrize("interp", ["nearest", "linear", "cubic"])
+def test_plan_matches_direct_warp(img, typ, interp):
+    params = dict(STEP_PARAMS[typ], interp=interp)
+    planned = GeometryPlan([(typ, params)], params, (W, H)).apply(img)
+    direct = apply_chain(img, [(typ, params)], params)
+    assert planned.shape == direct.shape
+    # The plan's maps are fixed point (1/32 pixel), the warp's are not
+    d = diff(planned, direct)
+    assert d.max() <= 4
+    assert (d > 1).mean() < 0.01
+
+
+@pytest.mark.parametrize("interp", ["nearest", "linear"])
+def test_plan_bands_give_the_same_maps(monkeypatch, interp):
+    steps = [("perspective", dict(STEP_PARAMS["perspective"], interp=interp))]
+    whole = GeometryPlan(steps, None, (W, H))
+    # Bands of 7 rows, the last one short
+    monkeypatch.setattr(transform_engine, "PLAN_BAND_PIXELS", 7 * W)
+    banded = GeometryPlan(steps, None, (W, H))
+    np.testing.assert_array_equal(banded.map1, whole.map1)
+    if interp == "nearest":
+        assert banded.map2 is None and whole.map2 is None
+    else:
+        np.testing.assert_array_equal(banded.map2, whole.map2)
+    assert banded.nbytes == W * H * (4 if interp == "nearest" else 6)
+
+
+def test_plan_rejects_other_sizes(img):
+    plan = GeometryPlan([("rotation", STEP_PARAMS["rotation"])], None, (W, H))
+    with pytest.raises(ValueError):
+        plan.apply(img[:, :-1])
+
+
+def test_plans_are_cached_per_size(img):
+    steps = [("rotation", STEP_PARAMS["rotation"])]
+    plan = get_plan(steps, None, (W, H))
+    assert get_plan([("rotation", dict(STEP_PARAMS["rotation"]))], None, (W, H)) is plan
+    assert get_plan(steps, None, (W + 1, H)) is not plan
+    assert get_plan(steps, {"interp": "cubic"}, (W, H)) is not plan
+
+
+def test_scaling_plan_is_a_resize(img):
+    steps = [("scaling", STEP_PARAMS["scaling"])]
+    plan = GeometryPlan(steps, None, (W, H))
+    assert plan.map1 is None
+    np.testing.assert_array_equal(plan.apply(img), apply_chain(img, steps))
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from transform_engine import compose
+from transform_history import TransformHistory
+
+W, H = 160, 120
+
+ROTATE = [("rotation", {"angle": 33})]
+ROTATE_MOVE = ROTATE + [("translation", {"tx": 12.5, "ty": -7})]
+ROTATE_SCALE = ROTATE + [("scaling", {"sx": 75, "sy": 130})]
+
+
+@pytest.fixture
+def history():
+    h = TransformHistory(keyframe_interval=2)
+    h.reset(np.zeros((H, W, 3), np.uint8))
+    return h
+
+
+def test_undo_redo(history):
+    assert not history.can_undo() and not history.can_redo()
+    assert history.snapshot() is history.original
+
+    history.push(ROTATE, None)
+    history.push(ROTATE_MOVE, None)
+    np.testing.assert_allclose(history.current.matrix, compose(ROTATE_MOVE, W, H)[0])
+
+    assert history.undo().steps == ROTATE
+    assert history.undo().steps == []
+    assert history.undo() is None
+    assert history.redo().steps == ROTATE
+    assert history.can_redo()
+
+    # A new edit drops the redo tail
+    entry = history.push(ROTATE_SCALE, None)
+    assert not history.can_redo()
+    assert len(history.entries) == 3
+    assert entry.size == compose(ROTATE_SCALE, W, H)[1]
+
+
+def test_unchanged_state_is_not_pushed(history):
+    params = {"interp": "cubic", "border": "constant", "border_val": 0}
+    entry = history.push(ROTATE, params)
+    # What Apply does when a spinbox loses focus without a change
+    assert history.push(list(ROTATE), dict(params)) is entry
+    assert len(history.entries) == 2
+    assert history.undo().steps == []
+
+    # Neither does re-applying the current state drop the redo tail
+    assert history.push([], None) is history.current
+    assert history.can_redo()
+    assert history.push(ROTATE, dict(params, interp="linear")) is not entry
+    assert len(history.entries) == 2 and not history.can_redo()
+
+
+def test_renders_kept_only_for_their_state(history):
+    history.push([("rotation", {"angle": 10})], None)
+    stale = history.push([("rotation", {"angle": 20})], None)
+    render = np.zeros_like(history.original)
+
+    # Undo and a new edit put a different state at the same index
+    history.undo()
+    fresh = history.push([("rotation", {"angle": 30})], None)
+    history.store(2, stale, render)
+    assert history.snapshot(2) is None
+
+    history.store(2, fresh, render)
+    assert history.snapshot(2) is render
+    # Only keyframe states are kept
+    history.store(1, history.entries[1], render)
+    assert history.snapshot(1) is None
+
+
+def test_snapshots_stay_under_budget():
+    img = np.zeros((H, W, 3), np.uint8)
+    history = TransformHistory(keyframe_interval=1, snapshot_budget=2 * img.nbytes)
+    history.reset(img)
+    for angle in range(1, 5):
+        entry = history.push([("rotation", {"angle": angle})], None)
+        history.store(history.pos, entry, img.copy())
+    assert history.snapshot_bytes() <= 2 * img.nbytes
+    # The ones furthest from the current state went first
+    assert sorted(history.snapshots) == [3, 4]
\ No newline at end of file
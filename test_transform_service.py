@@ -0,0 +1,175 @@
+import asyncio
+import io
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import cv2
+import pytest
+
+from batch_transform import parse_spec
+from transform_engine import apply_chain
+from transform_service import (TransformService, ByteBudget, HTTPError, NPY_TYPE, check_spec, image_header,
+                               transform_batch, connect, request_transform, request_metrics)
+
+W, H = 160, 120
+
+PERSPECTIVE = {"p1x": 5, "p1y": 3, "p2x": 150, "p2y": 10, "p3x": 0, "p3y": 115, "p4x": 160, "p4y": 100,
+               "interp": "cubic"}
+
+
+@pytest.fixture(scope="module")
+def img():
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 256, (H, W, 3), dtype=np.uint8)
+    return cv2.normalize(cv2.GaussianBlur(noise, (0, 0), 3), None, 0, 255, cv2.NORM_MINMAX)
+
+
+@pytest.fixture(scope="module")
+def port():
+    """A service on its own event loop thread; a wide window so concurrent requests batch."""
+    ready = []
+    loop = asyncio.new_event_loop()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        service = TransformService(workers=4, window_ms=50)
+        loop.run_until_complete(service.start(port=0))
+        ready.append(service)
+        loop.run_forever()
+        loop.run_until_complete(service.close())
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    while not ready:
+        thread.join(0.01)
+    yield ready[0].address()[1]
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+
+
+def post(conn, body, spec, ctype=NPY_TYPE):
+    conn.request("POST", "/transform?format=.npy", body=body,
+                 headers={"Content-Type": ctype, "X-Transform-Spec": json.dumps(spec)})
+    resp = conn.getresponse()
+    return resp.status, resp.read()
+
+
+# -------------------------------
+# Specs and headers
+# -------------------------------
+def test_check_spec_normalizes_border_val():
+    spec = parse_spec({"type": "rotation", "params": {"angle": 15, "border_val": [0, 0, 255]}})
+    check_spec(spec)
+    assert spec["steps"][0][1]["border_val"] == (0.0, 0.0, 255.0)
+    spec = parse_spec({"type": "rotation", "params": {"angle": 15}})
+    check_spec(spec)
+    assert "border_val" not in spec["steps"][0][1]
+
+
+@pytest.mark.parametrize("params", [{"border_val": "red"}, {"border_val": [[1, 2]]}, {"border_val": [1] * 5},
+                                    {"interp": "bilinear"}, "cubic"])
+def test_check_spec_rejects_bad_params(params):
+    with pytest.raises(ValueError):
+        check_spec(parse_spec({"steps": [{"type": "rotation", "params": {"angle": 15}}], "params": params}))
+
+
+def test_check_spec_rejects_missing_step_params():
+    with pytest.raises(ValueError, match="angle"):
+        check_spec(parse_spec({"type": "rotation", "params": {}}))
+
+
+@pytest.mark.parametrize("ext", [".png", ".jpg", ".bmp", ".webp"])
+def test_image_header_matches_decode(img, ext):
+    data = cv2.imencode(ext, img)[1].tobytes()
+    w, h, bpp = image_header(data, "image/" + ext[1:])
+    assert (w, h) == (W, H)
+    assert bpp >= img.shape[2]
+
+
+def test_image_header_npy(img):
+    f = io.BytesIO()
+    np.save(f, img.astype(np.uint16))
+    assert image_header(f.getvalue()[:256], NPY_TYPE) == (W, H, 6)
+    with pytest.raises(HTTPError) as e:
+        image_header(b"GIF89a" + bytes(32), "image/gif")
+    assert e.value.status == 415
+
+
+def test_batch_matches_apply_chain(img):
+    for steps in ([("perspective", PERSPECTIVE)], [("scaling", {"sx": 50, "sy": 75})]):
+        out = transform_batch([img, img[::-1].copy()], steps, None)
+        np.testing.assert_array_equal(out[0], apply_chain(img, steps, steps[0][1]))
+        np.testing.assert_array_equal(out[1], apply_chain(img[::-1].copy(), steps, steps[0][1]))
+
+
+def test_budget_refuses_oversized_requests():
+    async def go():
+        budget = ByteBudget(1000)
+        with pytest.raises(HTTPError) as e:
+            await budget.acquire(1001)
+        assert e.value.status == 413
+        await budget.acquire(600)
+        waiter = asyncio.ensure_future(budget.acquire(600))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        await budget.release(600)
+        await waiter
+        assert budget.used == 600 and budget.peak == 600
+    asyncio.run(go())
+
+
+def test_failed_request_body_is_drained():
+    async def go():
+        service = TransformService(workers=1)
+
+        async def fail(*args):
+            raise RuntimeError("worker failed")
+        service.transform = fail
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"x" * 100 + b"GET /health HTTP/1.1\r\n\r\n")
+        reader.feed_eof()
+        status, body, _, _ = await service.dispatch("POST", "/transform", {"content-length": "100"}, reader)
+        service.executor.shutdown()
+        assert status == 500 and body == b"worker failed"
+        # The next request on the connection starts where this one's body ended
+        assert (await reader.readuntil(b"\r\n\r\n")).startswith(b"GET /health")
+    asyncio.run(go())
+
+
+# -------------------------------
+# Served requests
+# -------------------------------
+def test_list_border_val(img, port):
+    spec = {"type": "rotation", "params": {"angle": 30, "border_val": [0, 0, 255]}}
+    out = request_transform(connect(port=port), img, spec)
+    assert tuple(out[0, 0]) == (0, 0, 255)
+    np.testing.assert_array_equal(out, apply_chain(img, [("rotation", spec["params"])], spec["params"]))
+
+
+def test_batched_requests_match_alone(img, port):
+    spec = {"type": "perspective", "params": PERSPECTIVE}
+    alone = request_transform(connect(port=port), img, spec)
+    np.testing.assert_array_equal(alone, apply_chain(img, [("perspective", PERSPECTIVE)], PERSPECTIVE))
+    before = request_metrics(connect(port=port))["batches"]
+    with ThreadPoolExecutor(6) as ex:
+        many = list(ex.map(lambda _: request_transform(connect(port=port), img, spec), range(6)))
+    for out in many:
+        np.testing.assert_array_equal(out, alone)
+    metrics = request_metrics(connect(port=port))
+    # Six requests inside one window take fewer than six batches
+    assert metrics["batches"] - before < 6
+    assert metrics["inflight_bytes"] == 0 and metrics["queued"] == 0 and metrics["running"] == 0
+
+
+def test_rejected_requests_keep_the_connection(img, port):
+    conn = connect(port=port)
+    png = cv2.imencode(".png", img)[1].tobytes()
+    status, body = post(conn, png, {"type": "rotation", "params": {"angle": 30, "interp": "bilinear"}},
+                        "image/png")
+    assert status == 400 and b"interp" in body
+    status, body = post(conn, b"GIF89a" + bytes(64), {"type": "rotation", "params": {"angle": 30}}, "image/gif")
+    assert status == 415
+    status, body = post(conn, png, {"type": "rotation", "params": {"angle": 30}}, "image/png")
+    assert status == 200
+    assert np.load(io.BytesIO(body)).shape == img.shape
\ No newline at end of file
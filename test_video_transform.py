@@ -0,0 +1,91 @@
+import os
+
+import numpy as np
+import cv2
+import pytest
+
+from video_transform import (parse_steps, steps_at, is_animated, FrameTransformer, VideoSink, SequenceSink,
+                             read_sequence, run_stream)
+from transform_engine import apply_chain
+
+W, H = 64, 48
+
+
+def frames(n, dtype=np.uint8):
+    rng = np.random.default_rng(0)
+    for i in range(n):
+        yield i, f"frame_{i:03d}", rng.integers(0, 200, (H, W, 3)).astype(dtype)
+
+
+def test_curves_and_fixed_values():
+    parsed = parse_steps([
+        ("rotation", {"angle": {"0": 0, "10": 30}, "interp": "cubic", "border_val": [0, 0, 255]}),
+        ("similarity", {"angle": 0, "scale": [[0, 100], [20, 60]], "tx": 1, "ty": 2})
+    ])
+    assert is_animated(parsed)
+    (_, fixed0, curves0), (_, fixed1, curves1) = parsed
+    assert fixed0 == {"interp": "cubic", "border_val": [0, 0, 255]} and list(curves0) == ["angle"]
+    assert fixed1 == {"angle": 0, "tx": 1, "ty": 2} and list(curves1) == ["scale"]
+
+    steps = steps_at(parsed, 5)
+    assert steps[0][1]["angle"] == 15 and steps[0][1]["border_val"] == [0, 0, 255]
+    assert steps[1][1]["scale"] == 90
+    # Held before the first key and after the last
+    assert steps_at(parsed, -3)[0][1]["angle"] == 0 and steps_at(parsed, 99)[1][1]["scale"] == 60
+
+
+def test_list_border_val_streams(tmp_path):
+    spec = {"steps": [("rotation", {"angle": 20, "border_val": [0, 0, 255]})], "params": None}
+    done, failed, _ = run_stream(frames(3), SequenceSink(str(tmp_path)), spec, log=lambda line: None)
+    assert (done, failed) == (3, [])
+    out = cv2.imread(str(tmp_path / "frame_000.png"))
+    assert tuple(out[0, 0]) == (0, 0, 255)
+
+
+def test_still_geometry_plans_once():
+    steps = [("perspective", {"p1x": 2, "p1y": 1, "p2x": 60, "p2y": 3, "p3x": 0, "p3y": 47, "p4x": 64, "p4y": 44})]
+    still = FrameTransformer(steps, None)
+    moving = FrameTransformer([("rotation", {"angle": {"0": 0, "10": 30}})], None)
+    for i, _, frame in frames(4):
+        np.testing.assert_array_equal(moving(i, frame), apply_chain(frame, [("rotation", {"angle": 3.0 * i})]))
+        still(i, frame)
+    assert still.plans_built == 1 and moving.plans_built == 0
+    # Affine chains stay on warpAffine unless plans are forced on
+    assert FrameTransformer([("rotation", {"angle": 5})], None).use_plan([("rotation", {"angle": 5})], (W, H)) is False
+
+
+def test_sequence_in_order_with_failures(tmp_path):
+    src = tmp_path / "in"
+    src.mkdir()
+    for i, name, frame in frames(5):
+        cv2.imwrite(str(src / f"{name}.png"), frame)
+    (src / "frame_002.png").write_bytes(b"broken")
+    paths = sorted(str(p) for p in src.iterdir())
+    it, _, count = read_sequence(paths)
+    spec = {"steps": [("translation", {"tx": 2, "ty": 1})], "params": None}
+    done, failed, _ = run_stream(it, SequenceSink(str(tmp_path / "out")), spec, count, log=lambda line: None)
+    assert done == 4 and [name for name, _ in failed] == ["frame_002"]
+    assert sorted(os.listdir(tmp_path / "out")) == ["frame_000.png", "frame_001.png", "frame_003.png",
+                                                    "frame_004.png"]
+
+
+def test_video_sink_rejects_deep_frames_without_a_file(tmp_path):
+    path = str(tmp_path / "out.avi")
+    sink = VideoSink(path, 10, "MJPG")
+    with pytest.raises(ValueError, match="8-bit"):
+        sink.write(0, "frame_000", np.zeros((H, W, 3), np.uint16))
+    sink.close()
+    assert not os.path.exists(path)
+
+
+def test_video_round_trip(tmp_path):
+    path = str(tmp_path / "out.avi")
+    spec = {"steps": [("rotation", {"angle": 10})], "params": None}
+    done, failed, _ = run_stream(frames(6), VideoSink(path, 10, "MJPG"), spec, log=lambda line: None)
+    assert (done, failed) == (6, [])
+    cap = cv2.VideoCapture(path)
+    n = 0
+    while cap.read()[0]:
+        n += 1
+    cap.release()
+    assert n == 6
\ No newline at end of file
@@ -0,0 +1,269 @@
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+import cv2
+
+from transform_engine import compose, normalize_params
+from batch_transform import load_spec
+
+# -------------------------------
+# Tiled, memory-bounded warping
+# -------------------------------
+# The output is produced tile by tile. For each tile only the source region
+# its pixels map back into is read, so with a memory-mapped source (.npy)
+# and a memory-mapped output the working set stays near the budget no
+# matter how large the image is. Other image files are decoded and encoded
+# whole by OpenCV, so the budget cannot hold for them; the command line
+# refuses them when --budget-mb is given.
+#
+# python tiled_transform.py scan.npy --spec rotate.json --out rotated.npy --budget-mb 256
+
+# Extra source pixels each interpolation kernel reaches around a sample
+interp_pad = {
+    cv2.INTER_NEAREST: 1,
+    cv2.INTER_LINEAR: 2,
+    cv2.INTER_CUBIC: 3,
+    cv2.INTER_LANCZOS4: 5
+}
+
+MIN_TILE = 32
+
+
+def open_source(path):
+    """Memory-map .npy files; other formats have to be decoded in full."""
+    if path.lower().endswith(".npy"):
+        return np.load(path, mmap_mode="r")
+    img = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if img is None or img.size == 0:
+        raise ValueError("could not read " + path)
+    return img
+
+
+def open_output(path, shape, dtype):
+    """Memory-mapped .npy at path, or a temporary one for image outputs."""
+    if path.lower().endswith(".npy"):
+        target = path
+    else:
+        fd, target = tempfile.mkstemp(suffix=".npy", dir=os.path.dirname(os.path.abspath(path)))
+        os.close(fd)
+    return np.lib.format.open_memmap(target, mode="w+", dtype=dtype, shape=shape), target
+
+
+def border_index(i, n, border):
+    """Source index OpenCV reads for index i under border (cv2.borderInterpolate, vectorised)."""
+    if border == cv2.BORDER_WRAP:
+        return np.mod(i, n)
+    if border == cv2.BORDER_REFLECT:
+        i = np.mod(i, 2 * n)
+        return np.where(i >= n, 2 * n - 1 - i, i)
+    if border == cv2.BORDER_REFLECT_101:
+        if n == 1:
+            return np.zeros_like(i)
+        i = np.mod(i, 2 * n - 2)
+        return np.where(i >= n, 2 * n - 2 - i, i)
+    return np.clip(i, 0, n - 1)
+
+
+def border_period(n, border):
+    """Index period of a repeating border, or None."""
+    if border == cv2.BORDER_WRAP:
+        return n
+    if border == cv2.BORDER_REFLECT:
+        return 2 * n
+    if border == cv2.BORDER_REFLECT_101:
+        return max(1, 2 * n - 2)
+    return None
+
+
+def _axis_window(lo, hi, n, border, pad):
+    """(start, stop, fold) source index window for sample coordinates in [lo, hi].
+
+    lo/hi are None when the coordinates are unknown (a perspective horizon).
+    fold means the coordinates are first brought into range: clamped for
+    replicate, or reduced by whole periods for wrap/reflect. The window may
+    run past the image; read_window fills that part by the border rule, so
+    interpolation near an edge sees exactly what a full-frame warp sees.
+    """
+    if border == cv2.BORDER_CONSTANT:
+        if lo is None:
+            return 0, n, False
+        return max(0, int(np.floor(lo)) - pad), min(n, int(np.ceil(hi)) + pad + 1), False
+    period = border_period(n, border)
+    if period is None:
+        # Replicate: every tap past an edge reads the edge, so clamp into
+        # [-pad, n - 1 + pad] and nothing changes
+        lo = -pad if lo is None else min(max(lo, -pad), n - 1 + pad)
+        hi = n - 1 + pad if hi is None else min(max(hi, -pad), n - 1 + pad)
+        return int(np.floor(lo)) - pad, int(np.ceil(hi)) + pad + 1, True
+    if lo is None or np.ceil(hi) - np.floor(lo) > period:
+        return -pad, period + pad + 1, True
+    return int(np.floor(lo)) - pad, int(np.ceil(hi)) + pad + 1, False
+
+
+def tile_window(Minv, x0, y0, x1, y1, src_w, src_h, pad, border):
+    """Source index windows ((start, stop, fold) for x, then y) for output tile [x0, x1) x [y0, y1)."""
+    xs = np.float64([x0, x1 - 1, x0, x1 - 1])
+    ys = np.float64([y0, y0, y1 - 1, y1 - 1])
+    pts = Minv @ np.vstack([xs, ys, np.ones(4)])
+    if np.any(pts[2] <= 0):
+        # The tile straddles the horizon of a perspective warp
+        return _axis_window(None, None, src_w, border, pad), _axis_window(None, None, src_h, border, pad)
+    # w is affine in x and y, so the tile maps to a convex quad: corners bound it
+    sx, sy = pts[0] / pts[2], pts[1] / pts[2]
+    return (_axis_window(sx.min(), sx.max(), src_w, border, pad),
+            _axis_window(sy.min(), sy.max(), src_h, border, pad))
+
+
+def read_window(src, wx, wy, border):
+    """Pixels of index window wx x wy, as a full-frame warp would read them."""
+    (cx0, cx1, _), (cy0, cy1, _) = wx, wy
+    src_h, src_w = src.shape[:2]
+    if cx0 >= cx1 or cy0 >= cy1:
+        # Only border pixels: a dummy pixel the coordinates never reach
+        return np.zeros((1, 1) + src.shape[2:], src.dtype)
+    if 0 <= cx0 and cx1 <= src_w and 0 <= cy0 and cy1 <= src_h:
+        return np.ascontiguousarray(src[cy0:cy1, cx0:cx1])
+    rows = border_index(np.arange(cy0, cy1), src_h, border)
+    cols = border_index(np.arange(cx0, cx1), src_w, border)
+    # Slice first, so a memmap only reads the rows and columns used
+    r0, c0 = rows.min(), cols.min()
+    sub = src[r0:rows.max() + 1, c0:cols.max() + 1]
+    return np.ascontiguousarray(sub[np.ix_(rows - r0, cols - c0)])
+
+
+def _fold(c, n, border, pad):
+    period = border_period(n, border)
+    if period is None:
+        return np.clip(c, -pad, n - 1 + pad)
+    return c - np.floor(c / period) * period
+
+
+# Output pixels whose source coordinates are worked out at once. The float64
+# temporaries of one strip stay a few MB whatever the tile size.
+STRIP_PIXELS = 1 << 15
+STRIP_BYTES = STRIP_PIXELS * 8 * 8
+
+
+def warp_tile(src, Minv, x0, y0, x1, y1, params, pad):
+    src_h, src_w = src.shape[:2]
+    border = params["border"]
+    wx, wy = tile_window(Minv, x0, y0, x1, y1, src_w, src_h, pad, border)
+    crop = read_window(src, wx, wy, border)
+    tw, th = x1 - x0, y1 - y0
+    map_x = np.empty((th, tw), np.float32)
+    map_y = np.empty((th, tw), np.float32)
+    xs = np.arange(x0, x1, dtype=np.float64)
+    rows = max(1, STRIP_PIXELS // tw)
+    for r0 in range(y0, y1, rows):
+        r1 = min(y1, r0 + rows)
+        ys = np.arange(r0, r1, dtype=np.float64)[:, None]
+        w = Minv[2, 0] * xs + Minv[2, 1] * ys + Minv[2, 2]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sx = (Minv[0, 0] * xs + Minv[0, 1] * ys + Minv[0, 2]) / w
+            sy = (Minv[1, 0] * xs + Minv[1, 1] * ys + Minv[1, 2]) / w
+        del w
+        sx[~np.isfinite(sx)] = -1e6
+        sy[~np.isfinite(sy)] = -1e6
+        for c, (start, _, fold), n, m in ((sx, wx, src_w, map_x), (sy, wy, src_h, map_y)):
+            if fold:
+                c = _fold(c, n, border, pad)
+            c -= start
+            m[r0 - y0:r1 - y0] = c
+    # The crop already holds whatever the border supplies within reach, so
+    # only a constant border still has to be drawn by remap itself
+    mode = cv2.BORDER_CONSTANT if border == cv2.BORDER_CONSTANT else cv2.BORDER_REPLICATE
+    return cv2.remap(crop, map_x, map_y, params["interp"], borderMode=mode, borderValue=params["border_val"])
+
+
+def _tile_bytes(src, windows, tw, th):
+    px = src.dtype.itemsize * (src.shape[2] if src.ndim == 3 else 1)
+    (cx0, cx1, _), (cy0, cy1, _) = windows
+    crop = max(0, cx1 - cx0) * max(0, cy1 - cy0) * px
+    # what warp_tile holds at once: remapped tile + float32 maps + source
+    # crop + one strip of float64 coordinate temporaries
+    return tw * th * (px + 2 * 4) + crop + STRIP_BYTES
+
+
+def iter_tiles(src, Minv, out_w, out_h, tile, budget, pad, border=cv2.BORDER_CONSTANT):
+    """Yield output tiles, splitting any whose working set would exceed budget."""
+    src_h, src_w = src.shape[:2]
+    todo = [(x, y, min(x + tile, out_w), min(y + tile, out_h))
+            for y in range(0, out_h, tile) for x in range(0, out_w, tile)]
+    while todo:
+        x0, y0, x1, y1 = todo.pop()
+        windows = tile_window(Minv, x0, y0, x1, y1, src_w, src_h, pad, border)
+        tw, th = x1 - x0, y1 - y0
+        if _tile_bytes(src, windows, tw, th) > budget and max(tw, th) > MIN_TILE:
+            mx, my = x0 + (tw + 1) // 2, y0 + (th + 1) // 2
+            todo += [r for r in [(x0, y0, mx, my), (mx, y0, x1, my), (x0, my, mx, y1), (mx, my, x1, y1)]
+                     if r[0] < r[2] and r[1] < r[3]]
+            continue
+        yield x0, y0, x1, y1
+
+
+def warp_tiled(src, steps, params, out=None, tile=1024, budget=256 * 1024 * 1024, check=None):
+    """Apply a transform chain tile by tile into out (allocated when omitted).
+
+    src and out may be numpy memmaps; only one tile's source region and
+    output are resident at a time. check, if given, is called before each
+    tile and may raise to stop early (e.g. scheduler.check_cancelled).
+    """
+    params = normalize_params(params if params is not None else steps[0][1])
+    src_h, src_w = src.shape[:2]
+    M, (out_w, out_h) = compose(steps, src_w, src_h)
+    Minv = np.linalg.inv(M)
+    shape = (out_h, out_w) + src.shape[2:]
+    if out is None:
+        out = np.empty(shape, src.dtype)
+    elif out.shape != shape:
+        raise ValueError(f"Output shape {out.shape} does not match {shape}")
+    pad = interp_pad.get(params["interp"], 5)
+    for x0, y0, x1, y1 in iter_tiles(src, Minv, out_w, out_h, tile, budget, pad, params["border"]):
+        if check is not None:
+            check()
+        out[y0:y1, x0:x1] = warp_tile(src, Minv, x0, y0, x1, y1, params, pad)
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Memory-bounded tiled transform for very large images.")
+    ap.add_argument("input", help=".npy (memory-mapped) or any image OpenCV can read")
+    ap.add_argument("--spec", required=True, help="JSON/YAML file with 'type'+'params' or 'steps'")
+    ap.add_argument("--out", required=True, help=".npy (memory-mapped) or image file")
+    ap.add_argument("--tile", type=int, default=1024, help="output tile size in pixels")
+    ap.add_argument("--budget-mb", type=float, default=None,
+                    help="working-set budget per tile (default 256); needs .npy input and output, "
+                         "since image files are decoded and encoded in full")
+    args = ap.parse_args(argv)
+
+    if args.budget_mb is not None:
+        whole = [p for p in (args.input, args.out) if not p.lower().endswith(".npy")]
+        if whole:
+            print(f"--budget-mb needs .npy input and output; {', '.join(whole)} would be held in memory whole",
+                  file=sys.stderr)
+            return 2
+    budget = int((args.budget_mb if args.budget_mb is not None else 256) * 1024 * 1024)
+
+    spec = load_spec(args.spec)
+    src = open_source(args.input)
+    h, w = src.shape[:2]
+    _, (out_w, out_h) = compose(spec["steps"], w, h)
+    out, target = open_output(args.out, (out_h, out_w) + src.shape[2:], src.dtype)
+    try:
+        warp_tiled(src, spec["steps"], spec["params"], out, args.tile, budget)
+        out.flush()
+        if target != args.out and not cv2.imwrite(args.out, out):
+            print("Could not write " + args.out, file=sys.stderr)
+            return 1
+    finally:
+        del out
+        if target != args.out:
+            os.remove(target)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+# -------------------------------
+# Lightweight timing spans
+# -------------------------------
+# with operation("apply"):          # starts a new user-level operation
+#     with span("warp", w=w, h=h):  # any stage inside it, on any thread
+#         ...
+#
+# Disabled by default; span() then returns a shared no-op object, so the
+# instrumented code pays one flag check per stage.
+
+MAX_EVENTS = 200000
+
+_enabled = False
+_events = deque(maxlen=MAX_EVENTS)
+_lock = threading.Lock()
+_op = {"id": 0, "name": None}
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    __slots__ = ("name", "args", "op", "t0")
+
+    def __init__(self, name, args, op):
+        self.name = name
+        self.args = args
+        self.op = op
+
+    def __enter__(self):
+        self.t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        dur = time.perf_counter_ns() - self.t0
+        _events.append((self.name, self.t0, dur, threading.get_ident(), self.op, self.args))
+        return False
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+
+
+def is_enabled():
+    return _enabled
+
+
+def clear():
+    _events.clear()
+
+
+def span(name, **args):
+    if not _enabled:
+        return NULL_SPAN
+    return Span(name, args, _op["id"])
+
+
+def operation(name, **args):
+    """Root span of a user-level operation; later spans are attributed to it."""
+    if not _enabled:
+        return NULL_SPAN
+    with _lock:
+        _op["id"] += 1
+        _op["name"] = name
+    return Span(name, args, _op["id"])
+
+
+def current_op():
+    return _op["id"]
+
+
+def op_summary(op_id=None):
+    """(name, root ms, [(stage, ms), ...]) for an operation, stages summed by name."""
+    op_id = _op["id"] if op_id is None else op_id
+    root_name, root_ms, stages = _op["name"], 0.0, OrderedDict()
+    for name, t0, dur, tid, op, args in list(_events):
+        if op != op_id:
+            continue
+        if name == root_name and root_ms == 0.0:
+            root_ms = dur / 1e6
+            continue
+        stages[name] = stages.get(name, 0.0) + dur / 1e6
+    return root_name, root_ms, list(stages.items())
+
+
+def format_summary(op_id=None):
+    name, root_ms, stages = op_summary(op_id)
+    if name is None:
+        return ""
+    parts = " · ".join(f"{stage} {ms:.1f}" for stage, ms in sorted(stages, key=lambda s: -s[1]))
+    return f"{name} {root_ms:.1f} ms" + (f" | {parts}" if parts else "")
+
+
+def export_chrome_trace(path):
+    """Write all recorded spans as Chrome trace-event JSON (chrome://tracing, Perfetto)."""
+    events = list(_events)
+    base = min((e[1] for e in events), default=0)
+    pid = os.getpid()
+    threads = {t.ident: t.name for t in threading.enumerate()}
+    out = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": tname}}
+           for tid, tname in threads.items()]
+    for name, t0, dur, tid, op, args in events:
+        out.append({
+            "name": name, "ph": "X", "pid": pid, "tid": tid,
+            "ts": (t0 - base) / 1000.0, "dur": dur / 1000.0,
+            "args": dict(args, op=op)
+        })
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": out, "displayTimeUnit": "ms"}, f)
+    return len(events)
@@ -0,0 +1,640 @@
+import hashlib
+import math
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import cv2
+
+# -------------------------------
+# Qt-free transform engine
+# -------------------------------
+# Everything here works on plain numpy arrays so the same transforms can be
+# driven by the GUI, the batch CLI or any other script.
+
+TRANSFORM_TYPES = ["translation", "rotation", "scaling", "similarity", "affine", "perspective"]
+
+# Interpolation & Border
+interp_map = {
+    "nearest": cv2.INTER_NEAREST,
+    "linear": cv2.INTER_LINEAR,
+    "cubic": cv2.INTER_CUBIC,
+    "lanczos": cv2.INTER_LANCZOS4
+}
+
+border_map = {
+    "constant": cv2.BORDER_CONSTANT,
+    "replicate": cv2.BORDER_REPLICATE,
+    "reflect": cv2.BORDER_REFLECT,
+    "wrap": cv2.BORDER_WRAP
+}
+
+
+def normalize_params(params):
+    """Return a copy of params with interp/border resolved to cv2 constants.
+
+    Accepts either the names used in interp_map/border_map (as written in
+    batch spec files and passed by the GUI) or cv2 constants.
+    """
+    p = dict(params or {})
+    interp = p.get("interp", "linear")
+    border = p.get("border", "constant")
+    p["interp"] = interp_map[interp.lower()] if isinstance(interp, str) else int(interp)
+    p["border"] = border_map[border.lower()] if isinstance(border, str) else int(border)
+    p["border_val"] = p.get("border_val", 0)
+    return p
+
+
+# -------------------------------
+# Matrices (3x3 homogeneous)
+# -------------------------------
+def _h(M):
+    return np.vstack([M, [0.0, 0.0, 1.0]]).astype(np.float64)
+
+
+def translation_matrix(params, w, h):
+    return _h(np.float64([[1, 0, params["tx"]], [0, 1, params["ty"]]]))
+
+
+def rotation_matrix(params, w, h):
+    cx = params.get("cx", w // 2)
+    cy = params.get("cy", h // 2)
+    return _h(cv2.getRotationMatrix2D((cx, cy), params["angle"], 1.0))
+
+
+def scaling_size(params, w, h):
+    return int(w * params["sx"] / 100.0), int(h * params["sy"] / 100.0)
+
+
+def scale_matrix(fx, fy):
+    # Pixel-centre convention used by cv2.resize, so a composed warp lines up
+    # with what resize would have produced.
+    return np.float64([[fx, 0, 0.5 * fx - 0.5], [0, fy, 0.5 * fy - 0.5], [0, 0, 1]])
+
+
+def scaling_matrix(params, w, h):
+    new_w, new_h = scaling_size(params, w, h)
+    return scale_matrix(new_w / w, new_h / h)
+
+
+def similarity_matrix(params, w, h):
+    cx, cy = w // 2, h // 2
+    M = cv2.getRotationMatrix2D((cx, cy), params["angle"], params["scale"] / 100.0)
+    M[0, 2] += params["tx"]
+    M[1, 2] += params["ty"]
+    return _h(M)
+
+
+def affine_matrix(params, w, h):
+    pts1 = np.float32([[50, 50], [w - 50, 50], [50, h - 50]])
+    pts2 = np.float32([
+        [50 + params["tx1"], 50 + params["ty1"]],
+        [w - 50 + params["tx2"], 50 + params["ty2"]],
+        [50 + params["tx3"], h - 50 + params["ty3"]]
+    ])
+    return _h(cv2.getAffineTransform(pts1, pts2))
+
+
+def perspective_matrix(params, w, h):
+    pts1 = np.float32([[0, 0], [w, 0], [0, h], [w, h]])
+    pts2 = np.float32([
+        [params["p1x"], params["p1y"]],
+        [params["p2x"], params["p2y"]],
+        [params["p3x"], params["p3y"]],
+        [params["p4x"], params["p4y"]]
+    ])
+    return cv2.getPerspectiveTransform(pts1, pts2).astype(np.float64)
+
+
+matrix_builders = {
+    "translation": translation_matrix,
+    "rotation": rotation_matrix,
+    "scaling": scaling_matrix,
+    "similarity": similarity_matrix,
+    "affine": affine_matrix,
+    "perspective": perspective_matrix
+}
+
+
+def transform_matrix(typ, params, w, h):
+    """3x3 matrix mapping source to destination pixels, and the output size."""
+    if typ not in matrix_builders:
+        raise ValueError(f"Unknown transform type: {typ}")
+    M = matrix_builders[typ](params, w, h)
+    size = scaling_size(params, w, h) if typ == "scaling" else (w, h)
+    return M, size
+
+
+# -------------------------------
+# Transforms
+# -------------------------------
+def apply_transform(img, typ, params):
+    if img is None or img.size == 0:
+        raise ValueError("Invalid image")
+    params = normalize_params(params)
+    h, w = img.shape[:2]
+    interp = params["interp"]
+    border = params["border"]
+    val = params["border_val"]
+
+    if typ == "scaling":
+        return resize(img, scaling_size(params, w, h), interp)
+
+    M, size = transform_matrix(typ, params, w, h)
+    img, M = prereduce(img, M, interp, border)
+    if typ == "perspective":
+        return cv2.warpPerspective(img, M, size, flags=interp, borderMode=border, borderValue=val)
+    return cv2.warpAffine(img, M[:2], size, flags=interp, borderMode=border, borderValue=val)
+
+
+def translation(img, params):
+    return apply_transform(img, "translation", params)
+
+
+def rotation(img, params):
+    return apply_transform(img, "rotation", params)
+
+
+def scaling(img, params):
+    return apply_transform(img, "scaling", params)
+
+
+def similarity(img, params):
+    return apply_transform(img, "similarity", params)
+
+
+def affine(img, params):
+    return apply_transform(img, "affine", params)
+
+
+def perspective(img, params):
+    return apply_transform(img, "perspective", params)
+
+
+# -------------------------------
+# Transform stacks
+# -------------------------------
+# A chain of (type, params) steps is folded into one 3x3 matrix so the image
+# is resampled once, however many steps are queued.
+
+def compose(steps, w, h):
+    """Combined 3x3 matrix and final output size for a list of (type, params)."""
+    M = np.eye(3)
+    size = (w, h)
+    for typ, params in steps:
+        step_M, size = transform_matrix(typ, params, *size)
+        M = step_M @ M
+    return M, size
+
+
+def apply_chain(img, steps, params=None, dst=None):
+    """Apply several transforms with a single resample.
+
+    params supplies interp/border/border_val for the whole chain; when omitted
+    the first step's settings are used. dst, if given, must already have the
+    output shape and dtype; OpenCV writes into it. dst may also be a
+    BufferPool, which the output is then taken from.
+    """
+    if img is None or img.size == 0:
+        raise ValueError("Invalid image")
+    steps = list(steps)
+    if not steps:
+        if dst is None or isinstance(dst, BufferPool):
+            return img
+        dst[...] = img
+        return dst
+    if len(steps) == 1 and params is None and dst is None:
+        return apply_transform(img, *steps[0])
+    params = normalize_params(params if params is not None else steps[0][1])
+    h, w = img.shape[:2]
+    M, size = compose(steps, w, h)
+
+    if all(typ == "scaling" for typ, _ in steps):
+        return resize(img, size, params["interp"], dst)
+    return warp(img, M, size, params, dst)
+
+
+def warp(img, M, size, params, dst=None):
+    """Single warpAffine or warpPerspective of img by a 3x3 matrix."""
+    dst = out_buffer(dst, img, size)
+    interp = params["interp"]
+    border = params["border"]
+    val = params["border_val"]
+    img, M = prereduce(img, M, interp, border)
+    if np.allclose(M[2], [0, 0, 1]):
+        return cv2.warpAffine(img, M[:2], size, dst=dst, flags=interp, borderMode=border, borderValue=val)
+    return cv2.warpPerspective(img, M, size, dst=dst, flags=interp, borderMode=border, borderValue=val)
+
+
+# -------------------------------
+# Downscaling
+# -------------------------------
+# Shrinking 2x or more with linear/cubic/lanczos skips most source pixels,
+# so it aliases, and cubic/lanczos pay full price for pixels they then throw
+# away. Instead the source is first run down a pyramid of 2x box-filter
+# reductions (OpenCV's integer INTER_AREA path, which beat cv2.pyrDown here)
+# while at least another 2x remains; the last step, between 1x and 2x, is
+# done on the small image by an area resize or by the warp itself.
+#
+# Each level is an exact pixel-centre x0.5, so it folds into the matrix as
+# scale_matrix(0.5, 0.5) and results stay aligned with compose(). Nearest is
+# left alone: it is picked for speed or hard edges.
+
+def pyramid_levels(scale):
+    """Number of 2x reductions that still leave a reduction to scale of at most 2x."""
+    if not 0 < scale <= 0.5:
+        return 0
+    return int(math.floor(math.log2(1.0 / scale) + 1e-9))
+
+
+def halve(img):
+    """2x box-filter reduction; an odd last row/column is dropped so the step stays exact."""
+    h, w = img.shape[:2]
+    return cv2.resize(img[:h - h % 2, :w - w % 2], (w // 2, h // 2), interpolation=cv2.INTER_AREA)
+
+
+def reduce_levels(img, levels):
+    for _ in range(levels):
+        img = halve(img)
+    return img
+
+
+def max_levels(w, h):
+    return int(math.log2(max(1, min(w, h))))
+
+
+def local_scale(M, w, h):
+    """Largest magnification of M over the w x h source (checked at the corners).
+
+    inf when part of the source lands on or behind the horizon.
+    """
+    s = 0.0
+    for x, y in ((0, 0), (w, 0), (0, h), (w, h)):
+        z = M[2, 0] * x + M[2, 1] * y + M[2, 2]
+        if z <= 1e-12:
+            return math.inf
+        u = (M[0, 0] * x + M[0, 1] * y + M[0, 2]) / z
+        v = (M[1, 0] * x + M[1, 1] * y + M[1, 2]) / z
+        J = np.float64([[M[0, 0] - u * M[2, 0], M[0, 1] - u * M[2, 1]],
+                        [M[1, 0] - v * M[2, 0], M[1, 1] - v * M[2, 1]]]) / z
+        s = max(s, np.linalg.norm(J, 2))
+    return s
+
+
+def warp_levels(M, w, h, interp, border):
+    """Pyramid levels to take off a w x h source before warping it by M."""
+    # Wrap repeats with the source period, which dropping an odd column would change
+    if interp == cv2.INTER_NEAREST or border == cv2.BORDER_WRAP:
+        return 0
+    return min(pyramid_levels(local_scale(M, w, h)), max_levels(w, h))
+
+
+def reduced_matrix(M, levels):
+    """M for a source that went through levels 2x reductions."""
+    if levels == 0:
+        return M
+    f = 0.5 ** levels
+    return M @ np.linalg.inv(scale_matrix(f, f))
+
+
+def prereduce(img, M, interp, border=cv2.BORDER_CONSTANT):
+    """Pyramid-reduce img ahead of a warp by M that shrinks it 2x or more.
+
+    Returns (source, matrix) to warp with; unchanged when no level applies.
+    """
+    h, w = img.shape[:2]
+    levels = warp_levels(M, w, h, interp, border)
+    return reduce_levels(img, levels), reduced_matrix(M, levels)
+
+
+def resize(img, size, interp, dst=None):
+    """cv2.resize to size; 2x or bigger reductions go down the pyramid, then an area pass."""
+    dst = out_buffer(dst, img, size)
+    h, w = img.shape[:2]
+    fx, fy = size[0] / w, size[1] / h
+    if interp == cv2.INTER_NEAREST or max(fx, fy) > 0.5:
+        return cv2.resize(img, size, dst=dst, interpolation=interp)
+    img = reduce_levels(img, min(pyramid_levels(max(fx, fy)), max_levels(w, h)))
+    return cv2.resize(img, size, dst=dst, interpolation=cv2.INTER_AREA)
+
+
+# -------------------------------
+# Proxies
+# -------------------------------
+def make_proxy(img, max_side):
+    """Area-downscaled copy whose longer side is at most max_side (or img itself)."""
+    h, w = img.shape[:2]
+    f = max_side / max(w, h)
+    if f >= 1:
+        return img
+    return cv2.resize(img, (max(1, round(w * f)), max(1, round(h * f))), interpolation=cv2.INTER_AREA)
+
+
+def fit_size(size, box):
+    """Largest size with the aspect of size that fits inside box."""
+    (w, h), (bw, bh) = size, box
+    f = min(bw / w, bh / h)
+    return max(1, round(w * f)), max(1, round(h * f))
+
+
+def apply_chain_at(img, steps, params, full_size, box=None, dst=None):
+    """Render a chain on a reduced copy of an image of size full_size.
+
+    Parameters stay in full-resolution pixels; the chain matrix is conjugated
+    by the reduction so the result is the full-size output scaled the same way.
+    With box=(w, h) the output is instead fitted inside box, so the display
+    scale is folded into the same single warp.
+    """
+    if img is None or img.size == 0:
+        raise ValueError("Invalid image")
+    params = normalize_params(params)
+    h, w = img.shape[:2]
+    fw, fh = full_size
+    M, (ow, oh) = compose(steps, fw, fh)
+    fx, fy = w / fw, h / fh
+    if box is not None:
+        size = fit_size((ow, oh), box)
+    else:
+        size = (max(1, round(ow * fx)), max(1, round(oh * fy)))
+    M = scale_matrix(size[0] / ow, size[1] / oh) @ M @ np.linalg.inv(scale_matrix(fx, fy))
+    return warp(img, M, size, params, dst)
+
+
+def display_source(original, proxy, steps, box):
+    """Pick the smallest of original/proxy that still has enough pixels for box."""
+    if proxy is None or proxy is original:
+        return original
+    h, w = original.shape[:2]
+    _, out = compose(steps, w, h)
+    needed = fit_size(out, box)[0] / out[0]
+    return proxy if proxy.shape[1] / w >= needed else original
+
+
+# -------------------------------
+# Result cache
+# -------------------------------
+GLOBAL_KEYS = ("interp", "border", "border_val")
+
+
+def fingerprint(img):
+    """Content hash of an image (shape, dtype and pixels)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((img.shape, img.dtype.str)).encode())
+    h.update(memoryview(np.ascontiguousarray(img)).cast("B"))
+    return h.hexdigest()
+
+
+def transform_key(steps, params=None):
+    """Hashable, normalized description of a chain and its global settings."""
+    p = normalize_params(params if params is not None else (steps[0][1] if steps else {}))
+    norm_steps = tuple(
+        (typ, tuple(sorted((k, v) for k, v in step.items() if k not in GLOBAL_KEYS)))
+        for typ, step in steps
+    )
+    # border_val may be a scalar or a per-channel list; either way a tuple of floats
+    border_val = tuple(float(v) for v in np.atleast_1d(p["border_val"]))
+    return norm_steps, p["interp"], p["border"], border_val
+
+
+class ResultCache:
+    """LRU of rendered results bounded by total bytes.
+
+    Keys are typically (fingerprint(img), transform_key(steps, params)).
+    Stored arrays are made read-only since they are handed out shared.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget = budget_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        img = self.entries.get(key)
+        if img is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return img
+
+    def put(self, key, img):
+        if img.nbytes > self.budget:
+            return
+        if key in self.entries:
+            self.bytes -= self.entries.pop(key).nbytes
+        img.flags.writeable = False
+        self.entries[key] = img
+        self.bytes += img.nbytes
+        while self.bytes > self.budget:
+            _, old = self.entries.popitem(last=False)
+            self.bytes -= old.nbytes
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+            "entries": len(self.entries), "bytes": self.bytes, "budget": self.budget
+        }
+
+
+# -------------------------------
+# Output buffers
+# -------------------------------
+# The same output sizes come up again and again: every preview, every view
+# of a big image, every video frame. Each fresh multi-MB array costs an
+# mmap and a page fault per 4 KB. A BufferPool keeps outputs keyed by shape
+# and dtype. get() leases an array out and release() hands it back once the
+# caller is done with it (e.g. after converting it to a pixmap or encoding
+# it). A leased array is only held weakly: if it is never released (a stale
+# result dropped on the floor) it is simply freed, never handed out twice.
+# Results that live on in caches or the history should not come from a pool.
+# Pass a pool as dst= to any warp.
+
+class BufferPool:
+    def __init__(self, idle_bytes):
+        self.idle_bytes = idle_bytes
+        self.free = OrderedDict()  # (shape, dtype) -> arrays, least recently used first
+        self.leased = weakref.WeakValueDictionary()  # id -> leased array
+        self.idle = 0  # bytes in self.free
+        self.lock = threading.Lock()
+        self.allocated = 0
+        self.reused = 0
+        self.high_water = 0
+
+    def get(self, shape, dtype):
+        """Lease an uninitialised array of shape/dtype, reusing a released one if there is one."""
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self.lock:
+            bufs = self.free.get(key)
+            if bufs:
+                buf = bufs.pop()
+                if not bufs:
+                    del self.free[key]
+                self.idle -= buf.nbytes
+                self.reused += 1
+            else:
+                buf = np.empty(shape, dtype)
+                self.allocated += 1
+            self.leased[id(buf)] = buf
+            self.high_water = max(self.high_water, self.idle + self._leased_bytes())
+            return buf
+
+    def release(self, buf):
+        """Give a leased array back for reuse. Anything else (or a second release) is ignored.
+
+        The caller must not touch buf, or any view of it, afterwards.
+        """
+        if buf is None:
+            return
+        with self.lock:
+            if self.leased.get(id(buf)) is not buf:
+                return
+            del self.leased[id(buf)]
+            buf.flags.writeable = True  # ResultCache freezes what it stores
+            key = (buf.shape, buf.dtype.str)
+            self.free.setdefault(key, []).append(buf)
+            self.free.move_to_end(key)
+            self.idle += buf.nbytes
+            self._trim()
+
+    def clear(self):
+        with self.lock:
+            self.free.clear()
+            self.idle = 0
+
+    def stats(self):
+        with self.lock:
+            busy = self._leased_bytes()
+            return {
+                "buffers": sum(len(b) for b in self.free.values()) + len(self.leased),
+                "bytes": self.idle + busy, "busy_bytes": busy, "high_water": self.high_water,
+                "allocated": self.allocated, "reused": self.reused
+            }
+
+    def _leased_bytes(self):
+        # Only the few arrays out right now; dropped ones have left the dict
+        return sum(buf.nbytes for buf in self.leased.values())
+
+    def _trim(self):
+        # Drop released arrays, least recently used sizes first, down to idle_bytes
+        while self.idle > self.idle_bytes and self.free:
+            key = next(iter(self.free))
+            self.idle -= self.free[key].pop(0).nbytes
+            if not self.free[key]:
+                del self.free[key]
+
+
+def out_buffer(dst, img, size):
+    """dst itself, or an array for img warped to size when dst is a BufferPool."""
+    if isinstance(dst, BufferPool):
+        return dst.get((size[1], size[0]) + img.shape[2:], img.dtype)
+    return dst
+
+
+# -------------------------------
+# Geometry plans
+# -------------------------------
+# For many same-size frames with the same geometry, the inverse mapping is
+# computed once and stored in OpenCV's compact fixed-point form (int16 x/y
+# plus an interpolation-table index, from cv2.convertMaps); each frame is
+# then a single cv2.remap with no per-pixel coordinate math.
+
+# Output pixels whose source coordinates are worked out at once
+PLAN_BAND_PIXELS = 1 << 16
+
+
+class GeometryPlan:
+    def __init__(self, steps, params, size):
+        self.steps = list(steps)
+        self.params = normalize_params(params if params is not None else (steps[0][1] if steps else {}))
+        self.size = tuple(size)
+        w, h = self.size
+        M, self.out_size = compose(self.steps, w, h)
+        self.map1 = self.map2 = None
+        self.levels = 0
+        # Pure resizes stay on cv2.resize, which beats any remap
+        if all(typ == "scaling" for typ, _ in self.steps):
+            return
+        # The maps address the pyramid-reduced source that warp() would use
+        self.levels = warp_levels(M, w, h, self.params["interp"], self.params["border"])
+        M = reduced_matrix(M, self.levels)
+        ow, oh = self.out_size
+        Minv = np.linalg.inv(M)
+        nearest = self.params["interp"] == cv2.INTER_NEAREST
+        self.map1 = np.empty((oh, ow, 2), np.int16)
+        self.map2 = None if nearest else np.empty((oh, ow), np.uint16)
+        # Coordinates are worked out a band of rows at a time, so the float
+        # temporaries stay a few MB however large the frame; only the
+        # compact maps (6 bytes a pixel) are full size.
+        xs = np.arange(ow, dtype=np.float64)
+        rows = max(1, PLAN_BAND_PIXELS // max(1, ow))
+        for r0 in range(0, oh, rows):
+            r1 = min(oh, r0 + rows)
+            ys = np.arange(r0, r1, dtype=np.float64)[:, None]
+            z = Minv[2, 0] * xs + Minv[2, 1] * ys + Minv[2, 2]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                mx = (Minv[0, 0] * xs + Minv[0, 1] * ys + Minv[0, 2]) / z
+                my = (Minv[1, 0] * xs + Minv[1, 1] * ys + Minv[1, 2]) / z
+            # Points at/behind the horizon map nowhere; send them to the border
+            bad = ~np.isfinite(mx) | ~np.isfinite(my) | (z <= 0)
+            mx[bad] = -1e6
+            my[bad] = -1e6
+            m1, m2 = cv2.convertMaps(mx.astype(np.float32), my.astype(np.float32), cv2.CV_16SC2,
+                                     nninterpolation=nearest)
+            self.map1[r0:r1] = m1
+            if m2 is not None:
+                self.map2[r0:r1] = m2
+
+    @property
+    def nbytes(self):
+        return sum(m.nbytes for m in (self.map1, self.map2) if m is not None)
+
+    def apply(self, img, dst=None):
+        if img is None or img.size == 0:
+            raise ValueError("Invalid image")
+        if (img.shape[1], img.shape[0]) != self.size:
+            raise ValueError(f"Plan is for {self.size[0]}x{self.size[1]}, got {img.shape[1]}x{img.shape[0]}")
+        p = self.params
+        if self.map1 is None:
+            return resize(img, self.out_size, p["interp"], dst)
+        dst = out_buffer(dst, img, self.out_size)
+        img = reduce_levels(img, self.levels)
+        return cv2.remap(img, self.map1, self.map2, p["interp"], dst=dst,
+                         borderMode=p["border"], borderValue=p["border_val"])
+
+
+PLAN_CACHE_SIZE = 8
+PLAN_CACHE_BYTES = 512 * 1024 * 1024
+_plans = OrderedDict()
+_plans_lock = threading.Lock()
+
+
+def get_plan(steps, params, size):
+    """Cached GeometryPlan for (chain, interp/border settings, input size)."""
+    key = (transform_key(steps, params), tuple(size))
+    with _plans_lock:
+        plan = _plans.get(key)
+        if plan is not None:
+            _plans.move_to_end(key)
+            return plan
+        plan = GeometryPlan(steps, params, size)
+        _plans[key] = plan
+        while len(_plans) > PLAN_CACHE_SIZE or (
+                len(_plans) > 1 and sum(p.nbytes for p in _plans.values()) > PLAN_CACHE_BYTES):
+            _plans.popitem(last=False)
+        return plan
+
+
+def apply_planned(img, steps, params=None):
+    """apply_chain through a cached geometry plan for img's size."""
+    if img is None or img.size == 0:
+        raise ValueError("Invalid image")
+    return get_plan(steps, params, (img.shape[1], img.shape[0])).apply(img)
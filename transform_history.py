@@ -0,0 +1,103 @@
+from transform_engine import compose
+
+# -------------------------------
+# Undo / redo history
+# -------------------------------
+# Each state is stored as a descriptor (steps, global params and the fused
+# 3x3 matrix), never as pixels. Every state is one warp of the original, so
+# any of them can be rebuilt with a single resample from the original (the
+# nearest snapshot that is always held); full-resolution images are only
+# kept for keyframe states, under a memory cap. The caller renders a state
+# missing from snapshot() and offers the result back through store().
+
+class HistoryEntry:
+    __slots__ = ("steps", "params", "matrix", "size")
+
+    def __init__(self, steps, params, matrix, size):
+        self.steps = steps
+        self.params = params
+        self.matrix = matrix
+        self.size = size
+
+
+class TransformHistory:
+    def __init__(self, keyframe_interval=5, snapshot_budget=256 * 1024 * 1024):
+        self.keyframe_interval = keyframe_interval
+        self.snapshot_budget = snapshot_budget
+        self.entries = []
+        self.pos = -1
+        self.snapshots = {}
+        self.original = None
+
+    def reset(self, original):
+        """Start a new history whose first state is original itself."""
+        self.original = original
+        self.entries = []
+        self.snapshots = {}
+        self.pos = -1
+        self.push([], None)
+
+    def push(self, steps, params):
+        """Add a state after the current one; the same state as the current one is not added twice."""
+        current = self.current
+        if current is not None and list(steps) == current.steps and params == current.params:
+            # e.g. a control that lost focus without being changed
+            return current
+        h, w = self.original.shape[:2]
+        M, size = compose(steps, w, h)
+        # A new edit drops the redo tail
+        del self.entries[self.pos + 1:]
+        for i in [i for i in self.snapshots if i > self.pos]:
+            del self.snapshots[i]
+        self.entries.append(HistoryEntry(list(steps), params, M, size))
+        self.pos = len(self.entries) - 1
+        return self.entries[self.pos]
+
+    @property
+    def current(self):
+        return self.entries[self.pos] if self.entries else None
+
+    def can_undo(self):
+        return self.pos > 0
+
+    def can_redo(self):
+        return self.pos < len(self.entries) - 1
+
+    def undo(self):
+        if not self.can_undo():
+            return None
+        self.pos -= 1
+        return self.current
+
+    def redo(self):
+        if not self.can_redo():
+            return None
+        self.pos += 1
+        return self.current
+
+    def snapshot(self, index=None):
+        """Full-resolution image for a state if one is held (the original always is)."""
+        index = self.pos if index is None else index
+        if index < 0 or index >= len(self.entries):
+            return None
+        if not self.entries[index].steps:
+            return self.original
+        return self.snapshots.get(index)
+
+    def store(self, index, entry, img):
+        """Offer a rendered image of entry; kept only if it is still state index and a keyframe.
+
+        Renders finish asynchronously, and by then undo plus a new edit may
+        have put a different state at index, so the entry itself is checked.
+        """
+        if index <= 0 or index % self.keyframe_interval or img.nbytes > self.snapshot_budget:
+            return
+        if index >= len(self.entries) or self.entries[index] is not entry:
+            return
+        self.snapshots[index] = img
+        # Drop the keyframes furthest from where we are until under the cap
+        while self.snapshot_bytes() > self.snapshot_budget:
+            del self.snapshots[max(self.snapshots, key=lambda i: abs(i - self.pos))]
+
+    def snapshot_bytes(self):
+        return sum(img.nbytes for img in self.snapshots.values())
\ No newline at end of file
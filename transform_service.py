@@ -0,0 +1,607 @@
+import argparse
+import asyncio
+import http.client
+import io
+import json
+import math
+import socket
+import struct
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import cv2
+
+from transform_engine import (compose, transform_key, transform_matrix, warp, normalize_params, apply_chain,
+                              BufferPool, interp_map, border_map)
+from batch_transform import parse_spec
+
+# -------------------------------
+# Local transform service
+# -------------------------------
+# python transform_service.py --port 8765            (HTTP on 127.0.0.1)
+# python transform_service.py --unix /tmp/its.sock   (HTTP over a Unix socket)
+#
+# POST /transform   body: an encoded image (PNG/JPEG/...) or a .npy array
+#                   X-Transform-Spec: the batch spec as JSON, e.g.
+#                     {"steps": [{"type": "rotation", "params": {"angle": 15}}],
+#                      "params": {"interp": "cubic", "border": "reflect", "border_val": 0}}
+#                   ?format=.jpg picks the response encoding (default: same
+#                   as the request, .png for encoded images)
+# GET  /metrics     queue depth, in-flight bytes, batch sizes, latency percentiles
+# GET  /health
+#
+# Requests that arrive within a short window and share geometry (steps +
+# interp/border) and image size are run as one batch: the matrix is built
+# once for the whole group, and its images are then warped side by side on
+# the worker threads. A batched request gets exactly the pixels it would
+# have got alone (and from apply_chain).
+# Each request reserves its body, decoded pixels and result against a byte
+# budget before the body is read. The sizes come from the image header
+# (PNG, JPEG, BMP, WebP or .npy), so a waiting request holds only that
+# header and memory never grows without bound. Results are warped into
+# pooled buffers that the next same-size request reuses once encoded.
+
+BATCH_WINDOW_MS = 5
+MAX_BATCH = 16
+BUDGET_MB = 1024
+POOL_MB = 256
+WORKERS = 4
+LATENCY_SAMPLES = 1000
+MAX_HEADER_BYTES = 64 * 1024
+IMAGE_HEADER_BYTES = 256 * 1024  # JPEG frame headers can sit behind large EXIF/ICC blocks
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 415: "Unsupported Media Type", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# -------------------------------
+# Codecs
+# -------------------------------
+NPY_TYPE = "application/x-npy"
+
+
+def npy_header(data):
+    """(shape, fortran_order, dtype, data offset) from the start of a .npy buffer."""
+    f = io.BytesIO(bytes(data[:IMAGE_HEADER_BYTES]))
+    try:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+        elif version == (2, 0):
+            shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+        else:
+            raise ValueError(f"unsupported .npy version {version}")
+    except ValueError as e:
+        raise HTTPError(400, f"bad .npy header: {e}")
+    if dtype.hasobject:
+        raise HTTPError(400, "object arrays are not accepted")
+    return shape, fortran, dtype, f.tell()
+
+
+def _jpeg_header(b):
+    i = 2
+    while i + 10 <= len(b):
+        if b[i] != 0xFF:
+            break
+        marker = b[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # markers without a length
+            i += 2
+            continue
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            precision, h, w, comps = struct.unpack(">BHHB", b[i + 4:i + 10])
+            return w, h, (1 if comps == 1 else 3) * (2 if precision > 8 else 1)
+        i += 2 + struct.unpack(">H", b[i + 2:i + 4])[0]
+    raise HTTPError(400, f"no JPEG frame header in the first {IMAGE_HEADER_BYTES >> 10} KB")
+
+
+def image_header(data, content_type):
+    """(width, height, bytes per pixel) read from the start of a body, without decoding.
+
+    Where the decoded channel count depends on more than the header (PNG
+    palettes and transparency, BMP, WebP), bytes per pixel is an upper bound.
+    """
+    if content_type == NPY_TYPE:
+        shape, _, dtype, _ = npy_header(data)
+        if len(shape) not in (2, 3):
+            raise HTTPError(400, f"expected a 2-D or 3-D array, got shape {shape}")
+        w, h, bpp = shape[1], shape[0], dtype.itemsize * (shape[2] if len(shape) == 3 else 1)
+    else:
+        b = bytes(data[:IMAGE_HEADER_BYTES])
+        try:
+            if b.startswith(b"\x89PNG\r\n\x1a\n") and b[12:16] == b"IHDR":
+                w, h, depth, color = struct.unpack(">IIBB", b[16:26])
+                bpp = (1 if color == 0 else 4) * (2 if depth == 16 else 1)
+            elif b.startswith(b"\xff\xd8"):
+                w, h, bpp = _jpeg_header(b)
+            elif b.startswith(b"BM"):
+                w, h, _, depth = struct.unpack("<iiHH", b[18:30])
+                h, bpp = abs(h), 4 if depth == 32 else 3
+            elif b[:4] == b"RIFF" and b[8:12] == b"WEBP" and b[12:16] in (b"VP8 ", b"VP8L", b"VP8X"):
+                if b[12:16] == b"VP8 ":
+                    w, h = struct.unpack("<HH", b[26:30])
+                    w, h = w & 0x3FFF, h & 0x3FFF
+                elif b[12:16] == b"VP8L":
+                    bits = int.from_bytes(b[21:25], "little")
+                    w, h = (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+                else:
+                    w, h = int.from_bytes(b[24:27], "little") + 1, int.from_bytes(b[27:30], "little") + 1
+                bpp = 4
+            else:
+                raise HTTPError(415, "unsupported image format; send PNG, JPEG, BMP, WebP or a .npy array")
+        except struct.error:
+            raise HTTPError(400, "truncated image header")
+    if w <= 0 or h <= 0 or bpp <= 0:
+        raise HTTPError(400, f"image header gives an empty {w}x{h} image")
+    return w, h, bpp
+
+
+def decode_image(body, content_type):
+    if content_type == NPY_TYPE:
+        # A view of the body, not a copy: the bytes are the pixels
+        shape, fortran, dtype, offset = npy_header(body)
+        try:
+            img = np.frombuffer(body, dtype, math.prod(shape), offset)
+        except ValueError as e:
+            raise HTTPError(400, f"bad .npy body: {e}")
+        img = img.reshape(shape[::-1]).T if fortran else img.reshape(shape)
+    else:
+        img = cv2.imdecode(np.frombuffer(body, np.uint8), cv2.IMREAD_UNCHANGED)
+    if img is None or img.size == 0 or img.ndim not in (2, 3):
+        raise HTTPError(400, "could not decode image")
+    return img
+
+
+def encode_image(img, fmt):
+    if fmt == ".npy":
+        buf = io.BytesIO()
+        np.save(buf, img, allow_pickle=False)
+        return buf.getvalue(), NPY_TYPE
+    ok, data = cv2.imencode(fmt, img)
+    if not ok:
+        raise HTTPError(400, f"could not encode result as {fmt}")
+    return data.tobytes(), "image/" + fmt.lstrip(".").replace("jpg", "jpeg")
+
+
+def check_spec(spec):
+    """Raise ValueError unless spec's params build a transform (tried on a dummy size).
+
+    A missing or mistyped parameter is the client's mistake; found here it
+    is a 400 instead of a failure inside the worker. border_val is rewritten
+    in place as a tuple of floats, however the client sent it.
+    """
+    steps, params = spec["steps"], spec["params"]
+    if not steps:
+        raise ValueError("spec has no steps")
+    if params is not None and not isinstance(params, dict):
+        raise ValueError("spec 'params' must be an object")
+    for name, names in (("interp", interp_map), ("border", border_map)):
+        value = (params if params is not None else steps[0][1] or {}).get(name)
+        if isinstance(value, str) and value.lower() not in names:
+            raise ValueError(f"{name} must be one of: {', '.join(names)}")
+    source = params if params is not None else steps[0][1]
+    try:
+        p = normalize_params(source)
+        border_val = tuple(float(v) for v in np.atleast_1d(p["border_val"]))
+    except (AttributeError, TypeError, ValueError) as e:
+        raise ValueError(f"bad params: {e}")
+    if not 1 <= len(border_val) <= 4:
+        raise ValueError("border_val must be a number or a list of up to 4 numbers")
+    if "border_val" in source:
+        source["border_val"] = border_val
+    size = (64, 64)
+    for typ, step_params in steps:
+        try:
+            _, size = transform_matrix(typ, step_params, *size)
+        except KeyError as e:
+            raise ValueError(f"{typ} step is missing parameter {e}")
+        except (AttributeError, TypeError, ValueError, cv2.error) as e:
+            raise ValueError(f"bad {typ} params: {e}")
+        size = (max(1, size[0]), max(1, size[1]))
+
+
+# -------------------------------
+# Batching and budget
+# -------------------------------
+def batch_geometry(steps, params, w, h):
+    """(params, matrix, size) shared by every w x h image of a batch.
+
+    The matrix is None for an all-scaling chain, which is a resize.
+    """
+    params = normalize_params(params if params is not None else steps[0][1])
+    if all(typ == "scaling" for typ, _ in steps):
+        return params, None, None
+    M, size = compose(steps, w, h)
+    return params, M, size
+
+
+def transform_one(img, steps, geometry, buffers=None):
+    """Warp one image of a batch by the geometry from batch_geometry.
+
+    Every image takes the same path as apply_chain, whatever the batch
+    size, so a request's pixels never depend on what else was in flight.
+    buffers is an optional BufferPool the output is taken from.
+    """
+    params, M, size = geometry
+    if M is None:
+        return apply_chain(img, steps, params, buffers)
+    return warp(img, M, size, params, buffers)
+
+
+def transform_batch(images, steps, params, buffers=None):
+    """Warp same-size images by one chain, sharing the matrix."""
+    h, w = images[0].shape[:2]
+    geometry = batch_geometry(steps, params, w, h)
+    return [transform_one(img, steps, geometry, buffers) for img in images]
+
+
+class ByteBudget:
+    """Async counting semaphore over bytes."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.peak = 0
+        self.cond = asyncio.Condition()
+
+    async def acquire(self, n):
+        if n > self.limit:
+            raise HTTPError(413, f"request needs {n >> 20} MB, budget is {self.limit >> 20} MB")
+        async with self.cond:
+            await self.cond.wait_for(lambda: self.used + n <= self.limit)
+            self.used += n
+            self.peak = max(self.peak, self.used)
+
+    async def release(self, n):
+        async with self.cond:
+            self.used -= n
+            self.cond.notify_all()
+
+
+class _Group:
+    __slots__ = ("steps", "params", "items")
+
+    def __init__(self, steps, params):
+        self.steps = steps
+        self.params = params
+        self.items = []  # (image, future)
+
+
+class Batcher:
+    def __init__(self, executor, window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH, buffers=None):
+        self.executor = executor
+        self.buffers = buffers
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.groups = {}
+        self.running = 0
+        self.batches = 0
+        self.sizes = {}  # batch size -> count
+
+    def queued(self):
+        return sum(len(g.items) for g in self.groups.values())
+
+    async def submit(self, img, steps, params):
+        loop = asyncio.get_running_loop()
+        key = (transform_key(steps, params), img.shape, img.dtype.str)
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = _Group(steps, params)
+            loop.call_later(self.window, self._flush, key, group)
+        fut = loop.create_future()
+        group.items.append((img, fut))
+        if len(group.items) >= self.max_batch:
+            self._flush(key, group)
+        return await fut
+
+    def _flush(self, key, group):
+        if self.groups.get(key) is not group:
+            return  # already flushed (full) before its timer fired
+        del self.groups[key]
+        asyncio.ensure_future(self._run(group))
+
+    async def _run(self, group):
+        loop = asyncio.get_running_loop()
+        n = len(group.items)
+        self.running += n
+        self.batches += 1
+        self.sizes[n] = self.sizes.get(n, 0) + 1
+
+        async def one(img, fut, geometry):
+            # Each image is its own worker task, so a batch uses the pool's
+            # threads and each request is answered as soon as its own is done
+            try:
+                res = await loop.run_in_executor(self.executor, transform_one, img, group.steps, geometry,
+                                                 self.buffers)
+            except Exception as e:
+                if not fut.done():
+                    fut.set_exception(e)
+            else:
+                if not fut.done():
+                    fut.set_result(res)
+        try:
+            h, w = group.items[0][0].shape[:2]
+            geometry = batch_geometry(group.steps, group.params, w, h)
+        except Exception as e:
+            for _, fut in group.items:
+                if not fut.done():
+                    fut.set_exception(e)
+        else:
+            await asyncio.gather(*(one(img, fut, geometry) for img, fut in group.items))
+        finally:
+            self.running -= n
+
+
+# -------------------------------
+# Server
+# -------------------------------
+class TransformService:
+    def __init__(self, workers=WORKERS, window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH, budget_mb=BUDGET_MB,
+                 pool_mb=POOL_MB):
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="service-worker")
+        self.buffers = BufferPool(pool_mb * 1024 * 1024)
+        self.batcher = Batcher(self.executor, window_ms, max_batch, self.buffers)
+        self.budget = ByteBudget(budget_mb * 1024 * 1024)
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.requests = 0
+        self.errors = 0
+        self.active = 0
+        self.server = None
+
+    async def start(self, host="127.0.0.1", port=8765, unix=None):
+        if unix:
+            self.server = await asyncio.start_unix_server(self.handle, unix)
+        else:
+            self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server
+
+    def address(self):
+        return self.server.sockets[0].getsockname()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+    def metrics(self):
+        lat = np.asarray(self.latencies) if self.latencies else None
+
+        def pct(q):
+            return float(np.percentile(lat, q)) if lat is not None else None
+        return {
+            "requests": self.requests, "errors": self.errors, "active": self.active,
+            "queued": self.batcher.queued(), "running": self.batcher.running,
+            "batches": self.batcher.batches,
+            "batch_sizes": {str(k): v for k, v in sorted(self.batcher.sizes.items())},
+            "inflight_bytes": self.budget.used, "inflight_peak_bytes": self.budget.peak,
+            "budget_bytes": self.budget.limit,
+            "buffers": self.buffers.stats(),
+            "latency_ms": {"p50": pct(50), "p90": pct(90), "p99": pct(99), "samples": len(self.latencies)}
+        }
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self.respond(writer, 400, b"header too large", "text/plain", close=True)
+                    return
+                if len(head) > MAX_HEADER_BYTES:
+                    await self.respond(writer, 400, b"header too large", "text/plain", close=True)
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    await self.respond(writer, 400, b"bad request line", "text/plain", close=True)
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        k, v = line.split(":", 1)
+                        headers[k.strip().lower()] = v.strip()
+                close = headers.get("connection", "").lower() == "close" or version == "HTTP/1.0"
+                status, body, ctype, extra = await self.dispatch(method, target, headers, reader)
+                await self.respond(writer, status, body, ctype, extra, close)
+                if close:
+                    return
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target, headers, reader):
+        url = urlsplit(target)
+        body = {"unread": int(headers.get("content-length", 0) or 0)}
+        try:
+            if url.path == "/health":
+                return 200, b"ok", "text/plain", {}
+            if url.path == "/metrics":
+                return 200, json.dumps(self.metrics()).encode(), "application/json", {}
+            if url.path != "/transform":
+                raise HTTPError(404, "unknown path")
+            if method != "POST":
+                raise HTTPError(405, "use POST")
+            return await self.transform(url, headers, reader, body)
+        except HTTPError as e:
+            self.errors += 1
+            await self._drain(reader, body["unread"])
+            return e.status, str(e).encode(), "text/plain", {}
+        except Exception as e:
+            self.errors += 1
+            await self._drain(reader, body["unread"])
+            return 500, str(e).encode(), "text/plain", {}
+
+    async def _drain(self, reader, length):
+        # Keep the connection usable after rejecting a request with a body
+        try:
+            while length > 0:
+                chunk = await reader.read(min(length, 1 << 16))
+                if not chunk:
+                    return
+                length -= len(chunk)
+        except ConnectionError:
+            pass
+
+    async def _read_body(self, reader, head, length):
+        # Straight into one buffer of the final size: no joined copy
+        data = bytearray(length)
+        view = memoryview(data)
+        view[:len(head)] = head
+        pos = len(head)
+        while pos < length:
+            chunk = await reader.read(min(length - pos, 1 << 20))
+            if not chunk:
+                raise HTTPError(400, "body shorter than Content-Length")
+            view[pos:pos + len(chunk)] = chunk
+            pos += len(chunk)
+        view.release()
+        return data
+
+    async def transform(self, url, headers, reader, body):
+        t0 = time.perf_counter()
+        self.requests += 1
+        self.active += 1
+        try:
+            try:
+                spec = parse_spec(json.loads(headers.get("x-transform-spec", "")))
+                check_spec(spec)
+            except (ValueError, AttributeError, TypeError) as e:
+                raise HTTPError(400, f"bad X-Transform-Spec: {e}")
+            ctype = headers.get("content-type", "")
+            fmt = parse_qs(url.query).get("format", [".npy" if ctype == NPY_TYPE else ".png"])[0]
+            if not fmt.startswith("."):
+                fmt = "." + fmt
+            loop = asyncio.get_running_loop()
+
+            # Only the image header is read before the budget is taken; the
+            # whole request (body + decoded pixels + result) is reserved in
+            # one go from it, so waiting requests hold no more than a header.
+            length = body["unread"]
+            if not length:
+                raise HTTPError(400, "empty body")
+            head = await reader.readexactly(min(length, IMAGE_HEADER_BYTES))
+            body["unread"] -= len(head)
+            w, h, bpp = image_header(head, ctype)
+            _, (ow, oh) = compose(spec["steps"], w, h)
+            if ow < 1 or oh < 1:
+                raise HTTPError(400, f"transform of a {w}x{h} image gives an empty {ow}x{oh} result")
+            reserved = length + (w * h + ow * oh) * bpp
+            await self.budget.acquire(reserved)
+            try:
+                data = await self._read_body(reader, head, length)
+                body["unread"] = 0
+                del head
+                img = await loop.run_in_executor(self.executor, decode_image, data, ctype)
+                del data
+                if (img.shape[1], img.shape[0]) != (w, h) or img.nbytes > w * h * bpp:
+                    raise HTTPError(400, "image does not match its header")
+                # Exact sizes are known now and the body is gone (a .npy
+                # image is the body): hand back the rest of the reservation
+                keep = img.nbytes + ow * oh * (img.nbytes // (w * h))
+                await self.budget.release(reserved - keep)
+                reserved = keep
+                result = await self.batcher.submit(img, spec["steps"], spec["params"])
+                del img
+                try:
+                    data, out_type = await loop.run_in_executor(self.executor, encode_image, result, fmt)
+                finally:
+                    self.buffers.release(result)
+            finally:
+                await self.budget.release(reserved)
+            ms = (time.perf_counter() - t0) * 1000
+            self.latencies.append(ms)
+            return 200, data, out_type, {"X-Latency-Ms": f"{ms:.2f}"}
+        finally:
+            self.active -= 1
+
+    async def respond(self, writer, status, body, ctype, extra=None, close=False):
+        head = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+                f"Content-Type: {ctype}", f"Content-Length: {len(body)}"]
+        head += [f"{k}: {v}" for k, v in (extra or {}).items()]
+        if close:
+            head.append("Connection: close")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+# -------------------------------
+# Client
+# -------------------------------
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=60):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+def connect(host="127.0.0.1", port=8765, unix=None, timeout=60):
+    return UnixHTTPConnection(unix, timeout) if unix else http.client.HTTPConnection(host, port, timeout=timeout)
+
+
+def request_transform(conn, img, spec, fmt=".npy"):
+    """Send an ndarray to a running service and return the transformed ndarray."""
+    buf = io.BytesIO()
+    np.save(buf, img, allow_pickle=False)
+    conn.request("POST", f"/transform?format={fmt}", body=buf.getvalue(),
+                 headers={"Content-Type": NPY_TYPE, "X-Transform-Spec": json.dumps(spec)})
+    resp = conn.getresponse()
+    data = resp.read()
+    if resp.status != 200:
+        raise RuntimeError(f"{resp.status}: {data.decode(errors='replace')}")
+    return decode_image(bytearray(data), resp.getheader("Content-Type"))
+
+
+def request_metrics(conn):
+    conn.request("GET", "/metrics")
+    return json.loads(conn.getresponse().read())
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Serve Image Transform Studio transforms over local HTTP.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--unix", help="listen on this Unix socket path instead of TCP")
+    ap.add_argument("--workers", type=int, default=WORKERS, help="decode/warp/encode threads")
+    ap.add_argument("--batch-window-ms", type=float, default=BATCH_WINDOW_MS)
+    ap.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    ap.add_argument("--budget-mb", type=int, default=BUDGET_MB, help="in-flight pixel/body memory bound")
+    ap.add_argument("--pool-mb", type=int, default=POOL_MB, help="idle output buffers kept for reuse")
+    args = ap.parse_args(argv)
+
+    async def serve():
+        service = TransformService(args.workers, args.batch_window_ms, args.max_batch, args.budget_mb, args.pool_mb)
+        server = await service.start(args.host, args.port, args.unix)
+        print(f"listening on {args.unix or '%s:%d' % service.address()[:2]}")
+        async with server:
+            await server.serve_forever()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
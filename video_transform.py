@@ -0,0 +1,283 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import cv2
+
+from transform_engine import apply_chain, compose, get_plan, transform_key, BufferPool, GLOBAL_KEYS
+from batch_transform import load_spec, collect_inputs
+from pipeline import Pipeline, Stage
+
+# -------------------------------
+# Video / frame-sequence CLI
+# -------------------------------
+# python video_transform.py clip.mp4 --spec fix.json --out fixed.mp4
+# python video_transform.py "frames/*.png" --spec fix.json --out fixed/
+#
+# Frames stream through read -> transform -> write with bounded queues, so
+# memory stays flat however long the clip is. When the geometry doesn't
+# change between frames the mapping is computed once and reused.
+#
+# Any numeric step parameter may be a keyframe curve instead of a number,
+# linearly interpolated per frame and held before/after the first/last key:
+#   {"type": "rotation", "params": {"angle": {"0": 0, "120": 30, "240": 0}}}
+#   {"type": "similarity", "params": {"scale": [[0, 100], [90, 60]], ...}}
+# interp/border/border_val are never curves, so border_val may be a list.
+
+VIDEO_EXTS = (".mp4", ".avi", ".mov", ".mkv", ".m4v", ".webm")
+
+# Output frames are recycled once written; a few in-flight frames' worth is plenty
+FRAME_POOL_BYTES = 256 * 1024 * 1024
+
+
+def is_video(path):
+    return path.lower().endswith(VIDEO_EXTS)
+
+
+# -------------------------------
+# Keyframe curves
+# -------------------------------
+def parse_curve(value):
+    """(frames, values) arrays from {"frame": value} or [[frame, value], ...]."""
+    pairs = value.items() if isinstance(value, dict) else value
+    keys = sorted((int(f), float(v)) for f, v in pairs)
+    if not keys:
+        raise SystemExit("Keyframe curve needs at least one key")
+    return np.float64([k[0] for k in keys]), np.float64([k[1] for k in keys])
+
+
+def is_curve(name, value):
+    """True for a non-empty {"frame": value} dict or [[frame, value], ...] list."""
+    if name in GLOBAL_KEYS:
+        return False
+    if isinstance(value, dict):
+        return bool(value)
+    return (isinstance(value, list) and bool(value)
+            and all(isinstance(p, (list, tuple)) and len(p) == 2 for p in value))
+
+
+def parse_steps(steps):
+    """Split each step's params into fixed values and keyframe curves."""
+    parsed = []
+    for typ, params in steps:
+        fixed = {k: v for k, v in params.items() if not is_curve(k, v)}
+        curves = {k: parse_curve(v) for k, v in params.items() if is_curve(k, v)}
+        parsed.append((typ, fixed, curves))
+    return parsed
+
+
+def is_animated(parsed):
+    return any(curves for _, _, curves in parsed)
+
+
+def steps_at(parsed, frame):
+    """Concrete (type, params) steps for one frame number."""
+    steps = []
+    for typ, fixed, curves in parsed:
+        params = dict(fixed)
+        for k, (xs, ys) in curves.items():
+            params[k] = float(np.interp(frame, xs, ys))
+        steps.append((typ, params))
+    return steps
+
+
+# -------------------------------
+# Frame sources and sinks
+# -------------------------------
+def read_video(path):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise SystemExit(f"Could not open video {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or None
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or None
+
+    def frames():
+        try:
+            i = 0
+            while True:
+                ok, frame = cap.read()
+                if not ok:
+                    return
+                yield i, f"frame_{i:06d}", frame
+                i += 1
+        finally:
+            cap.release()
+    return frames(), fps, count
+
+
+def read_sequence(paths):
+    def frames():
+        for i, path in enumerate(paths):
+            # Unreadable frames travel on as None and are reported by the transform stage
+            yield i, os.path.splitext(os.path.basename(path))[0], cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    return frames(), None, len(paths)
+
+
+class VideoSink:
+    """cv2.VideoWriter opened on the first frame, once the output size is known."""
+
+    def __init__(self, path, fps, fourcc="mp4v"):
+        self.path = path
+        self.fps = fps
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.writer = None
+        self.size = None
+
+    def write(self, index, name, frame):
+        # Checked before the writer is opened, so a bad first frame leaves no empty file
+        if frame.dtype != np.uint8:
+            raise ValueError("video output needs 8-bit frames; write a frame sequence instead")
+        h, w = frame.shape[:2]
+        if self.writer is None:
+            self.size = (w, h)
+            self.writer = cv2.VideoWriter(self.path, self.fourcc, self.fps, self.size, frame.ndim == 3)
+            if not self.writer.isOpened():
+                raise ValueError("could not open " + self.path + " for writing")
+        elif (w, h) != self.size:
+            raise ValueError(f"frame is {w}x{h} but the video is {self.size[0]}x{self.size[1]}; "
+                             "write a frame sequence for size-changing curves")
+        self.writer.write(frame)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.release()
+
+
+class SequenceSink:
+    def __init__(self, out_dir, ext=".png"):
+        self.out_dir = out_dir
+        self.ext = ext
+        os.makedirs(out_dir, exist_ok=True)
+
+    def write(self, index, name, frame):
+        path = os.path.join(self.out_dir, name + self.ext)
+        if not cv2.imwrite(path, frame):
+            raise ValueError("could not write " + path)
+
+    def close(self):
+        pass
+
+
+# -------------------------------
+# Streaming
+# -------------------------------
+class FrameTransformer:
+    """Per-frame transform that reuses one geometry plan while the geometry holds still.
+
+    plan: "auto" plans projective chains only (remap beats warpPerspective,
+    while warpAffine is usually faster than a remap), "on" always, "off" never.
+    Output frames come from buffers (a BufferPool) when one is given.
+    """
+
+    def __init__(self, steps, params, plan="auto", buffers=None):
+        self.parsed = parse_steps(steps)
+        self.params = params
+        self.buffers = buffers
+        self.plan_mode = plan
+        self.key = None
+        self.plan = None
+        self.plans_built = 0
+
+    def use_plan(self, steps, size):
+        if self.plan_mode != "auto":
+            return self.plan_mode == "on"
+        M, _ = compose(steps, *size)
+        return not np.allclose(M[2], [0, 0, 1])
+
+    def __call__(self, index, frame):
+        steps = steps_at(self.parsed, index)
+        size = (frame.shape[1], frame.shape[0])
+        key = (transform_key(steps, self.params), size)
+        if key != self.key:
+            self.key = key
+            self.plan = None
+            # A moving curve changes the geometry every frame; planning it
+            # would cost more than the warp it saves.
+            if self.use_plan(steps, size) and not is_animated(self.parsed):
+                self.plan = get_plan(steps, self.params, size)
+                self.plans_built += 1
+        if self.plan is not None:
+            return self.plan.apply(frame, self.buffers)
+        return apply_chain(frame, steps, self.params, self.buffers)
+
+
+def run_stream(frames, sink, spec, count=None, plan="auto", queue_size=4, log=print, every=100):
+    """Transform and write frames in order; returns (frames written, failures, fps)."""
+    buffers = BufferPool(FRAME_POOL_BYTES)
+    transform = FrameTransformer(spec["steps"], spec["params"], plan, buffers)
+
+    def warp(item):
+        index, name, frame = item
+        if frame is None or frame.size == 0:
+            raise ValueError("could not read frame")
+        return index, name, transform(index, frame)
+
+    def write(job):
+        try:
+            sink.write(*job)
+        finally:
+            buffers.release(job[2])
+        return job[0]
+
+    # One worker per stage keeps frames in order for the writer
+    pipe = Pipeline([
+        Stage("transform", warp, 1, queue_size),
+        Stage("write", write, 1, queue_size)
+    ])
+    done, failed = 0, []
+    t0 = time.perf_counter()
+    try:
+        for item, index, error in pipe.run(frames):
+            if error is not None:
+                failed.append((item[1], error))
+                log(f"FAIL {item[1]}: {error}")
+                continue
+            done += 1
+            if every and done % every == 0:
+                elapsed = time.perf_counter() - t0
+                total = f"/{count}" if count else ""
+                log(f"frame {done}{total}  {done / max(elapsed, 1e-9):.1f} fps")
+    finally:
+        sink.close()
+    fps = done / max(pipe.wall, 1e-9)
+    log(f"{done} frames, {len(failed)} failed in {pipe.wall:.2f} s ({fps:.1f} fps)")
+    bst = buffers.stats()
+    log(f"  buffers: {bst['allocated']} allocated, {bst['reused']} reused, peak {bst['high_water'] / 2**20:.1f} MB")
+    for st in pipe.stats():
+        log(f"  {st['stage']:9s} util {st['utilization']:6.1%}  busy {st['busy_s']:.2f} s  "
+            f"starved {st['starved_s']:.2f} s  blocked {st['blocked_s']:.2f} s")
+    return done, failed, fps
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Apply an Image Transform Studio transform to a video or frame sequence.")
+    ap.add_argument("input", help="video file, or a directory / glob of frames")
+    ap.add_argument("--spec", required=True, help="JSON/YAML spec; step params may be keyframe curves")
+    ap.add_argument("--out", required=True, help="output video file, or a directory for frames")
+    ap.add_argument("--fps", type=float, default=None, help="output frame rate (default: source, or 25)")
+    ap.add_argument("--fourcc", default="mp4v", help="video codec FourCC")
+    ap.add_argument("--ext", default=".png", help="frame extension when writing a sequence")
+    ap.add_argument("--plan", choices=("auto", "on", "off"), default="auto",
+                    help="reuse precomputed remap tables (auto: for perspective chains)")
+    ap.add_argument("--queue-size", type=int, default=4, help="frames buffered between stages")
+    args = ap.parse_args(argv)
+
+    spec = load_spec(args.spec)
+    if is_video(args.input):
+        frames, fps, count = read_video(args.input)
+    else:
+        paths = collect_inputs(args.input)
+        if not paths:
+            print("No input frames found.", file=sys.stderr)
+            return 1
+        frames, fps, count = read_sequence(paths)
+    fps = args.fps or fps or 25.0
+    sink = VideoSink(args.out, fps, args.fourcc) if is_video(args.out) else SequenceSink(args.out, args.ext)
+    _, failed, _ = run_stream(frames, sink, spec, count, args.plan, args.queue_size)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())